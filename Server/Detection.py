@@ -6,38 +6,59 @@ import time
 import json
 import queue
 import threading
-from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from flask import Flask, Response
+from flask import Flask, Response, jsonify
 from ultralytics import YOLO
-import ollama
 
+from live_pipeline import DropOldestQueue, FrameBroadcaster, JpegRing, Stage, StagedPipeline
+from llm_gateway import get_llm_gateway
 from shot_detector import ShotDetector
+from shot_prompt import count_tokens, encode_shot
+from timeseries import TimeSeriesRing
 from camera import picam2
 
 app = Flask(__name__)
 
-# Initialize person detection with YOLO
+# Initialize person and ball detection with YOLO (COCO classes)
 person_detector = YOLO('yolov8n.pt')  
+PERSON_CLASS = 0
+BALL_CLASS = 32
 
 # Buffers to store recent ball and wrist positions for verification
-ball_buffer = deque(maxlen=180)
-wrist_buffer = deque(maxlen=180)
+ball_buffer = TimeSeriesRing(180)
+wrist_buffer = TimeSeriesRing(180)
 
 # Initialize body detection
 mp_pose = mp.solutions.pose
 pose_detector = mp_pose.Pose(static_image_mode=True, min_detection_confidence=0.3, model_complexity=0)
 
 # Shot detection and camera setup moved to modules
-detector = ShotDetector()
+detector = ShotDetector(ball_track=ball_buffer, wrist_track=wrist_buffer)
 
 # Shot clip + cooldown settings
 SHOT_COOLDOWN_SECONDS = 5.0
 CLIP_PRE_SECONDS = 1.5
 CLIP_POST_SECONDS = 1.5
 FRAME_BUFFER_SECONDS = 8.0
+# Ring size bound for FRAME_BUFFER_SECONDS at up to 60 fps
+FRAME_BUFFER_MAX_FRAMES = int(FRAME_BUFFER_SECONDS * 60)
 OUTPUT_DIR = os.path.join(os.path.dirname(__file__), '..', 'Shots')
-LLM_MODEL = 'gemma3:1b'
+
+# Per-stage frame rate and timing, printed every TIMING_REPORT_SECONDS and served at /stats
+TIMING_REPORT_SECONDS = 10.0
+last_timing_report = 0.0
+
+# Detection-stage state: when the last accepted shot happened
+last_accepted_shot_ts = -1e9
+# Encode-stage state: the streamed JPEGs double as the clip pre-roll, plus clips waiting for their post-roll
+frame_buffer = JpegRing(FRAME_BUFFER_SECONDS, FRAME_BUFFER_MAX_FRAMES)
+pending_clips = []
+# Accepted shots from the detection stage to the encode stage. Unlike the frame queues this
+# never drops, so a clip (and its LLM feedback) survives the encode stage falling behind.
+clip_requests = queue.Queue()
+# Writes shot clips off the frame path
+clip_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='clip-writer')
 
 # Run LLM feedback in the background so streaming inference does not block.
 feedback_queue = queue.Queue(maxsize=32)
@@ -48,20 +69,23 @@ def _ensure_output_dir():
 
 
 def _save_clip(frames, shot_id):
+    """Decode a window of ``(ts, jpeg)`` frames from the ring and write it out as an mp4."""
     if not frames:
         return None
 
     _ensure_output_dir()
 
-    first_ts = frames[0]['ts']
-    last_ts = frames[-1]['ts']
+    first_ts = frames[0][0]
+    last_ts = frames[-1][0]
     if len(frames) > 1 and last_ts > first_ts:
         fps = (len(frames) - 1) / (last_ts - first_ts)
         fps = max(10.0, min(60.0, fps))
     else:
         fps = 20.0
 
-    first_frame = frames[0]['frame']
+    first_frame = cv2.imdecode(np.frombuffer(frames[0][1], np.uint8), cv2.IMREAD_COLOR)
+    if first_frame is None:
+        return None
     height, width = first_frame.shape[:2]
     stamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
     safe_id = (shot_id or 'unknown')[:8]
@@ -72,8 +96,11 @@ def _save_clip(frames, shot_id):
     if not writer.isOpened():
         return None
 
-    for entry in frames:
-        writer.write(entry['frame'])
+    writer.write(first_frame)
+    for _, jpeg in frames[1:]:
+        frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+        if frame is not None:
+            writer.write(frame)
     writer.release()
     return out_path
 
@@ -100,25 +127,9 @@ def _print_llm_feedback_for_shot(shot_id):
         with open(shot_path, 'r', encoding='utf-8') as f:
             shot_data = json.load(f)
 
-        response = ollama.chat(
-            model=LLM_MODEL,
-            messages=[
-                {
-                    'role': 'system',
-                    'content': 'You are a helpful sports performance coach assistant. Provide clear, concise, and actionable shooting feedback.'
-                },
-                {
-                    'role': 'user',
-                    'content': (
-                        'I collected basketball shot form data. Provide feedback in four sections: '
-                        'overall assessment, strengths, areas for improvement, and top 3 prioritized recommendations. '
-                        'Avoid raw timestamps and precise floating-point values. Keep the tone encouraging and practical. '
-                        f'Data: {json.dumps(shot_data, indent=2)}'
-                    )
-                }
-            ]
-        )
-        feedback = response.get('message', {}).get('content', '').strip()
+        prompt = encode_shot(shot_data)
+        print(f"LLM prompt for shot {shot_id[:8]}: ~{count_tokens(prompt)} tokens")
+        feedback = get_llm_gateway().chat([{'role': 'user', 'content': prompt}])
         if feedback:
             _ensure_output_dir()
             feedback_path = os.path.join(OUTPUT_DIR, f'shot_feedback_{shot_id[:8]}.txt')
@@ -141,204 +152,256 @@ def _feedback_worker_loop():
             feedback_queue.task_done()
 
 
-feedback_worker = threading.Thread(target=_feedback_worker_loop, daemon=True)
-feedback_worker.start()
+def _report_llm_warmup(future):
+    if future.exception() is not None:
+        print(f'LLM preload failed, the first shot will load the model: {future.exception()}')
 
 
-def generate_frames():
-    frame_buffer = deque()
-    pending_clip = None
-    last_accepted_shot_ts = -1e9
-
-    while True:
-        raw_frame = picam2.capture_array()
-        ts = time.time()
-        frame = cv2.cvtColor(raw_frame, cv2.COLOR_RGBA2BGR)
-        # Resize for speed
-        scale = 0.25
-        small_frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
-        small_h, small_w = small_frame.shape[:2]
-        rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-
-        # Person detection with YOLO
-        results = person_detector(rgb_small_frame, conf=0.3, classes=[0])  
-        # Ball detection 
-        ball_results = person_detector(rgb_small_frame, conf=0.3, classes=[32])
-
-        # extract first detected ball
-        ball_center_full = None
-        for bres in ball_results:
-            for box in bres.boxes:
-                x1b, y1b, x2b, y2b = box.xyxy[0].cpu().numpy()
-                x1b, y1b, x2b, y2b = int(x1b), int(y1b), int(x2b), int(y2b)
-                # center in small frame
-                cx = int((x1b + x2b) / 2)
-                cy = int((y1b + y2b) / 2)
-                # convert to full frame coords
-                full_cx = int(cx / scale)
-                full_cy = int(cy / scale)
-                ball_center_full = (full_cx, full_cy)
-                ball_buffer.append({'ts': ts, 'pos': ball_center_full})
-                # draw ball detection
-                cv2.rectangle(frame, (int(x1b/scale), int(y1b/scale)), (int(x2b/scale), int(y2b/scale)), (0, 0, 255), 2)
-                cv2.putText(frame, "Ball", (int(x1b/scale), int(y1b/scale) - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
-                break
-            if ball_center_full is not None:
-                break
-
-        people_landmarks = []
-        processed = False
-        for result in results:
-            if processed:
-                break
-            for box in result.boxes:
-                if processed:
-                    break
-                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
-
-                # Crop the person
-                person_crop = rgb_small_frame[y1:y2, x1:x2]
-                if person_crop.size == 0:
-                    continue
-
-                # Pose detection on crop
-                pose_results = pose_detector.process(person_crop)
-                if pose_results.pose_landmarks:
-                    crop_h, crop_w = person_crop.shape[:2]
-                    landmarks = pose_results.pose_landmarks.landmark
-
-                    # Adjust landmarks to be relative to small_frame
-                    for lm in landmarks:
-                        lm.x = (x1 + lm.x * crop_w) / small_w
-                        lm.y = (y1 + lm.y * crop_h) / small_h
-
-                    # Compute coords for drawing (full frame)
-                    coords = []
-                    for lm in landmarks:
-                        x = int(lm.x * frame.shape[1])
-                        y = int(lm.y * frame.shape[0])
-                        coords.append((x, y))
-
-                    people_landmarks.append(landmarks)  
-
-                    # store wrist position in full-frame coords for verification
-                    # choose wrist by visibility if available
-                    try:
-                        rw_idx = mp_pose.PoseLandmark.RIGHT_WRIST.value
-                        lw_idx = mp_pose.PoseLandmark.LEFT_WRIST.value
-                        # pick the wrist with higher visibility if available
-                        vis_r = landmarks[rw_idx].visibility if hasattr(landmarks[rw_idx], 'visibility') else 0.0
-                        vis_l = landmarks[lw_idx].visibility if hasattr(landmarks[lw_idx], 'visibility') else 0.0
-                        wrist_idx = rw_idx if vis_r >= vis_l else lw_idx
-                    except Exception:
-                        wrist_idx = mp_pose.PoseLandmark.RIGHT_WRIST.value
-                    # compute wrist full-frame coord
-                    wlm = landmarks[wrist_idx]
-                    wrist_full = (int(wlm.x * frame.shape[1]), int(wlm.y * frame.shape[0]))
-                    wrist_buffer.append({'ts': ts, 'pos': wrist_full})
-
-                    # Draw bounding box
-                    cv2.rectangle(frame, (int(x1/scale), int(y1/scale)), (int(x2/scale), int(y2/scale)), (0, 255, 0), 2)
-                    cv2.putText(frame, "Person Detected", (int(x1/scale), int(y1/scale) - 10),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-
-                    # Draw skeleton
-                    for connection in mp_pose.POSE_CONNECTIONS:
-                        start_idx, end_idx = connection
-                        if start_idx < len(coords) and end_idx < len(coords):
-                            cv2.line(frame, coords[start_idx], coords[end_idx], (0, 200, 255), 2)
-
-                    # Draw keypoints
-                    for (x, y) in coords:
-                        cv2.circle(frame, (x, y), 3, (0, 165, 255), -1)
-
-                    processed = True
-                    break
-
-        # For shot detection, use the first person's landmarks if any
-        if people_landmarks:
-            # use current ts (captured near frame read)
-            shot = detector.update(people_landmarks[0], frame.shape[1], frame.shape[0], ts)
-            if shot is not None:
-                # verify shot by checking that the ball leaves the hand after the release timestamp
-                try:
-                    release_ts = float(shot['phases']['release']['ts'])
-                except Exception:
-                    release_ts = shot.get('detection_window', {}).get('end', ts)
-
-                # find wrist position nearest to release
-                wrist_at_release = None
-                if wrist_buffer:
-                    wrist_at_release = min(wrist_buffer, key=lambda e: abs(e['ts'] - release_ts))
-
-                # find ball positions after release (+ small epsilon)
-                ball_after = [e for e in list(ball_buffer) if e['ts'] > release_ts + 0.01]
-
-                accepted = False
-                if wrist_at_release and ball_after:
-                    threshold_px = max(40, int(frame.shape[1] * 0.03))
-                    wrist_pos = wrist_at_release['pos']
-                    max_sep = 0.0
-                    for be in ball_after:
-                        sep = ((be['pos'][0] - wrist_pos[0])**2 + (be['pos'][1] - wrist_pos[1])**2)**0.5
-                        if sep > max_sep:
-                            max_sep = sep
-                        if be['ts'] - release_ts > 0.5:
-                            break
-                    if max_sep > threshold_px:
-                        accepted = True
-
-                if accepted:
-                    txt = f"Shot detected: {shot['id'][:8]} dur={shot['detection_window']['duration']:.2f}s"
-                    cv2.putText(frame, txt, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
-
-                    if ts - last_accepted_shot_ts >= SHOT_COOLDOWN_SECONDS:
-                        last_accepted_shot_ts = ts
-                        pending_clip = {
-                            'shot_id': shot.get('id', 'unknown'),
-                            'start_ts': ts - CLIP_PRE_SECONDS,
-                            'end_ts': ts + CLIP_POST_SECONDS,
-                            'saved': False,
-                        }
-                    else:
-                        cooldown_left = SHOT_COOLDOWN_SECONDS - (ts - last_accepted_shot_ts)
-                        cooldown_txt = f"Cooldown active: {cooldown_left:.1f}s"
-                        cv2.putText(frame, cooldown_txt, (10, 55), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 180, 255), 2)
+feedback_worker = threading.Thread(target=_feedback_worker_loop, daemon=True)
+feedback_worker.start()
+# load the model while the camera warms up instead of on the first shot
+get_llm_gateway().warm().add_done_callback(_report_llm_warmup)
+
+
+def _capture_frame():
+    raw_frame = picam2.capture_array()
+    # monotonic, so an NTP step on the Pi can't send frame timestamps backwards
+    # (the time-indexed ball/wrist/JPEG rings need them in order)
+    return {'ts': time.monotonic(), 'raw': raw_frame}
+
+
+def _infer_frame(item):
+    """Detection stage input: the frame with boxes and skeleton drawn, plus what YOLO and pose found."""
+    timer = infer_stage.timer
+    ts = item['ts']
+    frame = cv2.cvtColor(item['raw'], cv2.COLOR_RGBA2BGR)
+    # Resize for speed
+    scale = 0.25
+    small_frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+    small_h, small_w = small_frame.shape[:2]
+    rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+    timer.lap('preprocess')
+
+    # Person and ball detection in one YOLO pass, split by class afterwards
+    detections = person_detector(rgb_small_frame, conf=0.3, classes=[PERSON_CLASS, BALL_CLASS], verbose=False)
+    person_boxes = []
+    ball_boxes = []
+    for det in detections:
+        for box, cls in zip(det.boxes, det.boxes.cls.cpu().numpy().astype(int)):
+            if cls == PERSON_CLASS:
+                person_boxes.append(box)
+            elif cls == BALL_CLASS:
+                ball_boxes.append(box)
+    timer.lap('yolo')
+
+    # extract first detected ball
+    ball_center_full = None
+    if ball_boxes:
+        box = ball_boxes[0]
+        x1b, y1b, x2b, y2b = box.xyxy[0].cpu().numpy()
+        x1b, y1b, x2b, y2b = int(x1b), int(y1b), int(x2b), int(y2b)
+        # center in small frame
+        cx = int((x1b + x2b) / 2)
+        cy = int((y1b + y2b) / 2)
+        # convert to full frame coords
+        full_cx = int(cx / scale)
+        full_cy = int(cy / scale)
+        ball_center_full = (full_cx, full_cy)
+        # draw ball detection
+        cv2.rectangle(frame, (int(x1b/scale), int(y1b/scale)), (int(x2b/scale), int(y2b/scale)), (0, 0, 255), 2)
+        cv2.putText(frame, "Ball", (int(x1b/scale), int(y1b/scale) - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+
+    people_landmarks = []
+    wrist_full = None
+    for box in person_boxes:
+        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
+        x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+
+        # Crop the person
+        person_crop = rgb_small_frame[y1:y2, x1:x2]
+        if person_crop.size == 0:
+            continue
+
+        # Pose detection on crop
+        pose_results = pose_detector.process(person_crop)
+        if pose_results.pose_landmarks:
+            crop_h, crop_w = person_crop.shape[:2]
+            landmarks = pose_results.pose_landmarks.landmark
+
+            # Adjust landmarks to be relative to small_frame
+            for lm in landmarks:
+                lm.x = (x1 + lm.x * crop_w) / small_w
+                lm.y = (y1 + lm.y * crop_h) / small_h
+
+            # Compute coords for drawing (full frame)
+            coords = []
+            for lm in landmarks:
+                x = int(lm.x * frame.shape[1])
+                y = int(lm.y * frame.shape[0])
+                coords.append((x, y))
+
+            people_landmarks.append(landmarks)
+
+            # wrist position in full-frame coords for verification
+            # choose wrist by visibility if available
+            try:
+                rw_idx = mp_pose.PoseLandmark.RIGHT_WRIST.value
+                lw_idx = mp_pose.PoseLandmark.LEFT_WRIST.value
+                # pick the wrist with higher visibility if available
+                vis_r = landmarks[rw_idx].visibility if hasattr(landmarks[rw_idx], 'visibility') else 0.0
+                vis_l = landmarks[lw_idx].visibility if hasattr(landmarks[lw_idx], 'visibility') else 0.0
+                wrist_idx = rw_idx if vis_r >= vis_l else lw_idx
+            except Exception:
+                wrist_idx = mp_pose.PoseLandmark.RIGHT_WRIST.value
+            # compute wrist full-frame coord
+            wlm = landmarks[wrist_idx]
+            wrist_full = (int(wlm.x * frame.shape[1]), int(wlm.y * frame.shape[0]))
+
+            # Draw bounding box
+            cv2.rectangle(frame, (int(x1/scale), int(y1/scale)), (int(x2/scale), int(y2/scale)), (0, 255, 0), 2)
+            cv2.putText(frame, "Person Detected", (int(x1/scale), int(y1/scale) - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+
+            # Draw skeleton
+            for connection in mp_pose.POSE_CONNECTIONS:
+                start_idx, end_idx = connection
+                if start_idx < len(coords) and end_idx < len(coords):
+                    cv2.line(frame, coords[start_idx], coords[end_idx], (0, 200, 255), 2)
+
+            # Draw keypoints
+            for (x, y) in coords:
+                cv2.circle(frame, (x, y), 3, (0, 165, 255), -1)
+
+            break
+    timer.lap('pose')
+
+    return {
+        'ts': ts,
+        'frame': frame,
+        'landmarks': people_landmarks[0] if people_landmarks else None,
+        'ball_pos': ball_center_full,
+        'wrist_pos': wrist_full,
+    }
+
+
+def _write_clip(frames, shot_id):
+    saved_path = _save_clip(frames, shot_id)
+    if saved_path:
+        print(f"Saved shot clip: {saved_path}")
+        try:
+            feedback_queue.put_nowait(shot_id)
+        except queue.Full:
+            print("Feedback queue is full, skipping LLM request for this shot")
+    else:
+        print("Failed to save shot clip")
+
+
+def _detect_frame(item):
+    """Shot detection and the ball-separation check; only this stage touches the ball and wrist buffers."""
+    global last_accepted_shot_ts
+    timer = detect_stage.timer
+    ts = item['ts']
+    frame = item['frame']
+    if item['ball_pos'] is not None:
+        ball_buffer.append(ts, item['ball_pos'])
+    if item['wrist_pos'] is not None:
+        wrist_buffer.append(ts, item['wrist_pos'])
+
+    # For shot detection, use the first person's landmarks if any
+    if item['landmarks'] is not None:
+        # use current ts (captured near frame read)
+        shot = detector.update(item['landmarks'], frame.shape[1], frame.shape[0], ts)
+        if shot is not None:
+            # verify shot by checking that the ball leaves the hand after the release timestamp
+            max_sep = detector.ball_separation(shot)
+            threshold_px = max(40, int(frame.shape[1] * 0.03))
+            accepted = max_sep is not None and max_sep > threshold_px
+
+            if accepted:
+                txt = f"Shot detected: {shot['id'][:8]} dur={shot['detection_window']['duration']:.2f}s"
+                cv2.putText(frame, txt, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+
+                if ts - last_accepted_shot_ts >= SHOT_COOLDOWN_SECONDS:
+                    last_accepted_shot_ts = ts
+                    clip_requests.put({
+                        'shot_id': shot.get('id', 'unknown'),
+                        'start_ts': ts - CLIP_PRE_SECONDS,
+                        'end_ts': ts + CLIP_POST_SECONDS,
+                    })
                 else:
-                    txt = f"Shot ignored (no ball separation)"
-                    cv2.putText(frame, txt, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (100, 100, 100), 2)
-
-        frame_buffer.append({'ts': ts, 'frame': frame.copy()})
-        while frame_buffer and frame_buffer[0]['ts'] < ts - FRAME_BUFFER_SECONDS:
-            frame_buffer.popleft()
-
-        if pending_clip and not pending_clip['saved'] and ts >= pending_clip['end_ts']:
-            clip_frames = [
-                f for f in frame_buffer
-                if pending_clip['start_ts'] <= f['ts'] <= pending_clip['end_ts']
-            ]
-            saved_path = _save_clip(clip_frames, pending_clip['shot_id'])
-            if saved_path:
-                print(f"Saved shot clip: {saved_path}")
-                try:
-                    feedback_queue.put_nowait(pending_clip['shot_id'])
-                except queue.Full:
-                    print("Feedback queue is full, skipping LLM request for this shot")
+                    cooldown_left = SHOT_COOLDOWN_SECONDS - (ts - last_accepted_shot_ts)
+                    cooldown_txt = f"Cooldown active: {cooldown_left:.1f}s"
+                    cv2.putText(frame, cooldown_txt, (10, 55), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 180, 255), 2)
             else:
-                print("Failed to save shot clip")
-            pending_clip['saved'] = True
-            pending_clip = None
+                txt = f"Shot ignored (no ball separation)"
+                cv2.putText(frame, txt, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (100, 100, 100), 2)
+
+    timer.lap('shot')
+    return item
+
+
+def _encode_frame(item):
+    global last_timing_report
+    ret, buffer = cv2.imencode('.jpg', item['frame'])
+    encode_stage.timer.lap('encode')
+    if item['ts'] - last_timing_report >= TIMING_REPORT_SECONDS:
+        last_timing_report = item['ts']
+        stages = pipeline.stats()['stages']
+        print("Live feed: " + " | ".join(f"{name} {s['fps'] or 0:.1f} fps {s['busy_ms'] or 0:.1f} ms"
+                                         for name, s in stages.items()))
+    if not ret:
+        return
+    jpeg = buffer.tobytes()
+    broadcaster.publish(jpeg)
 
-        # Web Stream
-        ret, buffer = cv2.imencode('.jpg', frame)
+    ts = item['ts']
+    frame_buffer.append(ts, jpeg)
+    while True:
+        try:
+            pending_clips.append(clip_requests.get_nowait())
+        except queue.Empty:
+            break
+    for clip in [c for c in pending_clips if ts >= c['end_ts']]:
+        pending_clips.remove(clip)
+        # decoding and writing the mp4 takes longer than a frame, so it runs on the clip writer thread
+        clip_writer.submit(_write_clip, frame_buffer.window(clip['start_ts'], clip['end_ts']), clip['shot_id'])
+    encode_stage.timer.lap('clip')
+
+
+# Capture, inference, detection and encoding each run on their own thread so the
+# camera keeps its frame rate while YOLO and pose work on the previous frame.
+# Every queue drops its oldest frame when the next stage falls behind.
+# The pipeline runs once no matter how many viewers there are; each /video_feed
+# client reads the latest JPEG from the broadcaster and skips what it missed.
+# It only runs while at least one client is connected, so an idle Pi stays cool.
+frames_q = DropOldestQueue(2)
+inferred_q = DropOldestQueue(2)
+detected_q = DropOldestQueue(2)
+capture_stage = Stage('capture', _capture_frame, outbox=frames_q)
+infer_stage = Stage('inference', _infer_frame, inbox=frames_q, outbox=inferred_q)
+detect_stage = Stage('detection', _detect_frame, inbox=inferred_q, outbox=detected_q)
+encode_stage = Stage('encode', _encode_frame, inbox=detected_q)
+pipeline = StagedPipeline(
+    [capture_stage, infer_stage, detect_stage, encode_stage],
+    {'frames': frames_q, 'inferred': inferred_q, 'detected': detected_q},
+)
+# stopping doesn't wait for the stages: the last viewer's request shouldn't hang on an in-flight YOLO pass
+broadcaster = FrameBroadcaster(on_active=pipeline.start, on_idle=lambda: pipeline.stop(timeout=0))
+
+
+def generate_frames():
+    for jpeg in broadcaster.subscribe():
         yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
+               b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
 
 @app.route('/video_feed')
 def video_feed():
     return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route('/stats')
+def stats():
+    return jsonify({**pipeline.stats(), 'viewers': broadcaster.stats(), 'frame_buffer': frame_buffer.stats()})
+
 @app.route('/')
 def index():
     return "<h1>Security Feed (Body Tracking Only)</h1><img src='/video_feed' width='640'>"
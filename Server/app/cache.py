@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from .config import get_env_number
+
+
+# a lowercase hex sha256, as upload and cache keys use
+SHA256_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+def config_fingerprint(config: dict) -> str:
+    """Short stable hash of an analysis config (any JSON-serializable dict)."""
+    blob = json.dumps(config, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()[:16]
+
+
+@lru_cache(maxsize=8)
+def _file_digest(path: str, size: int, mtime_ns: int) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def file_fingerprint(path: str | os.PathLike) -> str | None:
+    """sha256 of a file's contents, recomputed only when its size or mtime changes; None if it is missing."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return _file_digest(str(path), st.st_size, st.st_mtime_ns)
+
+
+class ResultCache:
+    """Two-tier cache of analysis responses keyed by ``<video sha256>-<config fingerprint>``.
+
+    The memory tier is an LRU of ``max_entries`` results. The disk tier keeps
+    one JSON file per key under ``disk_dir`` and evicts the least recently used
+    files (by mtime, refreshed on every hit) once they exceed ``max_disk_bytes``.
+    A ``max_disk_bytes`` of 0 turns the disk tier off.
+    """
+
+    def __init__(self, max_entries: int = 128, disk_dir: Path | None = None, max_disk_bytes: int = 0):
+        self.max_entries = max(0, max_entries)
+        self.disk_dir = Path(disk_dir) if disk_dir is not None and max_disk_bytes > 0 else None
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: OrderedDict[str, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._disk_bytes = sum(p.stat().st_size for p in self.disk_dir.glob("*.json"))
+
+    @staticmethod
+    def key(video_sha256: str, fingerprint: str) -> str:
+        return f"{video_sha256}-{fingerprint}"
+
+    def _path(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.json"
+
+    def get(self, key: str) -> tuple[Any, str | None]:
+        """Returns ``(result, tier)``; ``(None, None)`` on a miss."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits["memory"] += 1
+                return self._memory[key], "memory"
+        if self.disk_dir is not None:
+            path = self._path(key)
+            try:
+                result = json.loads(path.read_text())
+                os.utime(path)
+            except (FileNotFoundError, json.JSONDecodeError):
+                result = None
+            if result is not None:
+                with self._lock:
+                    self.hits["disk"] += 1
+                    self._remember(key, result)
+                return result, "disk"
+        with self._lock:
+            self.misses += 1
+        return None, None
+
+    def _remember(self, key: str, result: Any) -> None:
+        if not self.max_entries:
+            return
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def put(self, key: str, result: Any) -> None:
+        with self._lock:
+            self._remember(key, result)
+        if self.disk_dir is None:
+            return
+        data = json.dumps(result).encode()
+        if len(data) > self.max_disk_bytes:
+            return
+        path = self._path(key)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        with self._lock:
+            old = path.stat().st_size if path.exists() else 0
+            os.replace(tmp, path)
+            self._disk_bytes += len(data) - old
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        files = sorted(self.disk_dir.glob("*.json"), key=lambda p: p.stat().st_mtime_ns)
+        for path in files:
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            size = path.stat().st_size
+            path.unlink(missing_ok=True)
+            self._disk_bytes -= size
+
+    def invalidate(self, video_sha256: str | None = None) -> int:
+        """Drop every entry, or only those for one video; returns how many were removed.
+
+        ``video_sha256`` must be a lowercase hex sha256, since it becomes part of a glob pattern.
+        """
+        if video_sha256 is not None and not SHA256_PATTERN.fullmatch(video_sha256):
+            raise ValueError(f"Not a sha256 hex digest: {video_sha256!r}")
+        prefix = f"{video_sha256}-" if video_sha256 else ""
+        removed = set()
+        with self._lock:
+            for key in [k for k in self._memory if k.startswith(prefix)]:
+                del self._memory[key]
+                removed.add(key)
+            if self.disk_dir is not None:
+                for path in self.disk_dir.glob(f"{prefix}*.json"):
+                    self._disk_bytes -= path.stat().st_size
+                    path.unlink(missing_ok=True)
+                    removed.add(path.stem)
+        return len(removed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "disk_bytes": self._disk_bytes if self.disk_dir is not None else None,
+                "max_disk_bytes": self.max_disk_bytes if self.disk_dir is not None else None,
+                "hits": dict(self.hits),
+                "misses": self.misses,
+            }
+
+
+def _get_cache_dir() -> Path:
+    return Path(os.getenv("ANALYSIS_CACHE_DIR") or Path(__file__).resolve().parents[1] / "cache" / "analysis")
+
+
+@lru_cache
+def get_result_cache() -> ResultCache:
+    entries = get_env_number("ANALYSIS_CACHE_ENTRIES", "128", int)
+    max_mb = get_env_number("ANALYSIS_CACHE_MAX_MB", "512")
+    return ResultCache(entries, _get_cache_dir(), int(max_mb * 1024 * 1024))
+
+
+def _get_feedback_cache_dir() -> Path:
+    return Path(os.getenv("FEEDBACK_CACHE_DIR") or Path(__file__).resolve().parents[1] / "cache" / "feedback")
+
+
+@lru_cache
+def get_feedback_cache() -> ResultCache:
+    """LLM coaching text keyed by a fingerprint of the shot summary, model and prompt version.
+
+    Summaries are built from a handful of bucketed sentences, so the same few
+    keys come up over and over. FEEDBACK_CACHE_MAX_MB=0 keeps it in memory only.
+    """
+    entries = get_env_number("FEEDBACK_CACHE_ENTRIES", "1024", int)
+    max_mb = get_env_number("FEEDBACK_CACHE_MAX_MB", "16")
+    return ResultCache(entries, _get_feedback_cache_dir(), int(max_mb * 1024 * 1024))
@@ -0,0 +1,93 @@
+import os
+import sys
+
+# Allow importing shot_prompt from the Server root
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from shot_prompt import Fact
+
+
+# What the coach says about a strength, keyed by fact topic
+PRAISE = {
+    "elbow_extension": "You finish with a full, straight elbow, which keeps the ball on line.",
+    "knee_bend": "You sit into your legs on the load, so the power comes from the ground up.",
+    "release_height": "You let the ball go above your head, which makes your shot hard to block.",
+    "follow_through": "You hold your follow-through after the release instead of dropping your hand.",
+    "sequencing": "Your legs start the shot before your arm extends, which is the right order.",
+    "wrist_snap": "You snap your wrist through the ball for good backspin.",
+    "balance": "Your head stays still through the shot, so you're on balance when you let it go.",
+}
+
+# What to work on and the drill that fixes it, keyed by fact topic
+DRILLS = {
+    "elbow_extension": (
+        "Reach all the way up and lock your elbow out at the release.",
+        "Do one-hand form shooting from three feet and freeze with your arm straight after every make.",
+    ),
+    "knee_bend": (
+        "Bend your knees more on the load so your legs do more of the work.",
+        "Do 20 chair-touch shots: touch a chair with your seat on the dip, then rise straight into the shot.",
+    ),
+    "release_height": (
+        "Bring your set point up so the ball leaves your hand above your head.",
+        "Shoot from a step in front of a wall or a tall partner so a low release gets blocked.",
+    ),
+    "follow_through": (
+        "Hold your follow-through until the ball hits the rim.",
+        "Do 'reach into the cookie jar' reps: keep your wrist down and arm up for a two-count after each shot.",
+    ),
+    "sequencing": (
+        "Start the shot from your legs before your arm extends.",
+        "Do 'legs only' shots: drive up from a deep bend and let the arm follow only once your knees straighten.",
+    ),
+    "wrist_snap": (
+        "Snap your wrist harder through the ball at release.",
+        "Lie on your back and flick the ball straight up 25 times, making it spin back into your hand.",
+    ),
+    "balance": (
+        "Keep your head still and land where you took off.",
+        "Shoot from a taped spot and check that you land on the same spot every time.",
+    ),
+}
+
+# Fillers for when the shot data doesn't give the coach two of each
+_GENERIC_STRENGTHS = [
+    "You got a full, committed shot off from start to finish.",
+    "You took the shot in rhythm without hesitating.",
+]
+_GENERIC_WORK_ON = [
+    ("Keep building the same form so it repeats under pressure.",
+     "Make 25 shots from each block before moving back, using the same motion every time."),
+    ("Film your shot from the side with your whole body in frame so every part of it can be checked.",
+     "Take ten shots from the free-throw line with the camera at hip height."),
+]
+
+
+def rule_based_feedback(facts: list[Fact]) -> str:
+    """Deterministic coaching text in the same OVERALL / STRENGTHS / WORK ON layout the LLM is asked for."""
+    coached = [f for f in facts if f.topic in DRILLS]
+    strengths = [f for f in coached if f.verdict == "good"]
+    work_on = [f for f in coached if f.verdict == "poor"] + [f for f in coached if f.verdict == "fair"]
+
+    if not strengths and not work_on:
+        overall = "We couldn't see enough of your shot to judge the details, so here are the basics to keep working on."
+    elif not work_on:
+        overall = "That's a clean, repeatable shot — everything we could see checked out."
+    elif len(strengths) >= len(work_on):
+        overall = "You have a solid foundation; clean up a couple of details and this shot gets more consistent."
+    else:
+        overall = "There's a good shot to build on here — focus on the basics below and the rest will follow."
+    if any(f.topic == "guardrail" for f in facts):
+        overall += " Part of your body was out of view, so this covers only what the camera could see."
+
+    strength_lines = ([PRAISE[f.topic] for f in strengths] + _GENERIC_STRENGTHS)[:2]
+    work_lines = [" ".join(advice) for advice in ([DRILLS[f.topic] for f in work_on] + _GENERIC_WORK_ON)[:2]]
+
+    return "\n".join([
+        f"OVERALL: {overall}",
+        "",
+        "STRENGTHS:",
+        *(f"- {line}" for line in strength_lines),
+        "",
+        "WORK ON:",
+        *(f"- {line}" for line in work_lines),
+    ])
@@ -0,0 +1,19 @@
+import os
+from typing import Callable, TypeVar
+
+
+T = TypeVar("T", int, float)
+
+
+def get_env_number(name: str, default: str, cast: Callable[[str], T] = float) -> T:
+    """``cast`` applied to the environment variable ``name`` (``default`` when unset).
+
+    Read on every call so values loaded from ``.env`` after import still apply;
+    a value ``cast`` can't parse raises RuntimeError naming the variable.
+    """
+    raw = os.getenv(name, default)
+    try:
+        return cast(raw)
+    except ValueError:
+        kind = "an integer" if cast is int else "a number"
+        raise RuntimeError(f"{name} must be {kind}, got {raw!r}")
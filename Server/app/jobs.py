@@ -0,0 +1,272 @@
+import json
+import logging
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable
+
+from .config import get_env_number
+
+
+ProgressFn = Callable[[dict], None]
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(RuntimeError):
+    """Raised by ``JobManager.submit`` when the backlog of unfinished jobs is at its limit."""
+
+
+class JobStore:
+    """Job records persisted as ``<root>/<job_id>/job.json``, next to any files the job owns.
+
+    Writes go through a temp file and ``os.replace`` so a crash never leaves a
+    half-written record behind.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def job_dir(self, job_id: str) -> Path:
+        return self.root / job_id
+
+    def save(self, job: dict) -> None:
+        path = self.job_dir(job["id"]) / "job.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".json.tmp")
+        with self._lock:
+            tmp.write_text(json.dumps(job))
+            os.replace(tmp, path)
+
+    def load(self, job_id: str) -> dict | None:
+        # job ids are generated uuids; refuse anything that could step outside the store
+        if not job_id or "/" in job_id or "\\" in job_id or job_id.startswith("."):
+            return None
+        try:
+            return json.loads((self.job_dir(job_id) / "job.json").read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def delete(self, job_id: str) -> None:
+        shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+
+    def all(self) -> list[dict]:
+        jobs = []
+        for entry in self.root.iterdir():
+            job = self.load(entry.name) if entry.is_dir() else None
+            if job is not None:
+                jobs.append(job)
+        return jobs
+
+
+_UNFINISHED = ("queued", "running")
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name != "posix":
+        # os.kill would terminate the process on Windows; rely on the heartbeat there
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobManager:
+    """Runs submitted jobs on a bounded thread pool and tracks them in a ``JobStore``.
+
+    ``concurrency`` jobs run at once per process. A finished job is deleted
+    ``ttl_s`` after its result was first fetched; one nobody fetches is kept
+    for ``unfetched_ttl_s`` after it finished.
+
+    Several worker processes may share one store. Every job record names the
+    manager that owns it, and a background thread refreshes the heartbeat of
+    the manager's unfinished jobs every ``heartbeat_s``. The same thread fails
+    jobs whose owner is gone and deletes expired ones. An owner is gone when its
+    heartbeat is older than ``stale_after_s`` or its process no longer exists
+    on this host. ``max_pending`` caps the unfinished jobs of all live owners,
+    so ``submit`` raises ``QueueFullError`` once the whole deployment is at the
+    limit.
+    """
+
+    def __init__(self, store: JobStore, concurrency: int = 1, max_pending: int = 16, ttl_s: float = 3600.0,
+                 unfetched_ttl_s: float = 7 * 24 * 3600.0, heartbeat_s: float = 30.0,
+                 stale_after_s: float | None = None):
+        self.store = store
+        self.concurrency = max(1, concurrency)
+        self.max_pending = max(1, max_pending)
+        self.ttl_s = ttl_s
+        self.unfetched_ttl_s = unfetched_ttl_s
+        self.heartbeat_s = heartbeat_s
+        self.stale_after_s = 3 * heartbeat_s if stale_after_s is None else stale_after_s
+        self.host = socket.gethostname()
+        self.owner = {"host": self.host, "pid": os.getpid(), "token": uuid.uuid4().hex}
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="analysis-job")
+        self._lock = threading.Lock()
+        self._live: dict[str, dict] = {}
+        self._stop = threading.Event()
+        self.maintain()
+        self._maintainer = threading.Thread(target=self._maintain_loop, name="analysis-job-maintenance",
+                                            daemon=True)
+        self._maintainer.start()
+
+    def _owner_gone(self, job: dict, now: float) -> bool:
+        owner = job.get("owner") or {}
+        if owner.get("token") == self.owner["token"]:
+            return False
+        if owner.get("host") == self.host and owner.get("pid") is not None and not _pid_alive(owner["pid"]):
+            return True
+        heartbeat = job.get("heartbeat_at") or job.get("started_at") or job.get("created_at") or 0.0
+        return now - heartbeat > self.stale_after_s
+
+    def _expired(self, job: dict, now: float) -> bool:
+        if job["status"] in _UNFINISHED or job.get("finished_at") is None:
+            return False
+        if job.get("fetched_at") is not None:
+            return now - job["fetched_at"] > self.ttl_s
+        return now - job["finished_at"] > self.unfetched_ttl_s
+
+    def maintain(self, now: float | None = None) -> dict:
+        """Refresh this manager's heartbeats, fail orphaned jobs and delete expired ones."""
+        now = time.time() if now is None else now
+        with self._lock:
+            live = list(self._live.values())
+        for job in live:
+            job["heartbeat_at"] = now
+            self.store.save(job)
+        recovered = purged = 0
+        for job in self.store.all():
+            if job["status"] in _UNFINISHED:
+                if self._owner_gone(job, now):
+                    job.update(status="failed", error="Interrupted by a server restart", finished_at=now)
+                    self.store.save(job)
+                    recovered += 1
+            elif self._expired(job, now):
+                self.store.delete(job["id"])
+                purged += 1
+        return {"recovered": recovered, "purged": purged}
+
+    def _maintain_loop(self) -> None:
+        while not self._stop.wait(self.heartbeat_s):
+            try:
+                self.maintain()
+            except Exception:
+                logger.exception("Job maintenance failed")
+
+    def _count_pending(self, now: float) -> int:
+        return sum(1 for job in self.store.all() if job["status"] in _UNFINISHED and not self._owner_gone(job, now))
+
+    def submit(self, fn: Callable[..., Any], *args: Any, kind: str = "job", job_id: str | None = None) -> dict:
+        """Queue ``fn(*args, progress=...)``; its return value becomes the job result.
+
+        Pass ``job_id`` when files for the job were already placed in
+        ``store.job_dir(job_id)`` (see ``new_job_id``).
+        """
+        now = time.time()
+        job = {
+            "id": job_id or self.new_job_id(),
+            "kind": kind,
+            "status": "queued",
+            "progress": {},
+            "owner": self.owner,
+            "heartbeat_at": now,
+            "created_at": now,
+            "started_at": None,
+            "finished_at": None,
+            "fetched_at": None,
+            "error": None,
+            "result": None,
+        }
+        with self._lock:
+            pending = self._count_pending(now)
+            if pending >= self.max_pending:
+                raise QueueFullError(f"{pending} jobs are already waiting or running")
+            self.store.save(job)
+            self._live[job["id"]] = job
+        try:
+            self._executor.submit(self._run, job, fn, args)
+        except BaseException:
+            with self._lock:
+                self._live.pop(job["id"], None)
+            self.store.delete(job["id"])
+            raise
+        return job
+
+    @staticmethod
+    def new_job_id() -> str:
+        return uuid.uuid4().hex
+
+    def _run(self, job: dict, fn: Callable[..., Any], args: tuple) -> None:
+        def progress(update: dict) -> None:
+            job["progress"] = {**job["progress"], **update}
+            self.store.save(job)
+
+        try:
+            job.update(status="running", started_at=time.time())
+            self.store.save(job)
+            result = fn(*args, progress=progress)
+            job.update(status="succeeded", result=result)
+        except Exception as exc:
+            job.update(status="failed", error=getattr(exc, "detail", None) or str(exc) or type(exc).__name__)
+        finally:
+            job["finished_at"] = time.time()
+            self.store.save(job)
+            with self._lock:
+                self._live.pop(job["id"], None)
+
+    def get(self, job_id: str) -> dict | None:
+        job = self.store.load(job_id)
+        if job is not None and self._expired(job, time.time()):
+            self.store.delete(job_id)
+            return None
+        return job
+
+    def mark_fetched(self, job: dict) -> None:
+        if job.get("fetched_at") is None:
+            job["fetched_at"] = time.time()
+            self.store.save(job)
+
+    def purge_expired(self, now: float | None = None) -> int:
+        now = time.time() if now is None else now
+        purged = 0
+        for job in self.store.all():
+            if self._expired(job, now):
+                self.store.delete(job["id"])
+                purged += 1
+        return purged
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._live)
+        return {"concurrency": self.concurrency, "max_pending": self.max_pending, "pending": pending}
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._stop.set()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def _get_jobs_dir() -> Path:
+    return Path(os.getenv("ANALYSIS_JOBS_DIR") or Path(__file__).resolve().parents[1] / "jobs")
+
+
+@lru_cache
+def get_job_manager() -> JobManager:
+    return JobManager(
+        JobStore(_get_jobs_dir()),
+        concurrency=get_env_number("ANALYSIS_JOB_CONCURRENCY", "1", int),
+        max_pending=get_env_number("ANALYSIS_JOB_MAX_PENDING", "16", int),
+        ttl_s=get_env_number("ANALYSIS_JOB_TTL_S", "3600"),
+        unfetched_ttl_s=get_env_number("ANALYSIS_JOB_UNFETCHED_TTL_S", "604800"),
+        heartbeat_s=get_env_number("ANALYSIS_JOB_HEARTBEAT_S", "30"),
+    )
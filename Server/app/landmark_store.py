@@ -0,0 +1,100 @@
+import json
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class LandmarkRecord:
+    """Pose landmarks of one video: ``landmarks`` is (T, 33, 4) normalized x, y, z, visibility, ``ts`` (T,) seconds.
+
+    Arrays loaded from a ``LandmarkStore`` are read-only memory maps.
+    """
+    key: str
+    landmarks: np.ndarray
+    ts: np.ndarray
+    meta: dict
+
+    @property
+    def frame_w(self) -> int:
+        return self.meta["frame_w"]
+
+    @property
+    def frame_h(self) -> int:
+        return self.meta["frame_h"]
+
+
+class LandmarkStore:
+    """Per-video pose landmarks saved as ``<root>/<key>/{landmarks.npy, timestamps.npy, meta.json}``.
+
+    Keys are ``<video sha256>-<pose fingerprint>``, the fingerprint covering
+    whatever changes the landmarks themselves (model file, sampling, inference
+    size) but not the shot detector, so detector and scoring changes can be
+    replayed over stored landmarks. Entries are written to a temp directory
+    and renamed into place, so readers never see half an entry.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(video_sha256: str, fingerprint: str) -> str:
+        return f"{video_sha256}-{fingerprint}"
+
+    def save(self, key: str, landmarks: np.ndarray, ts: np.ndarray, meta: dict) -> None:
+        landmarks = np.asarray(landmarks, dtype=np.float32).reshape(-1, 33, 4)
+        ts = np.asarray(ts, dtype=np.float64)
+        if len(landmarks) != len(ts):
+            raise ValueError(f"{len(landmarks)} landmark rows but {len(ts)} timestamps")
+        tmp = Path(tempfile.mkdtemp(prefix=f".{key}-", dir=self.root))
+        try:
+            np.save(tmp / "landmarks.npy", landmarks)
+            np.save(tmp / "timestamps.npy", ts)
+            (tmp / "meta.json").write_text(json.dumps({**meta, "frames": len(ts)}))
+            dest = self.root / key
+            if dest.exists():
+                shutil.rmtree(dest)
+            os.replace(tmp, dest)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+    def load(self, key: str) -> LandmarkRecord | None:
+        path = self.root / key
+        try:
+            meta = json.loads((path / "meta.json").read_text())
+            landmarks = np.load(path / "landmarks.npy", mmap_mode="r") if meta["frames"] else np.empty((0, 33, 4), np.float32)
+            ts = np.load(path / "timestamps.npy", mmap_mode="r") if meta["frames"] else np.empty(0)
+        except (FileNotFoundError, NotADirectoryError, json.JSONDecodeError, KeyError, ValueError):
+            return None
+        return LandmarkRecord(key, landmarks, ts, meta)
+
+    def delete(self, key: str) -> None:
+        shutil.rmtree(self.root / key, ignore_errors=True)
+
+    def keys(self, video_sha256: str | None = None) -> list[str]:
+        prefix = f"{video_sha256}-" if video_sha256 else ""
+        return sorted(p.name for p in self.root.iterdir()
+                      if p.is_dir() and not p.name.startswith(".") and p.name.startswith(prefix))
+
+    def __iter__(self) -> Iterator[LandmarkRecord]:
+        for key in self.keys():
+            record = self.load(key)
+            if record is not None:
+                yield record
+
+
+def _get_landmarks_dir() -> Path:
+    return Path(os.getenv("ANALYSIS_LANDMARKS_DIR") or Path(__file__).resolve().parents[1] / "cache" / "landmarks")
+
+
+@lru_cache
+def get_landmark_store() -> LandmarkStore:
+    return LandmarkStore(_get_landmarks_dir())
@@ -1,12 +1,24 @@
+import logging
 import os
+import sys
+import threading
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+
+# Allow importing llm_gateway from the Server root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from llm_gateway import get_llm_gateway
 
 from .routes.auth import router as auth_router
 from .routes.analysis import router as analysis_router
+from .jobs import get_job_manager
+from .pose_pool import get_pose_pool
+from .uploads import UploadSizeLimitMiddleware
 
 
 load_dotenv(Path(__file__).resolve().parents[1] / ".env")
@@ -16,12 +28,43 @@ def _get_cors_origins() -> list[str]:
     raw_origins = os.getenv("CORS_ORIGINS", "http://localhost:3000")
     return [origin.strip() for origin in raw_origins.split(",") if origin.strip()]
 
+
+logger = logging.getLogger(__name__)
+
+
+def _warm_pose_pool() -> None:
+    try:
+        get_pose_pool().warm()
+    except Exception:
+        logger.exception("Pose landmarker pool failed to warm up")
+
+
+def _log_llm_warmup(future) -> None:
+    if future.exception() is not None:
+        logger.warning("Could not preload the LLM, the first feedback request will load it: %s", future.exception())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # warm in the background so /health answers while models load; /ready flips once they have
+    threading.Thread(target=_warm_pose_pool, name="pose-pool-warmup", daemon=True).start()
+    get_llm_gateway().warm().add_done_callback(_log_llm_warmup)
+    yield
+    if get_job_manager.cache_info().currsize:
+        get_job_manager().shutdown()
+    get_pose_pool().close()
+    get_llm_gateway().close()
+
+
 app = FastAPI(
     title="AirBall API",
     description="Backend API for AirBall application",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
+# Added first so it runs inside CORS and its 413s still carry the CORS headers
+app.add_middleware(UploadSizeLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=_get_cors_origins(),
@@ -36,4 +79,13 @@ app.include_router(analysis_router)
 
 @app.get("/health")
 def health_check():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+def readiness_check():
+    pool = get_pose_pool().stats()
+    if not pool["ready"]:
+        state = "failed" if pool["error"] else "warming"
+        return JSONResponse(status_code=503, content={"status": state, "pose_pool": pool})
+    return {"status": "ready", "pose_pool": pool}
@@ -0,0 +1,242 @@
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import numpy as np
+
+from .config import get_env_number
+
+
+MODEL_PATH = Path(__file__).resolve().parents[1] / "pose_landmarker_lite.task"
+
+
+def _get_pool_size() -> int:
+    return max(1, get_env_number("POSE_POOL_SIZE", "2", int))
+
+
+def create_landmarker(model_path: Path = MODEL_PATH) -> Any:
+    """Build a VIDEO-mode PoseLandmarker from the bundled model file."""
+    import mediapipe as mp
+
+    if not model_path.exists():
+        raise FileNotFoundError(f"Pose model not found at {model_path}. Download pose_landmarker_lite.task.")
+    options = mp.tasks.vision.PoseLandmarkerOptions(
+        base_options=mp.tasks.BaseOptions(model_asset_path=str(model_path)),
+        running_mode=mp.tasks.vision.RunningMode.VIDEO,
+        num_poses=1,
+        min_pose_detection_confidence=0.3,
+    )
+    return mp.tasks.vision.PoseLandmarker.create_from_options(options)
+
+
+def _warm_landmarker(landmarker: Any) -> None:
+    import mediapipe as mp
+
+    # one inference on a blank frame initializes the graph and its buffers
+    blank = np.zeros((256, 256, 3), dtype=np.uint8)
+    landmarker.detect_for_video(mp.Image(image_format=mp.ImageFormat.SRGB, data=blank), 0)
+
+
+class PooledLandmarker:
+    """A warmed PoseLandmarker checked out for a single video.
+
+    The warm-up inference already used a timestamp, and MediaPipe rejects one
+    that is not greater than the previous, so the video's own timestamps are
+    shifted past the warm-up.
+    """
+
+    def __init__(self, landmarker: Any, first_ts_ms: int = 0):
+        self.landmarker = landmarker
+        self._first_ts_ms = first_ts_ms
+
+    def detect_for_video(self, image: Any, timestamp_ms: int) -> Any:
+        return self.landmarker.detect_for_video(image, self._first_ts_ms + int(timestamp_ms))
+
+    def close(self) -> None:
+        self.landmarker.close()
+
+
+class LandmarkerPool:
+    """Process-wide pool of pre-initialized PoseLandmarkers.
+
+    Landmarkers are created lazily up to ``size`` (or all at once by ``warm``) and
+    each one serves a single analysis via ``checkout``. VIDEO mode carries pose
+    tracking state from frame to frame, so a landmarker that served one video
+    would skew the landmarks of the next; it is closed when its checkout ends and
+    a fresh one is created and warmed in its place, on a background thread unless
+    ``refill_in_background`` is off. A landmarker whose caller raised is only
+    closed, and its replacement is created on a later checkout.
+    """
+
+    def __init__(self, size: int, factory: Callable[[], Any] = create_landmarker,
+                 warmer: Callable[[Any], None] | None = _warm_landmarker, refill_in_background: bool = True):
+        self.size = size
+        self._factory = factory
+        self._warmer = warmer
+        self._refill_in_background = refill_in_background
+        self._closed = False
+        self._idle: queue.LifoQueue[PooledLandmarker] = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_total_s = 0.0
+        self._wait_max_s = 0.0
+        self._ready = False
+        self._error: str | None = None
+        self._refill_error: str | None = None
+
+    def _create(self) -> PooledLandmarker:
+        landmarker = self._factory()
+        if self._warmer is not None:
+            self._warmer(landmarker)
+        # the warm-up inference used timestamp 0
+        return PooledLandmarker(landmarker, first_ts_ms=1)
+
+    def _reserve_slot(self) -> bool:
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return True
+            return False
+
+    def _release_slot(self) -> None:
+        with self._lock:
+            self._created -= 1
+
+    def _refill(self) -> None:
+        if self._closed or not self._reserve_slot():
+            return
+        try:
+            pooled = self._create()
+            self._refill_error = None
+        except Exception as exc:
+            # the slot is free again, so the next checkout retries the creation itself
+            self._release_slot()
+            self._refill_error = str(exc)
+            return
+        if self._closed:
+            self._release_slot()
+            pooled.close()
+        else:
+            self._idle.put(pooled)
+
+    def warm(self) -> None:
+        """Create and warm every landmarker up front; records readiness or the failure."""
+        try:
+            while self._reserve_slot():
+                try:
+                    self._idle.put(self._create())
+                except Exception:
+                    self._release_slot()
+                    raise
+        except Exception as exc:
+            self._error = str(exc)
+            self._ready = False
+            raise
+        self._error = None
+        self._ready = True
+
+    def _acquire(self, start: float, timeout: float | None) -> PooledLandmarker:
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            if self._reserve_slot():
+                try:
+                    return self._create()
+                except Exception:
+                    self._release_slot()
+                    raise
+            # poll so a slot freed by a discarded landmarker is noticed too
+            wait = 0.05
+            if timeout is not None:
+                remaining = start + timeout - time.perf_counter()
+                if remaining <= 0:
+                    raise TimeoutError("No pose landmarker became available in time")
+                wait = min(wait, remaining)
+            try:
+                return self._idle.get(timeout=wait)
+            except queue.Empty:
+                continue
+
+    @contextmanager
+    def checkout(self, timeout: float | None = None) -> Iterator[PooledLandmarker]:
+        start = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
+        try:
+            pooled = self._acquire(start, timeout)
+        finally:
+            waited = time.perf_counter() - start
+            with self._lock:
+                self._waiting -= 1
+                self._waits += 1
+                self._wait_total_s += waited
+                self._wait_max_s = max(self._wait_max_s, waited)
+
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+        healthy = False
+        try:
+            yield pooled
+            healthy = True
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._release_slot()
+            try:
+                pooled.close()
+            except Exception:
+                pass
+            if healthy:
+                if self._refill_in_background:
+                    threading.Thread(target=self._refill, name="pose-pool-refill", daemon=True).start()
+                else:
+                    self._refill()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "wait_total_s": round(self._wait_total_s, 6),
+                "wait_max_s": round(self._wait_max_s, 6),
+                "wait_avg_s": round(self._wait_total_s / self._waits, 6) if self._waits else 0.0,
+                "ready": self._ready,
+                "error": self._error,
+                "refill_error": self._refill_error,
+            }
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._release_slot()
+            pooled.close()
+        self._ready = False
+
+
+@lru_cache
+def get_pose_pool() -> LandmarkerPool:
+    return LandmarkerPool(_get_pool_size())
@@ -0,0 +1,42 @@
+"""Re-score every video in the landmark store with the current detector and scoring code.
+
+Replays stored pose landmarks through shot detection, ``_derive_scores`` and
+``_build_shot_summary`` without decoding video, running MediaPipe or calling
+the LLM, and writes one JSON line per video:
+
+    python -m app.rescore > rescored.jsonl
+"""
+import argparse
+import json
+import sys
+import time
+
+from .landmark_store import LandmarkStore, get_landmark_store
+from .routes.analysis import _rescore
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--store", help="landmark store directory (default: ANALYSIS_LANDMARKS_DIR)")
+    parser.add_argument("--out", help="write JSON lines here instead of stdout")
+    args = parser.parse_args(argv)
+
+    store = LandmarkStore(args.store) if args.store else get_landmark_store()
+    out = open(args.out, "w") if args.out else sys.stdout
+    videos = shots = 0
+    start = time.perf_counter()
+    try:
+        for record in store:
+            rescored = _rescore(record)
+            out.write(json.dumps({"key": record.key, "meta": record.meta, "shots": rescored}) + "\n")
+            videos += 1
+            shots += len(rescored)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"re-scored {videos} videos, {shots} shots in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
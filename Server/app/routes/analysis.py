@@ -1,43 +1,61 @@
+import asyncio
 import json
 import os
 import sys
 import tempfile
-from dataclasses import dataclass
+from contextlib import aclosing
+from typing import AsyncIterator
 
 import cv2
 import numpy as np
-import ollama
-import mediapipe as mp
-from fastapi import APIRouter, HTTPException, UploadFile, File, status
+from fastapi import APIRouter, HTTPException, Request, UploadFile, File, Query, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
 # Allow importing shot_detector from the Server root
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+from llm_gateway import LLM_MODEL, get_llm_gateway
 from shot_detector import ShotDetector
+from shot_prompt import coaching_prompt, shot_facts, shot_summary
+
+from ..cache import SHA256_PATTERN, config_fingerprint, file_fingerprint, get_feedback_cache, get_result_cache
+from ..config import get_env_number
+from ..coach import rule_based_feedback
+from ..jobs import ProgressFn, QueueFullError, get_job_manager
+from ..landmark_store import LandmarkRecord, get_landmark_store
+from ..pose_pool import MODEL_PATH, get_pose_pool
+from ..uploads import save_upload
+from ..video_pipeline import SAMPLING_MODES, get_default_sampling, get_max_inference_side, infer_landmarks
+from ..video_segments import infer_landmarks_segmented, segmenting_config
 
 router = APIRouter(prefix="/analyze", tags=["analysis"])
 
-LLM_MODEL = "gemma3:1b"
+# Bump when the coaching prompt changes (invalidates cached feedback and results)
+PROMPT_VERSION = 1
 
-# Path to the PoseLandmarker model file
-_MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "pose_landmarker_lite.task")
+# Bump when a code change alters analysis results for the same video and settings (invalidates cached results)
+ANALYSIS_VERSION = 1
 
+def _get_pool_checkout_timeout_s() -> float:
+    """How long an upload waits for a free pose landmarker before giving up with 503."""
+    return get_env_number("POSE_POOL_CHECKOUT_TIMEOUT_S", "120")
 
-@dataclass
-class _FakeLandmark:
-    """Mimic the old mp.solutions.pose landmark interface for ShotDetector compatibility."""
-    x: float
-    y: float
-    z: float
-    visibility: float
 
+def _get_llm_budget_s() -> float:
+    """How long one request's feedback stage may wait on the LLM before the rule-based coach takes over."""
+    return get_env_number("LLM_BUDGET_S", "15")
 
-def _process_video(file_path: str) -> list[dict]:
-    """Run MediaPipe PoseLandmarker + ShotDetector on every frame of a video file."""
-    model_path = os.path.abspath(_MODEL_PATH)
-    if not os.path.exists(model_path):
+
+def _infer_video(file_path: str, stats: dict, sampling: str) -> tuple[np.ndarray, np.ndarray, dict]:
+    """Run MediaPipe PoseLandmarker over a video file.
+
+    Returns the (T, 33, 4) normalized landmarks and (T,) timestamps of the
+    frames with a pose, plus the video's fps and frame size.
+    """
+    if not MODEL_PATH.exists():
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Pose model not found at {model_path}. Download pose_landmarker_lite.task.",
+            detail=f"Pose model not found at {MODEL_PATH}. Download pose_landmarker_lite.task.",
         )
 
     cap = cv2.VideoCapture(file_path)
@@ -50,54 +68,78 @@ def _process_video(file_path: str) -> list[dict]:
     fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
     frame_w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     frame_h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    meta = {"fps": fps, "frame_w": frame_w, "frame_h": frame_h}
 
-    # Create PoseLandmarker using Tasks API
-    options = mp.tasks.vision.PoseLandmarkerOptions(
-        base_options=mp.tasks.BaseOptions(model_asset_path=model_path),
-        running_mode=mp.tasks.vision.RunningMode.VIDEO,
-        num_poses=1,
-        min_pose_detection_confidence=0.3,
-    )
-    landmarker = mp.tasks.vision.PoseLandmarker.create_from_options(options)
-
-    detector = ShotDetector()
-    shots: list[dict] = []
-    frame_idx = 0
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        ts = frame_idx / fps
-        timestamp_ms = int(frame_idx * 1000 / fps)
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb)
-
-        result = landmarker.detect_for_video(mp_image, timestamp_ms)
-
-        if result.pose_landmarks and len(result.pose_landmarks) > 0:
-            raw_landmarks = result.pose_landmarks[0]
-            # Convert NormalizedLandmark to objects with .x, .y, .z, .visibility
-            landmarks = [
-                _FakeLandmark(
-                    x=lm.x,
-                    y=lm.y,
-                    z=lm.z,
-                    visibility=lm.visibility if lm.visibility is not None else 0.0,
-                )
-                for lm in raw_landmarks
-            ]
-
-            shot = detector.update(landmarks, frame_w, frame_h, ts)
-            if shot is not None:
-                shots.append(shot)
-
-        frame_idx += 1
-
-    cap.release()
-    landmarker.close()
-    return shots
+    segmenting = segmenting_config(sampling)
+    try:
+        # a segmented run holds a pool slot too, so it waits its turn and shows up in the pool stats
+        with get_pose_pool().checkout(timeout=_get_pool_checkout_timeout_s()) as landmarker:
+            if segmenting is not None and total_frames > segmenting["segment_s"] * fps:
+                # long upload: infer its segments in parallel worker processes, then stitch the landmarks
+                cap.release()
+                landmarks, timestamps = infer_landmarks_segmented(
+                    file_path, fps, total_frames, sampling=sampling, stats=stats,
+                    segment_s=segmenting["segment_s"], warmup_s=segmenting["warmup_s"])
+                return landmarks, timestamps, meta
+            rows, timestamps = infer_landmarks(cap, landmarker, fps, sampling=sampling, stats=stats)
+    except TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="All pose landmarkers are busy, try again shortly",
+        )
+    finally:
+        cap.release()
+
+    landmarks = np.stack(rows) if rows else np.empty((0, 33, 4), dtype=np.float32)
+    return landmarks, np.array(timestamps, dtype=np.float64), meta
+
+
+def _detect_shots(landmarks: np.ndarray, timestamps: np.ndarray, frame_w: int, frame_h: int,
+                  save_shots: bool = True) -> list[dict]:
+    if not len(landmarks):
+        return []
+    # the whole clip is available, so detect every shot in one vectorized pass
+    return ShotDetector(save_shots=save_shots).detect_all(landmarks, timestamps, frame_w, frame_h)
+
+
+def _process_video(file_path: str, stats: dict | None = None, sampling: str = "full",
+                   video_sha256: str | None = None) -> list[dict]:
+    """Pose landmarks for a video file, then shot detection over them in one batch.
+
+    ``sampling`` selects every-frame or adaptive inference; frame counters are
+    written into ``stats`` when given. With the video's ``video_sha256`` the
+    landmarks are taken from (or saved to) the landmark store, so a repeat only
+    re-runs shot detection.
+    """
+    stats = {} if stats is None else stats
+    store = get_landmark_store() if video_sha256 else None
+    key = store.key(video_sha256, config_fingerprint(_pose_config(sampling))) if store else None
+    record = store.load(key) if store else None
+
+    if record is not None:
+        stats.update({**record.meta.get("stats", {}), "landmarks": "replayed"})
+        return _detect_shots(record.landmarks, record.ts, record.frame_w, record.frame_h)
+
+    landmarks, timestamps, meta = _infer_video(file_path, stats, sampling)
+    stats["landmarks"] = "inferred"
+    if store:
+        store.save(key, landmarks, timestamps, {**meta, "stats": dict(stats)})
+    return _detect_shots(landmarks, timestamps, meta["frame_w"], meta["frame_h"])
+
+
+def _rescore(record: LandmarkRecord) -> list[dict]:
+    """Re-run shot detection, scoring and summaries over stored landmarks (no decoding, inference or LLM)."""
+    return [
+        {
+            "shot_id": shot.get("id"),
+            "scores": _derive_scores(shot),
+            "summary": _build_shot_summary(shot),
+            "shot_data": shot,
+        }
+        # a replay must not leave a fresh Shots/shot_<uuid>.json behind for every shot it re-scores
+        for shot in _detect_shots(record.landmarks, record.ts, record.frame_w, record.frame_h, save_shots=False)
+    ]
 
 
 def _derive_scores(shot: dict) -> dict:
@@ -133,188 +175,423 @@ def _derive_scores(shot: dict) -> dict:
 
 def _build_shot_summary(shot: dict) -> str:
     """Convert raw shot data into a human-readable summary the LLM can reason about."""
-    lines = []
-
-    # Data quality context
-    quality = shot.get("data_quality", {})
-    confidence = quality.get("confidence", "unknown")
-    occlusion = quality.get("occlusion_flags", {})
-    lines.append(f"Tracking confidence: {confidence}")
-    if occlusion.get("lower_body_occluded"):
-        lines.append("Lower body was not fully visible — no leg drive or knee data available.")
-    if occlusion.get("upper_body_occluded"):
-        lines.append("Upper body was partially occluded.")
-
-    # Elbow mechanics
-    elbow = shot.get("metrics", {}).get("angles", {}).get("elbow", {})
-    set_deg = elbow.get("at_set_deg")
-    release_deg = elbow.get("at_release_deg")
-    if set_deg is not None:
-        if set_deg < 70:
-            lines.append("Elbow is very bent at the set point — arm is compact")
-        elif set_deg < 100:
-            lines.append("Elbow is moderately bent at the set point")
-        else:
-            lines.append("Elbow is fairly open at the set point")
-    if release_deg is not None:
-        if release_deg < 140:
-            lines.append("Elbow did not fully extend at release — arm is still too bent when letting go of the ball")
-        elif release_deg < 160:
-            lines.append("Elbow extension at release is decent but could be straighter")
-        else:
-            lines.append("Good full elbow extension at release")
-
-    # Knee mechanics (if available)
-    knee = shot.get("metrics", {}).get("angles", {}).get("knee", {})
-    knee_load = knee.get("min_during_load_deg")
-    if knee_load is not None:
-        if knee_load < 120:
-            lines.append("Good deep knee bend during the load phase — getting power from the legs")
-        elif knee_load < 150:
-            lines.append("Moderate knee bend during load — could bend a bit more for extra power")
-        else:
-            lines.append("Barely any knee bend during load — not using legs enough")
-
-    # Release point
-    release = shot.get("metrics", {}).get("release", {})
-    above_head = release.get("wrist_above_head_norm")
-    if above_head is not None:
-        if above_head > 0:
-            lines.append("Release point is BELOW the head — should aim to release above the head")
-        else:
-            lines.append("Release point is above the head — good release height")
-
-    # Follow-through
-    ft = shot.get("metrics", {}).get("follow_through", {})
-    hold = ft.get("hold_duration_s")
-    if hold is not None:
-        if hold < 0.05:
-            lines.append("No follow-through hold detected — hand dropped immediately after release")
-        elif hold < 0.15:
-            lines.append("Very short follow-through — hand drops too quickly after release")
-        else:
-            lines.append("Good follow-through hold — hand stays up after release")
-
-    # Timing / leg drive
-    timing = shot.get("timing", {})
-    leg_drive = timing.get("leg_drive_before_arm_extension")
-    if leg_drive is True:
-        lines.append("Good sequencing: legs drive before arm extension")
-    elif leg_drive is False:
-        lines.append("Arm extended before legs — should initiate shot from the legs up")
-
-    # Wrist snap
-    wrist_snap = shot.get("phases", {}).get("wrist_snap", {})
-    snap_vel = wrist_snap.get("angular_velocity_rad_s")
-    if snap_vel is not None:
-        if snap_vel > 100:
-            lines.append("Strong wrist snap at release")
-        elif snap_vel > 30:
-            lines.append("Moderate wrist snap at release")
-        else:
-            lines.append("Weak wrist snap — needs more flick of the wrist at release")
-
-    # Stability
-    stability = shot.get("metrics", {}).get("stability", {})
-    head_var = stability.get("head_vertical_variance_norm")
-    if head_var is not None:
-        if head_var < 0.002:
-            lines.append("Head stays steady during the shot — good balance")
-        else:
-            lines.append("Noticeable head movement during the shot — work on balance")
-
-    # Guardrails
-    guardrails = shot.get("feedback_guardrails", {})
-    mode = guardrails.get("mode", "normal")
-    if mode == "conservative":
-        lines.append("NOTE: Limited visibility means some metrics are missing. Feedback focuses on what was observable.")
-
-    return "\n".join(lines)
-
-
-def _generate_feedback(shot_data: dict) -> str:
-    """Call local Ollama LLM to generate coaching feedback from shot data."""
-    shot_summary = _build_shot_summary(shot_data)
-
-    prompt = f"""You are a basketball shooting coach. A player filmed their shot and motion tracking analyzed it.
-
-Here is what the analysis found:
-{shot_summary}
-
-Write short coaching feedback for this player. Use the second person ("you" / "your"). Follow this exact structure:
-
-OVERALL: Write one sentence about the shot overall.
-
-STRENGTHS:
-- Write one thing the player did well.
-- Write another thing the player did well.
-
-WORK ON:
-- Write one thing to improve and include a specific drill to fix it.
-- Write another thing to improve and include a specific drill to fix it.
-
-Important: Start directly with "OVERALL:" — no introduction or preamble. Do not include numbers or data. Do not ask questions. Keep each bullet to one or two sentences. Sound like a real basketball coach giving encouragement after practice."""
+    return shot_summary(shot)
 
-    try:
-        response = ollama.chat(
-            model=LLM_MODEL,
-            messages=[{"role": "user", "content": prompt}],
-        )
-        return response.get("message", {}).get("content", "").strip()
-    except Exception as exc:
-        return f"LLM feedback unavailable: {exc}"
 
+def _feedback_cache_key(summary: str) -> str:
+    return config_fingerprint({"summary": summary, "llm_model": LLM_MODEL, "prompt_version": PROMPT_VERSION})
 
-@router.post("/video")
-async def analyze_video(file: UploadFile = File(...)):
-    """Accept a video upload, run pose analysis + LLM feedback, return results."""
+
+async def _generate_feedback(shot_data: dict) -> str:
+    """Coaching feedback for a shot: from the feedback cache, else from the local Ollama LLM via the gateway.
+
+    Raises if the LLM call fails or returns nothing.
+    """
+    summary = _build_shot_summary(shot_data)
+    cache = get_feedback_cache()
+    key = _feedback_cache_key(summary)
+    cached, _ = cache.get(key)
+    if cached is not None:
+        return cached
+
+    feedback = await get_llm_gateway().achat([{"role": "user", "content": coaching_prompt(summary)}],
+                                             model=LLM_MODEL)
+    if not feedback:
+        raise ValueError("LLM returned an empty response")
+    cache.put(key, feedback)
+    return feedback
+
+
+def _fallback_feedback(shot_data: dict, reason: str) -> dict:
+    return {
+        "feedback": rule_based_feedback(shot_facts(shot_data)),
+        "feedback_source": "rules",
+        "feedback_error": reason,
+    }
+
+
+async def _stream_feedback(shot_data: dict) -> AsyncIterator[str]:
+    """Coaching feedback for a shot in pieces as the LLM writes it; a cached answer comes as one piece.
+
+    Closing the iterator early stops the generation.
+    """
+    summary = _build_shot_summary(shot_data)
+    cache = get_feedback_cache()
+    key = _feedback_cache_key(summary)
+    cached, _ = cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    stream = get_llm_gateway().astream([{"role": "user", "content": coaching_prompt(summary)}], model=LLM_MODEL)
+    parts = []
+    async with aclosing(stream):
+        async for text in stream:
+            parts.append(text)
+            yield text
+    feedback = "".join(parts).strip()
+    if feedback:
+        cache.put(key, feedback)
+
+
+async def _generate_all_feedback(shots: list[dict], progress: ProgressFn | None = None,
+                                 budget_s: float | None = None) -> list[dict]:
+    """Feedback for every shot, in shot order, all requested at once from the LLM gateway.
+
+    Each entry has ``feedback`` and a ``feedback_source`` of "llm" or "rules".
+    The gateway bounds how many calls run at once and how long each may take;
+    on top of that the whole batch, queueing included, gets ``budget_s``. A
+    shot whose call fails or runs out of time gets the rule-based coach's text
+    (plus a ``feedback_error``) while the others still come back from the LLM,
+    so the batch never takes much longer than the budget however Ollama is
+    doing. Shots with the same summary share one call.
+    """
+    budget_s = _get_llm_budget_s() if budget_s is None else budget_s
+    report = progress or (lambda update: None)
+    done = 0
+    summaries = [_build_shot_summary(shot) for shot in shots]
+    unique = list(dict.fromkeys(summaries))
+
+    async def one(shot: dict, shared_by: int) -> dict:
+        nonlocal done
+        try:
+            result = {"feedback": await asyncio.wait_for(_generate_feedback(shot), budget_s), "feedback_source": "llm"}
+        except asyncio.TimeoutError:
+            result = _fallback_feedback(shot, "LLM did not answer in time")
+        except Exception as exc:
+            result = _fallback_feedback(shot, f"LLM feedback unavailable: {exc}")
+        done += shared_by
+        report({"shots_done": done})
+        return result
+
+    feedback = await asyncio.gather(*(one(shots[summaries.index(summary)], summaries.count(summary))
+                                      for summary in unique))
+    by_summary = dict(zip(unique, feedback))
+    return [by_summary[summary] for summary in summaries]
+
+
+def _validate_upload(file: UploadFile, sampling: str | None) -> str:
+    sampling = sampling or get_default_sampling()
+    if sampling not in SAMPLING_MODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"sampling must be one of {', '.join(SAMPLING_MODES)}",
+        )
     if not file.content_type or not file.content_type.startswith("video/"):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="File must be a video",
         )
+    return sampling
+
+
+def _upload_suffix(file: UploadFile) -> str:
+    return os.path.splitext(file.filename or "video.mp4")[1] or ".mp4"
+
+
+def _run_analysis(file_path: str, sampling: str, progress: ProgressFn | None = None,
+                  video_sha256: str | None = None) -> dict:
+    """Pose analysis + LLM feedback for a saved video; returns the response body. Blocking."""
+    report = progress or (lambda update: None)
+    report({"stage": "pose"})
+    processing: dict = {}
+    shots = _process_video(file_path, stats=processing, sampling=sampling, video_sha256=video_sha256)
+
+    if not shots:
+        return {
+            "status": "no_shots_detected",
+            "shots": [],
+            "frames_inferred": processing.get("frames_inferred"),
+            "processing": processing,
+            "message": "No basketball shots were detected in the video. Try a clearer angle showing your full body.",
+        }
+
+    report({"stage": "feedback", "shots_total": len(shots), "shots_done": 0})
+    # runs on a worker thread (threadpool or job), so there is no event loop here yet
+    feedback = asyncio.run(_generate_all_feedback(shots, report))
+    results = [
+        {
+            "shot_id": shot.get("id"),
+            "scores": _derive_scores(shot),
+            **entry,
+            "shot_data": shot,
+        }
+        for shot, entry in zip(shots, feedback)
+    ]
+
+    # Use the first (or best) shot as the primary result
+    primary = results[0]
+
+    return {
+        "status": "analyzed",
+        "shot_score": primary["scores"]["shot_score"],
+        "arc_angle": primary["scores"]["arc_angle"],
+        "release_speed": primary["scores"]["release_speed"],
+        "follow_through_score": primary["scores"]["follow_through_score"],
+        "llm_feedback": primary["feedback"],
+        "feedback_source": primary["feedback_source"],
+        "shot_data": primary["shot_data"],
+        "total_shots_detected": len(results),
+        "all_shots": results,
+        "frames_inferred": processing.get("frames_inferred"),
+        "processing": processing,
+    }
+
+
+def _pose_config(sampling: str) -> dict:
+    """Everything besides the video bytes that can change its pose landmarks."""
+    return {
+        "pose_model": file_fingerprint(MODEL_PATH),
+        "sampling": sampling,
+        "max_inference_side": get_max_inference_side(),
+        # segmented runs restart the tracker at each segment, so they are cached apart from sequential ones
+        "segments": segmenting_config(sampling),
+    }
+
+
+def _analysis_config(sampling: str) -> dict:
+    """Everything besides the video bytes that can change an analysis result."""
+    return {
+        **_pose_config(sampling),
+        "version": ANALYSIS_VERSION,
+        "detector": ShotDetector().config(),
+        "llm_model": LLM_MODEL,
+        "prompt_version": PROMPT_VERSION,
+    }
+
+
+def _is_cacheable(result: dict) -> bool:
+    # don't pin a transient LLM outage (rule-based stand-in feedback) into the cache
+    return not any(shot.get("feedback_source") == "rules" for shot in result.get("all_shots", []))
+
+
+def _analyze_cached(file_path: str, sampling: str, upload: dict, progress: ProgressFn | None = None) -> dict:
+    """``_run_analysis`` behind the result cache, keyed by the upload's sha256 and the analysis config."""
+    cache = get_result_cache()
+    key = cache.key(upload["sha256"], config_fingerprint(_analysis_config(sampling)))
+    cached, tier = cache.get(key)
+    if cached is not None:
+        return {**cached, "upload": upload, "cache": {"status": "hit", "tier": tier, "key": key}}
+
+    result = _run_analysis(file_path, sampling, progress, video_sha256=upload["sha256"])
+    stored = _is_cacheable(result)
+    if stored:
+        cache.put(key, result)
+    return {**result, "upload": upload, "cache": {"status": "miss", "stored": stored, "key": key}}
+
+
+def _run_analysis_job(file_path: str, sampling: str, upload: dict, progress: ProgressFn) -> dict:
+    try:
+        return _analyze_cached(file_path, sampling, upload, progress)
+    finally:
+        os.unlink(file_path)
+
+
+@router.post("/video")
+async def analyze_video(
+    file: UploadFile = File(...),
+    sampling: str | None = Query(None, description="Frame sampling: 'full' or 'adaptive' (skip idle frames)"),
+):
+    """Accept a video upload, run pose analysis + LLM feedback, return results."""
+    sampling = _validate_upload(file, sampling)
 
     # Save uploaded file to a temp path so OpenCV can read it
-    suffix = os.path.splitext(file.filename or "video.mp4")[1] or ".mp4"
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=_upload_suffix(file))
+    tmp.close()
     try:
-        contents = await file.read()
-        tmp.write(contents)
-        tmp.close()
+        upload = await save_upload(file, tmp.name)
+
+        # inference and the LLM calls block, so keep them off the event loop
+        return await run_in_threadpool(_analyze_cached, tmp.name, sampling, upload.summary())
+    finally:
+        if os.path.exists(tmp.name):
+            os.unlink(tmp.name)
+
 
-        shots = _process_video(tmp.name)
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-        if not shots:
-            return {
-                "status": "no_shots_detected",
-                "shots": [],
-                "message": "No basketball shots were detected in the video. Try a clearer angle showing your full body.",
-            }
 
-        results = []
+async def _analysis_events(request: Request, file_path: str, sampling: str, upload: dict) -> AsyncIterator[str]:
+    """Server-sent events for one analysis: scores for every shot as soon as detection is done,
+    then each shot's coaching feedback token by token. Feedback still streaming when the
+    LLM budget runs out is replaced by the rule-based coach's. Removes ``file_path`` when finished.
+    """
+    try:
+        yield _sse("upload", upload)
+        processing: dict = {}
+        try:
+            shots = await run_in_threadpool(_process_video, file_path, processing, sampling, upload["sha256"])
+        except HTTPException as exc:
+            yield _sse("error", {"status_code": exc.status_code, "detail": exc.detail})
+            return
+        yield _sse("processing", {**processing, "total_shots_detected": len(shots)})
         for shot in shots:
-            scores = _derive_scores(shot)
-            feedback = _generate_feedback(shot)
-            results.append({
-                "shot_id": shot.get("id"),
-                "scores": scores,
-                "feedback": feedback,
-                "shot_data": shot,
-            })
-
-        # Use the first (or best) shot as the primary result
-        primary = results[0]
+            yield _sse("shot", {"shot_id": shot.get("id"), "scores": _derive_scores(shot), "shot_data": shot})
 
-        return {
-            "status": "analyzed",
-            "shot_score": primary["scores"]["shot_score"],
-            "arc_angle": primary["scores"]["arc_angle"],
-            "release_speed": primary["scores"]["release_speed"],
-            "follow_through_score": primary["scores"]["follow_through_score"],
-            "llm_feedback": primary["feedback"],
-            "shot_data": primary["shot_data"],
-            "total_shots_detected": len(results),
-            "all_shots": results,
-        }
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + _get_llm_budget_s()
+        for shot in shots:
+            parts = []
+            try:
+                async with aclosing(_stream_feedback(shot)) as pieces:
+                    while True:
+                        try:
+                            piece = await asyncio.wait_for(anext(pieces), max(0.0, deadline - loop.time()))
+                        except StopAsyncIteration:
+                            break
+                        # leaving the loop closes the Ollama stream and stops the generation
+                        if await request.is_disconnected():
+                            return
+                        parts.append(piece)
+                        yield _sse("token", {"shot_id": shot.get("id"), "text": piece})
+                feedback = "".join(parts).strip()
+                if not feedback:
+                    raise ValueError("LLM returned an empty response")
+                entry = {"feedback": feedback, "feedback_source": "llm"}
+            except asyncio.TimeoutError:
+                # tokens already sent are superseded by this event's text
+                entry = _fallback_feedback(shot, "LLM did not answer in time")
+            except Exception as exc:
+                entry = _fallback_feedback(shot, f"LLM feedback unavailable: {exc}")
+            yield _sse("feedback", {"shot_id": shot.get("id"), **entry})
+
+        yield _sse("done", {
+            "status": "analyzed" if shots else "no_shots_detected",
+            "total_shots_detected": len(shots),
+        })
     finally:
-        os.unlink(tmp.name)
+        if os.path.exists(file_path):
+            os.unlink(file_path)
+
+
+@router.post("/video/stream")
+async def analyze_video_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    sampling: str | None = Query(None, description="Frame sampling: 'full' or 'adaptive' (skip idle frames)"),
+):
+    """Like ``/analyze/video``, but as a text/event-stream of upload, processing, shot, token, feedback
+    and done events (or a single error event), so scores arrive before the LLM has written anything.
+    A client that disconnects cancels the feedback generation.
+    """
+    sampling = _validate_upload(file, sampling)
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=_upload_suffix(file))
+    tmp.close()
+    try:
+        upload = await save_upload(file, tmp.name)
+    except BaseException:
+        if os.path.exists(tmp.name):
+            os.unlink(tmp.name)
+        raise
+    return StreamingResponse(
+        _analysis_events(request, tmp.name, sampling, upload.summary()),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _job_response(job: dict) -> dict:
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "error": job["error"],
+        "status_url": f"{router.prefix}/jobs/{job['id']}",
+        "result_url": f"{router.prefix}/jobs/{job['id']}/result",
+    }
+
+
+def _get_job_or_404(job_id: str) -> dict:
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+
+@router.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def submit_analysis_job(
+    file: UploadFile = File(...),
+    sampling: str | None = Query(None, description="Frame sampling: 'full' or 'adaptive' (skip idle frames)"),
+):
+    """Queue a video for analysis and return its job id immediately."""
+    sampling = _validate_upload(file, sampling)
+    manager = get_job_manager()
+    job_id = manager.new_job_id()
+    job_dir = manager.store.job_dir(job_id)
+    job_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        upload = await save_upload(file, job_dir / f"upload{_upload_suffix(file)}")
+    except BaseException:
+        manager.store.delete(job_id)
+        raise
+
+    try:
+        job = manager.submit(_run_analysis_job, str(upload.path), sampling, upload.summary(),
+                             kind="video_analysis", job_id=job_id)
+    except QueueFullError as exc:
+        manager.store.delete(job_id)
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(exc))
+    return _job_response(job)
+
+
+@router.get("/jobs/{job_id}")
+def get_analysis_job(job_id: str):
+    """Status and progress of an analysis job."""
+    return _job_response(_get_job_or_404(job_id))
+
+
+@router.get("/jobs/{job_id}/result")
+def get_analysis_job_result(job_id: str):
+    """The analysis result of a finished job; 409 while it is still queued or running."""
+    job = _get_job_or_404(job_id)
+    if job["status"] in ("queued", "running"):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Job is {job['status']}")
+    get_job_manager().mark_fetched(job)
+    return {**_job_response(job), "result": job["result"]}
+
+
+@router.get("/cache")
+def get_analysis_cache_stats():
+    """Entry counts, disk usage and hit/miss counters of the analysis result cache."""
+    return get_result_cache().stats()
+
+
+@router.delete("/cache")
+def invalidate_analysis_cache(
+    sha256: str | None = Query(None, pattern=f"^{SHA256_PATTERN.pattern}$",
+                               description="Only drop cached results for the video with this sha256"),
+):
+    """Drop cached analysis results, e.g. after tuning detection thresholds."""
+    return {"removed": get_result_cache().invalidate(sha256)}
+
+
+@router.get("/llm")
+def get_llm_gateway_stats():
+    """Queue depth, in-flight calls, counters and latency percentiles of the shared LLM gateway."""
+    return get_llm_gateway().stats()
+
+
+@router.get("/feedback/cache")
+def get_feedback_cache_stats():
+    """Entry counts, disk usage and hit/miss counters of the coaching feedback cache."""
+    return get_feedback_cache().stats()
+
+
+@router.delete("/feedback/cache")
+def clear_feedback_cache():
+    """Drop all cached coaching feedback, e.g. after switching Ollama models without a code change."""
+    return {"removed": get_feedback_cache().invalidate()}
+
+
+@router.get("/landmarks/{sha256}/rescore")
+def rescore_stored_landmarks(sha256: str):
+    """Re-run shot detection and scoring with the current code over a video's stored landmarks."""
+    store = get_landmark_store()
+    records = [record for record in map(store.load, store.keys(sha256)) if record is not None]
+    if not records:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No stored landmarks for this video")
+    return {"videos": [{"key": record.key, "meta": record.meta, "shots": _rescore(record)} for record in records]}
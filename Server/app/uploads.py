@@ -0,0 +1,137 @@
+import hashlib
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+from fastapi import HTTPException, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import get_env_number
+
+
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+# Room for the multipart boundaries, part headers and form fields around the video itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+def get_max_upload_bytes() -> int:
+    return int(get_env_number("ANALYSIS_MAX_UPLOAD_MB", "100") * 1024 * 1024)
+
+
+def _too_large_detail(max_bytes: int) -> str:
+    return f"Video is larger than the {max_bytes // (1024 * 1024)} MB limit"
+
+
+@dataclass(frozen=True)
+class SavedUpload:
+    path: Path
+    size: int
+    sha256: str
+
+    def summary(self) -> dict:
+        return {"bytes": self.size, "sha256": self.sha256}
+
+
+def _write_chunk(out, hasher, chunk: bytes) -> None:
+    hasher.update(chunk)
+    out.write(chunk)
+
+
+async def save_upload(file: UploadFile, dest: str | os.PathLike, max_bytes: int | None = None,
+                      chunk_size: int = UPLOAD_CHUNK_BYTES) -> SavedUpload:
+    """Stream an upload to ``dest`` in ``chunk_size`` pieces, hashing it on the way.
+
+    Only one chunk is held in memory at a time. Going over ``max_bytes``
+    (default from ANALYSIS_MAX_UPLOAD_MB) stops the copy with a 413 and
+    removes the partial file.
+    """
+    max_bytes = get_max_upload_bytes() if max_bytes is None else max_bytes
+    dest = Path(dest)
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with open(dest, "wb") as out:
+            while chunk := await file.read(chunk_size):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+                        detail=_too_large_detail(max_bytes),
+                    )
+                await run_in_threadpool(_write_chunk, out, hasher, chunk)
+    except BaseException:
+        dest.unlink(missing_ok=True)
+        raise
+    return SavedUpload(dest, size, hasher.hexdigest())
+
+
+class UploadSizeLimitMiddleware:
+    """Applies the upload size cap to multipart POST bodies while they arrive.
+
+    FastAPI receives and spools the whole multipart body before an endpoint
+    gets its ``UploadFile``, so the check in ``save_upload`` alone comes after
+    the bandwidth and disk are spent. Here a declared Content-Length over the
+    cap is refused before any of the body is read, and a body without one is
+    cut off as soon as it crosses the cap. Either way the client gets a 413.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int | None = None):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        if not headers.get("content-type", "").startswith("multipart/form-data"):
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = get_max_upload_bytes() if self.max_bytes is None else self.max_bytes
+        limit = max_bytes + MULTIPART_OVERHEAD_BYTES
+        declared = headers.get("content-length", "")
+        if declared.isdigit() and int(declared) > limit:
+            await self._reject(max_bytes, scope, receive, send)
+            return
+
+        received = 0
+        exceeded = False
+        started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # end the body here; the app's parser sees a disconnect and gives up
+                    exceeded = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message: Message) -> None:
+            nonlocal started
+            if exceeded and not started:
+                # drop the app's own error for the cut-off body, the 413 goes out below
+                return
+            started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded and not started:
+            await self._reject(max_bytes, scope, receive, send)
+
+    @staticmethod
+    async def _reject(max_bytes: int, scope: Scope, receive: Receive, send: Send) -> None:
+        response = JSONResponse({"detail": _too_large_detail(max_bytes)},
+                                status_code=status.HTTP_413_CONTENT_TOO_LARGE)
+        await response(scope, receive, send)
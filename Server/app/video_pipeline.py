@@ -0,0 +1,429 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from .config import get_env_number
+
+
+SAMPLING_MODES = ("full", "adaptive")
+
+# MediaPipe pose indices of the wrists
+_WRISTS = (15, 16)
+
+
+def get_default_sampling() -> str:
+    mode = os.getenv("ANALYSIS_SAMPLING", "full")
+    if mode not in SAMPLING_MODES:
+        raise RuntimeError(f"ANALYSIS_SAMPLING must be one of {SAMPLING_MODES}, got {mode!r}")
+    return mode
+
+
+def get_max_inference_side() -> int:
+    """Longest side, in pixels, frames are scaled down to before pose inference (0 = no limit)."""
+    return max(0, get_env_number("ANALYSIS_MAX_INFERENCE_SIDE", "640", int))
+
+
+def inference_size(width: int, height: int, max_side: int) -> tuple[int, int]:
+    """(width, height) to run inference at: the frame size scaled so its longest side is at most ``max_side``."""
+    longest = max(width, height)
+    if max_side <= 0 or longest <= max_side:
+        return width, height
+    scale = max_side / longest
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+class InferenceFrameBuffer:
+    """Turns decoded BGR frames into RGB inference input, reusing its output buffers.
+
+    The frame is downscaled first (so the color conversion only touches the
+    small image) into a buffer that is allocated once per frame size. Bilinear
+    sampling reads a fixed number of source pixels per output pixel, so the
+    cost follows the inference size rather than the upload size. Pose
+    landmarks come back normalized, so callers keep scaling them by the
+    original frame size.
+    """
+
+    def __init__(self, max_side: int):
+        self.max_side = max_side
+        self.size: tuple[int, int] | None = None
+        self._src_shape: tuple[int, ...] | None = None
+        self._resized: np.ndarray | None = None
+        self._rgb: np.ndarray | None = None
+
+    def prepare(self, frame: np.ndarray) -> np.ndarray:
+        if frame.shape != self._src_shape:
+            self._src_shape = frame.shape
+            self.size = inference_size(frame.shape[1], frame.shape[0], self.max_side)
+            w, h = self.size
+            self._resized = None if self.size == (frame.shape[1], frame.shape[0]) else np.empty((h, w, 3), np.uint8)
+            self._rgb = np.empty((h, w, 3), np.uint8)
+        src = frame
+        if self._resized is not None:
+            src = cv2.resize(frame, self.size, dst=self._resized, interpolation=cv2.INTER_LINEAR)
+        return cv2.cvtColor(src, cv2.COLOR_BGR2RGB, dst=self._rgb)
+
+
+def landmarks_to_row(raw_landmarks) -> np.ndarray:
+    """NormalizedLandmark list -> (33, 4) float32 row of x, y, z, visibility."""
+    return np.fromiter(
+        (v for lm in raw_landmarks
+         for v in (lm.x, lm.y, lm.z, lm.visibility if lm.visibility is not None else 0.0)),
+        dtype=np.float32,
+        count=len(raw_landmarks) * 4,
+    ).reshape(-1, 4)
+
+
+def motion_thumbnail(frame: np.ndarray, size: tuple[int, int] = (80, 60)) -> np.ndarray:
+    """Small grayscale copy of a BGR frame for cheap frame-to-frame motion checks."""
+    small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+
+def motion_score(prev: np.ndarray | None, cur: np.ndarray, pixel_threshold: int = 12) -> float:
+    """Fraction of thumbnail pixels whose grayscale value changed by more than ``pixel_threshold``.
+
+    Counting changed pixels (rather than averaging the difference) keeps a small
+    moving player from being drowned out by a large static background, while
+    the per-pixel threshold ignores sensor noise.
+    """
+    if prev is None:
+        return 0.0
+    return float(np.count_nonzero(cv2.absdiff(prev, cur) > pixel_threshold)) / cur.size
+
+
+def wrist_speed(prev_row: np.ndarray, row: np.ndarray, dt: float) -> float:
+    """Fastest wrist movement between two pose rows, in normalized frame units per second."""
+    if dt <= 0:
+        return 0.0
+    delta = row[_WRISTS, :2] - prev_row[_WRISTS, :2]
+    return float(np.hypot(delta[:, 0], delta[:, 1]).max() / dt)
+
+
+class AdaptiveSampler:
+    """Decides which decoded frames get pose inference.
+
+    While the scene is idle only every ``idle_stride``-th frame is inferred. Frames
+    are held back ``lookahead`` frames before a decision is made, so when motion
+    shows up the frames just before it (the set/load pre-roll) are still pending
+    and get inferred at full rate too. Decisions are released in frame order,
+    which keeps VIDEO-mode timestamps monotonic.
+
+    A frame is inferred at full rate if pixel motion was seen within ``hold``
+    frames before it or ``lookahead`` frames after it, or if ``trigger`` was
+    called (pose-based motion) within ``hold`` frames before it.
+    """
+
+    def __init__(self, idle_stride: int = 3, lookahead: int = 10, hold: int = 30, motion_threshold: float = 0.004):
+        self.idle_stride = max(1, idle_stride)
+        self.lookahead = max(0, lookahead)
+        self.hold = max(0, hold)
+        self.motion_threshold = motion_threshold
+        self._pending: deque[tuple[int, Any, bool]] = deque()
+        self._last_motion = -(1 << 62)
+        self._active_until = -1
+        self._last_selected = -(1 << 62)
+
+    def trigger(self, idx: int) -> None:
+        """Keep full frame rate for ``hold`` frames after ``idx`` (e.g. the wrist started moving)."""
+        self._active_until = max(self._active_until, idx + self.hold)
+
+    def push(self, idx: int, frame: Any, motion: float) -> list[tuple[int, Any]]:
+        """Queue a decoded frame; returns the frames (oldest first) now ready for inference."""
+        self._pending.append((idx, frame, motion >= self.motion_threshold))
+        out = []
+        while len(self._pending) > self.lookahead:
+            self._release(out)
+        return out
+
+    def flush(self) -> list[tuple[int, Any]]:
+        out = []
+        while self._pending:
+            self._release(out)
+        return out
+
+    def _release(self, out: list) -> None:
+        idx, frame, moving = self._pending[0]
+        ahead = any(m for _, _, m in self._pending)
+        self._pending.popleft()
+        if moving:
+            self._last_motion = idx
+        selected = (
+            ahead
+            or idx - self._last_motion <= self.hold
+            or idx <= self._active_until
+            or idx - self._last_selected >= self.idle_stride
+        )
+        if selected:
+            self._last_selected = idx
+            out.append((idx, frame))
+
+
+# wrist speed between inferred poses (normalized frame units per second) that keeps adaptive sampling at full rate
+_WRIST_TRIGGER = 0.4
+
+_DONE = object()
+
+
+def get_pipeline_depth() -> int:
+    """Bounded queue depth between the decode and inference threads (0 = decode and infer on one thread)."""
+    return max(0, get_env_number("ANALYSIS_PIPELINE_DEPTH", "4", int))
+
+
+class _DecodedFrames:
+    """Iterates ``(index, frame)`` over the decoded frames chosen for inference, in frame order.
+
+    With a sampler, ``before_decision`` (if set) is called with the number of
+    frames released so far before every batch of sampling decisions.
+    """
+
+    def __init__(self, cap, sampler: AdaptiveSampler | None, first_frame: int = 0, max_frames: int | None = None):
+        self.cap = cap
+        self.sampler = sampler
+        self.first_frame = first_frame
+        self.max_frames = max_frames
+        self.decoded = 0
+        self.released = 0
+        self.before_decision: Callable[[int], None] | None = None
+
+    def _sampled(self, release: Callable[[], list[tuple[int, Any]]]):
+        if self.before_decision is not None:
+            self.before_decision(self.released)
+        for item in release():
+            self.released += 1
+            yield item
+
+    def __iter__(self):
+        sampler = self.sampler
+        frame = None
+        prev_thumb = None
+        while self.max_frames is None or self.decoded < self.max_frames:
+            # without a sampler each frame is done with before the next read, so decode into the same array
+            ret, frame = self.cap.read(frame if sampler is None else None)
+            if not ret:
+                break
+            idx = self.first_frame + self.decoded
+            self.decoded += 1
+            if sampler is None:
+                yield idx, frame
+                continue
+            thumb = motion_thumbnail(frame)
+            motion = motion_score(prev_thumb, thumb)
+            yield from self._sampled(lambda: sampler.push(idx, frame, motion))
+            prev_thumb = thumb
+        if sampler is not None:
+            yield from self._sampled(sampler.flush)
+
+
+class _LandmarkCollector:
+    """Gathers inference results in frame order and feeds pose-based motion back to the sampler."""
+
+    def __init__(self, fps: float, sampler: AdaptiveSampler | None):
+        self.fps = fps
+        self.sampler = sampler
+        self.rows: list[np.ndarray] = []
+        self.timestamps: list[float] = []
+        self.inferred = 0
+
+    def add(self, idx: int, row: np.ndarray | None) -> None:
+        self.inferred += 1
+        if row is None:
+            return
+        ts = idx / self.fps
+        if self.sampler is not None and self.rows and \
+                wrist_speed(self.rows[-1], row, ts - self.timestamps[-1]) > _WRIST_TRIGGER:
+            self.sampler.trigger(idx)
+        self.rows.append(row)
+        self.timestamps.append(ts)
+
+
+def _detect(landmarker, rgb: np.ndarray, idx: int, fps: float) -> np.ndarray | None:
+    # mp.Image copies the pixels, so the prepared buffer can be reused for the next frame
+    mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb)
+    result = landmarker.detect_for_video(mp_image, int(idx * 1000 / fps))
+    if result.pose_landmarks and len(result.pose_landmarks) > 0:
+        return landmarks_to_row(result.pose_landmarks[0])
+    return None
+
+
+def _run_pipelined(frames: _DecodedFrames, landmarker, fps: float, max_side: int,
+                   collector: _LandmarkCollector, depth: int) -> tuple[InferenceFrameBuffer, dict]:
+    """Decode on one thread and infer on another, joined by bounded queues; the caller collects results.
+
+    Any stage failing sets ``stop`` so the others drain out instead of blocking
+    on a full or empty queue; the first error is re-raised here once both
+    threads have exited.
+    """
+    frame_q: queue.Queue = queue.Queue(maxsize=depth)
+    result_q: queue.Queue = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    errors: list[BaseException] = []
+    # a queued frame, the one being inferred and the one being prepared each need their own buffer
+    slots = [InferenceFrameBuffer(max_side) for _ in range(depth + 2)]
+    timing = dict.fromkeys(("decode_busy_s", "decode_blocked_s", "inference_busy_s", "inference_starved_s",
+                            "inference_blocked_s", "collect_starved_s"), 0.0)
+    queue_samples = [0, 0, 0]  # sum, count, max of frame_q depth seen by the inference thread
+    collected = threading.Condition()
+
+    def wait_for_collector(released: int) -> None:
+        # Adaptive sampling: run each sampling decision only after every frame released so far has been
+        # collected, so it sees the same pose triggers as it would with decode and inference on one thread
+        start = time.perf_counter()
+        with collected:
+            while collector.inferred < released and not stop.is_set():
+                collected.wait(timeout=0.05)
+        timing["decode_blocked_s"] += time.perf_counter() - start
+
+    if frames.sampler is not None:
+        frames.before_decision = wait_for_collector
+
+    def put(q: queue.Queue, item, key: str) -> bool:
+        start = time.perf_counter()
+        try:
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.05)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            timing[key] += time.perf_counter() - start
+
+    def get(q: queue.Queue, key: str):
+        start = time.perf_counter()
+        try:
+            while not stop.is_set():
+                try:
+                    return q.get(timeout=0.05)
+                except queue.Empty:
+                    continue
+            return _DONE
+        finally:
+            timing[key] += time.perf_counter() - start
+
+    def decode() -> None:
+        try:
+            it = iter(frames)
+            n = 0
+            while True:
+                start = time.perf_counter()
+                item = next(it, None)
+                if item is None:
+                    break
+                idx, frame = item
+                rgb = slots[n % len(slots)].prepare(frame)
+                n += 1
+                timing["decode_busy_s"] += time.perf_counter() - start
+                if not put(frame_q, (idx, rgb), "decode_blocked_s"):
+                    return
+        except BaseException as exc:
+            errors.append(exc)
+            stop.set()
+        finally:
+            put(frame_q, _DONE, "decode_blocked_s")
+
+    def infer() -> None:
+        try:
+            while True:
+                depth_now = frame_q.qsize()
+                item = get(frame_q, "inference_starved_s")
+                if item is _DONE:
+                    break
+                queue_samples[0] += depth_now
+                queue_samples[1] += 1
+                queue_samples[2] = max(queue_samples[2], depth_now)
+                idx, rgb = item
+                start = time.perf_counter()
+                row = _detect(landmarker, rgb, idx, fps)
+                timing["inference_busy_s"] += time.perf_counter() - start
+                if not put(result_q, (idx, row), "inference_blocked_s"):
+                    return
+        except BaseException as exc:
+            errors.append(exc)
+            stop.set()
+        finally:
+            put(result_q, _DONE, "inference_blocked_s")
+
+    threads = [
+        threading.Thread(target=decode, name="video-decode", daemon=True),
+        threading.Thread(target=infer, name="pose-inference", daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        while True:
+            item = get(result_q, "collect_starved_s")
+            if item is _DONE:
+                break
+            collector.add(*item)
+            with collected:
+                collected.notify_all()
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+
+    pipeline = {key: round(value, 6) for key, value in timing.items()}
+    pipeline.update({
+        "depth": depth,
+        "frame_queue_avg": round(queue_samples[0] / queue_samples[1], 3) if queue_samples[1] else 0.0,
+        "frame_queue_max": queue_samples[2],
+        # inference waiting on an empty queue means decode can't keep up, decode waiting on a full one the reverse
+        "bottleneck": "decode" if timing["inference_starved_s"] > timing["decode_blocked_s"] else "inference",
+    })
+    return slots[0], pipeline
+
+
+def infer_landmarks(cap, landmarker, fps: float, sampling: str = "full", stats: dict | None = None,
+                    max_side: int | None = None, pipeline_depth: int | None = None,
+                    first_frame: int = 0, max_frames: int | None = None) -> tuple[list[np.ndarray], list[float]]:
+    """Read frames from ``cap``, run pose inference and return (33, 4) rows and timestamps of frames with a pose.
+
+    ``sampling="adaptive"`` skips frames while the player is idle (see
+    ``AdaptiveSampler``). Timestamps always come from the frame index, so
+    skipped frames leave gaps rather than shifting later frames. Frames are
+    scaled down to ``max_side`` (default from ANALYSIS_MAX_INFERENCE_SIDE)
+    before inference. With a ``pipeline_depth`` (default from
+    ANALYSIS_PIPELINE_DEPTH) above 0, decoding and inference run on separate
+    threads joined by queues of that depth. ``first_frame`` is the index of the
+    frame ``cap`` is positioned at and ``max_frames`` stops reading early, for
+    processing one segment of a video.
+    """
+    if sampling not in SAMPLING_MODES:
+        raise ValueError(f"Unknown sampling mode: {sampling!r}")
+    max_side = get_max_inference_side() if max_side is None else max_side
+    depth = get_pipeline_depth() if pipeline_depth is None else pipeline_depth
+    sampler = AdaptiveSampler() if sampling == "adaptive" else None
+    frames = _DecodedFrames(cap, sampler, first_frame, max_frames)
+    collector = _LandmarkCollector(fps, sampler)
+
+    pipeline = None
+    if depth > 0:
+        prep, pipeline = _run_pipelined(frames, landmarker, fps, max_side, collector, depth)
+    else:
+        prep = InferenceFrameBuffer(max_side)
+        for idx, frame in frames:
+            collector.add(idx, _detect(landmarker, prep.prepare(frame), idx, fps))
+
+    if stats is not None:
+        stats.update({
+            "sampling": sampling,
+            "frames_decoded": frames.decoded,
+            "frames_inferred": collector.inferred,
+            "frames_with_pose": len(collector.rows),
+            "inference_size": list(prep.size) if prep.size else None,
+        })
+        if pipeline is not None:
+            stats["pipeline"] = pipeline
+    return collector.rows, collector.timestamps
@@ -0,0 +1,156 @@
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable
+
+import cv2
+import numpy as np
+
+from .config import get_env_number
+from .pose_pool import create_landmarker
+from .video_pipeline import infer_landmarks
+
+
+def get_segment_workers() -> int:
+    """Worker processes for segmented analysis of long videos (0 = always process sequentially)."""
+    return max(0, get_env_number("ANALYSIS_SEGMENT_WORKERS", "0", int))
+
+
+def get_segment_seconds() -> float:
+    return get_env_number("ANALYSIS_SEGMENT_S", "60")
+
+
+def get_segment_warmup_seconds() -> float:
+    return get_env_number("ANALYSIS_SEGMENT_WARMUP_S", "2")
+
+
+@dataclass(frozen=True)
+class Segment:
+    """Frames ``[start, end)`` of a video, inferred after ``warmup`` frames whose results are dropped.
+
+    The last segment is ``open_ended`` and reads to the end of the file, since
+    container frame counts are only an estimate.
+    """
+    start: int
+    end: int
+    warmup: int
+    open_ended: bool = False
+
+    @property
+    def read_from(self) -> int:
+        return self.start - self.warmup
+
+
+def plan_segments(total_frames: int, fps: float, segment_s: float, warmup_s: float) -> list[Segment]:
+    """Split ``total_frames`` into back-to-back segments of about ``segment_s`` seconds.
+
+    Every segment but the first starts reading ``warmup_s`` early so the pose
+    tracker has settled by the time its own frames begin; those overlapping
+    frames belong to the previous segment and are discarded.
+    """
+    if total_frames <= 0:
+        return []
+    length = max(1, round(segment_s * fps))
+    warmup = max(0, round(warmup_s * fps))
+    starts = range(0, total_frames, length)
+    return [Segment(start, min(start + length, total_frames), min(warmup, start), open_ended=start == starts[-1])
+            for start in starts]
+
+
+def segmenting_config(sampling: str) -> dict | None:
+    """The segment settings long uploads are inferred with, or None when they are processed sequentially.
+
+    Segments restart the pose tracker, so their landmarks can differ slightly
+    from a sequential run; callers put this in the landmark cache key.
+    Adaptive sampling is never segmented, since each segment would also
+    restart the sampler's motion history.
+    """
+    if sampling != "full" or get_segment_workers() <= 1:
+        return None
+    return {"segment_s": get_segment_seconds(), "warmup_s": get_segment_warmup_seconds()}
+
+
+def infer_segment(file_path: str, fps: float, segment: Segment, sampling: str, max_side: int | None,
+                  factory: Callable[[], Any] = create_landmarker) -> tuple[np.ndarray, np.ndarray, dict]:
+    """Run pose inference over one segment in a worker process.
+
+    Returns the (N, 33, 4) landmark rows and frame timestamps of the segment's
+    own frames (warm-up frames dropped) plus the segment's frame counters.
+    """
+    cap = cv2.VideoCapture(file_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open video file {file_path}")
+    landmarker = None
+    try:
+        # CAP_PROP_POS_FRAMES seeks to the nearest keyframe on many codecs; grabbing is frame-exact
+        for _ in range(segment.read_from):
+            if not cap.grab():
+                break
+        # a fresh landmarker per segment, so its landmarks don't depend on what this worker ran before
+        landmarker = factory()
+        stats: dict = {}
+        rows, timestamps = infer_landmarks(
+            cap, landmarker, fps, sampling=sampling, stats=stats, max_side=max_side, pipeline_depth=0,
+            first_frame=segment.read_from,
+            max_frames=None if segment.open_ended else segment.end - segment.read_from,
+        )
+    finally:
+        cap.release()
+        if landmarker is not None and hasattr(landmarker, "close"):
+            landmarker.close()
+
+    ts = np.asarray(timestamps, dtype=np.float64)
+    keep = ts >= segment.start / fps - 1e-9
+    pix = np.stack(rows)[keep] if rows else np.empty((0, 33, 4), dtype=np.float32)
+    return pix, ts[keep], stats
+
+
+@lru_cache
+def get_segment_executor() -> ProcessPoolExecutor:
+    # spawn rather than fork: the server process has threads and MediaPipe state that must not be copied
+    return ProcessPoolExecutor(max_workers=get_segment_workers(), mp_context=multiprocessing.get_context("spawn"))
+
+
+def infer_landmarks_segmented(file_path: str, fps: float, total_frames: int, sampling: str = "full",
+                              stats: dict | None = None, max_side: int | None = None,
+                              executor: Executor | None = None, segment_s: float | None = None,
+                              warmup_s: float | None = None,
+                              factory: Callable[[], Any] = create_landmarker) -> tuple[np.ndarray, np.ndarray]:
+    """Infer landmarks for a whole video by running its segments in parallel worker processes.
+
+    The per-segment results are stitched back into one (T, 33, 4) landmark
+    array and timestamp vector in frame order, so shot detection runs once over
+    the whole clip and a shot straddling a segment boundary is still seen as
+    one shot. Each segment starts a fresh pose tracker, so landmarks near a
+    boundary can differ from a sequential run when the tracker hasn't settled
+    within the warm-up. Only full sampling can be segmented.
+    """
+    if sampling != "full":
+        raise ValueError(f"Segmented inference needs full sampling, got {sampling!r}")
+    segments = plan_segments(total_frames, fps,
+                             get_segment_seconds() if segment_s is None else segment_s,
+                             get_segment_warmup_seconds() if warmup_s is None else warmup_s)
+    executor = executor or get_segment_executor()
+    futures = [executor.submit(infer_segment, file_path, fps, segment, sampling, max_side, factory)
+               for segment in segments]
+    try:
+        results = [future.result() for future in futures]
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+
+    pix = np.concatenate([r[0] for r in results]) if results else np.empty((0, 33, 4), dtype=np.float32)
+    ts = np.concatenate([r[1] for r in results]) if results else np.empty(0)
+    if stats is not None:
+        counters = ("frames_decoded", "frames_inferred", "frames_with_pose")
+        stats.update({
+            "sampling": sampling,
+            **{key: sum(r[2].get(key, 0) for r in results) for key in counters},
+            "inference_size": next((r[2]["inference_size"] for r in results if r[2].get("inference_size")), None),
+            "frames_with_pose": len(ts),
+            "segments": len(segments),
+            "warmup_frames": sum(s.warmup for s in segments),
+        })
+    return pix, ts
@@ -0,0 +1,379 @@
+import bisect
+import itertools
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Iterator
+
+
+logger = logging.getLogger(__name__)
+
+
+class FrameTimer:
+    """Per-frame timing breakdown of the live camera loop.
+
+    Call ``start_frame()`` when a frame begins and ``lap(stage)`` after each
+    stage; a lap records the time since the previous one. Whatever happens
+    between the last lap of a frame and the start of the next (the generator
+    waiting on the MJPEG client, a pipeline stage waiting for input) is
+    recorded as ``gap_stage``. Averages and the frame rate cover the last
+    ``window`` frames.
+    """
+
+    def __init__(self, window: int = 120, gap_stage: str | None = "stream"):
+        self.window = window
+        self.gap_stage = gap_stage
+        self._stages: dict[str, deque[float]] = {}
+        self._frame_starts: deque[float] = deque(maxlen=window)
+        self._last: float | None = None
+        self._lock = threading.Lock()
+
+    def _record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            if stage not in self._stages:
+                self._stages[stage] = deque(maxlen=self.window)
+            self._stages[stage].append(seconds)
+
+    def start_frame(self) -> None:
+        now = time.perf_counter()
+        if self._last is not None and self.gap_stage:
+            self._record(self.gap_stage, now - self._last)
+        with self._lock:
+            self._frame_starts.append(now)
+        self._last = now
+
+    def lap(self, stage: str) -> None:
+        now = time.perf_counter()
+        self._record(stage, now - self._last)
+        self._last = now
+
+    def stats(self) -> dict:
+        with self._lock:
+            starts = list(self._frame_starts)
+            stages = {name: sum(d) / len(d) * 1000 for name, d in self._stages.items() if d}
+        fps = (len(starts) - 1) / (starts[-1] - starts[0]) if len(starts) > 1 and starts[-1] > starts[0] else None
+        return {
+            "fps": round(fps, 1) if fps is not None else None,
+            "stages_ms": {name: round(ms, 1) for name, ms in stages.items()},
+        }
+
+    def report(self) -> str:
+        stats = self.stats()
+        fps = f"{stats['fps']:.1f} fps" if stats["fps"] is not None else "-- fps"
+        stages = ", ".join(f"{name} {ms:.1f} ms" for name, ms in stats["stages_ms"].items())
+        return f"{fps} | {stages}"
+
+
+class JpegRing:
+    """The last ``max_age_s`` seconds of JPEG-encoded frames, looked up by timestamp.
+
+    Holds at most ``capacity`` frames whatever the frame rate. Keeping the
+    compressed frame instead of the raw array is roughly 10x smaller; only a
+    clip's window gets decoded again.
+    """
+
+    def __init__(self, max_age_s: float, capacity: int):
+        self.max_age_s = max_age_s
+        self._ts: deque[float] = deque(maxlen=capacity)
+        self._frames: deque[bytes] = deque(maxlen=capacity)
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def append(self, ts: float, jpeg: bytes) -> None:
+        with self._lock:
+            if len(self._frames) == self._frames.maxlen:
+                self._nbytes -= len(self._frames[0])
+            self._ts.append(ts)
+            self._frames.append(jpeg)
+            self._nbytes += len(jpeg)
+            while self._ts and self._ts[0] < ts - self.max_age_s:
+                self._ts.popleft()
+                self._nbytes -= len(self._frames.popleft())
+
+    def window(self, start_ts: float, end_ts: float) -> list[tuple[float, bytes]]:
+        """``(ts, jpeg)`` for every frame with ``start_ts <= ts <= end_ts``, oldest first."""
+        with self._lock:
+            ts = list(self._ts)
+            lo, hi = bisect.bisect_left(ts, start_ts), bisect.bisect_right(ts, end_ts)
+            return list(zip(ts[lo:hi], itertools.islice(self._frames, lo, hi)))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._frames)
+
+    def stats(self) -> dict:
+        with self._lock:
+            span = self._ts[-1] - self._ts[0] if self._ts else 0.0
+            return {"frames": len(self._frames), "seconds": round(span, 2), "bytes": self._nbytes}
+
+
+class DropOldestQueue:
+    """Bounded hand-off between pipeline stages that never blocks the producer.
+
+    When the queue is full a ``put`` discards the oldest item, so a slow
+    consumer always works on the freshest frames and the producer (the
+    camera) never stalls.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = max(1, maxsize)
+        self.dropped = 0
+        self._items: deque = deque()
+        self._cond = threading.Condition()
+
+    def put(self, item: Any) -> None:
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout: float | None = None) -> Any:
+        """The oldest item; raises ``queue.Empty`` if none arrives within ``timeout``."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout):
+                raise queue.Empty
+            return self._items.popleft()
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"depth": len(self._items), "maxsize": self.maxsize, "dropped": self.dropped}
+
+
+class Stage:
+    """One pipeline step on its own thread: takes items from ``inbox``, passes ``fn(item)`` to ``outbox``.
+
+    A stage without an inbox is a source and calls ``fn()`` in a loop. A
+    ``None`` result is not passed on. ``fn`` may time its own sub-steps with
+    ``stage.timer.lap(name)``; time spent waiting for input shows up as "wait".
+
+    An exception is logged and counted, and the stage moves on to the next
+    item. A failing source (say, an unplugged camera) pauses before retrying,
+    starting at ``backoff_s[0]`` and doubling up to ``backoff_s[1]``. After
+    ``max_errors`` consecutive failures the stage gives up: it stops and calls
+    ``on_give_up``.
+    """
+
+    def __init__(self, name: str, fn: Callable[..., Any], inbox: DropOldestQueue | None = None,
+                 outbox: DropOldestQueue | None = None, window: int = 120, max_errors: int | None = 20,
+                 backoff_s: tuple[float, float] = (0.05, 2.0)):
+        self.name = name
+        self.fn = fn
+        self.inbox = inbox
+        self.outbox = outbox
+        self.max_errors = max_errors
+        self.backoff_s = backoff_s
+        self.on_give_up: Callable[["Stage"], None] | None = None
+        self.timer = FrameTimer(window, gap_stage="wait")
+        self.processed = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.gave_up = False
+        self._busy: deque[float] = deque(maxlen=window)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Start the stage's thread; a no-op while it runs. A stopped stage starts over once its old thread exits."""
+        if self._thread is not None and self._thread.is_alive():
+            if not self._stop.is_set():
+                return
+            self._thread.join()
+        self._stop.clear()
+        self.consecutive_errors = 0
+        self.gave_up = False
+        self._thread = threading.Thread(target=self._run, name=f"live-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def join(self, timeout: float | None = None) -> None:
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    def _pause(self, seconds: float) -> None:
+        # returns early when the stage is stopped
+        self._stop.wait(seconds)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if self.inbox is not None:
+                try:
+                    item = self.inbox.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            self.timer.start_frame()
+            started = time.perf_counter()
+            try:
+                result = self.fn(item) if self.inbox is not None else self.fn()
+            except Exception:
+                self.errors += 1
+                self.consecutive_errors += 1
+                logger.exception("Live pipeline stage %s failed", self.name)
+                if self.max_errors is not None and self.consecutive_errors >= self.max_errors:
+                    logger.error("Live pipeline stage %s gave up after %d errors in a row",
+                                 self.name, self.consecutive_errors)
+                    self.gave_up = True
+                    self._stop.set()
+                    if self.on_give_up is not None:
+                        self.on_give_up(self)
+                    break
+                if self.inbox is None:
+                    first, longest = self.backoff_s
+                    self._pause(min(longest, first * 2 ** (self.consecutive_errors - 1)))
+                continue
+            finally:
+                self._busy.append(time.perf_counter() - started)
+            self.consecutive_errors = 0
+            self.processed += 1
+            if result is not None and self.outbox is not None:
+                self.outbox.put(result)
+
+    def stats(self) -> dict:
+        timer = self.timer.stats()
+        busy = list(self._busy)
+        return {
+            "fps": timer["fps"],
+            "busy_ms": round(sum(busy) / len(busy) * 1000, 1) if busy else None,
+            "processed": self.processed,
+            "errors": self.errors,
+            "gave_up": self.gave_up,
+            "steps_ms": timer["stages_ms"],
+        }
+
+
+class StagedPipeline:
+    """Stages joined by drop-oldest queues, started and stopped together.
+
+    A stopped pipeline can be started again. When one stage gives up on
+    repeated errors the whole pipeline stops, and ``failed`` names that stage
+    until the next ``start``.
+    """
+
+    def __init__(self, stages: list[Stage], queues: dict[str, DropOldestQueue]):
+        self.stages = stages
+        self.queues = queues
+        self.failed: str | None = None
+        self._lock = threading.Lock()
+        for stage in stages:
+            stage.on_give_up = self._give_up
+
+    def _give_up(self, failed: Stage) -> None:
+        self.failed = failed.name
+        for stage in self.stages:
+            stage.stop()
+
+    def start(self) -> None:
+        with self._lock:
+            self.failed = None
+            for stage in self.stages:
+                stage.start()
+            # a stage that gave up before the later ones were started could not stop them
+            if self.failed is not None:
+                for stage in self.stages:
+                    stage.stop()
+
+    @property
+    def running(self) -> bool:
+        return any(stage.running for stage in self.stages)
+
+    def stop(self, timeout: float | None = 1.0) -> None:
+        """Ask every stage to stop, waiting up to ``timeout`` for each (0 returns at once)."""
+        with self._lock:
+            for stage in self.stages:
+                stage.stop()
+            for stage in self.stages:
+                stage.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "stages": {stage.name: stage.stats() for stage in self.stages},
+            "queues": {name: q.stats() for name, q in self.queues.items()},
+            "failed": self.failed,
+        }
+
+
+class FrameBroadcaster:
+    """Latest-frame hub between one producer and any number of viewers.
+
+    The producer ``publish``es each frame once; every subscriber reads the
+    newest frame whenever it's ready for another. A viewer that falls behind
+    skips the frames it missed, so neither the producer nor the other
+    viewers ever wait on it.
+
+    ``on_active`` is called when the first viewer subscribes and ``on_idle``
+    when the last one leaves, so the producer only runs while someone watches.
+    """
+
+    def __init__(self, on_active: Callable[[], None] | None = None, on_idle: Callable[[], None] | None = None):
+        self.on_active = on_active
+        self.on_idle = on_idle
+        self.published = 0
+        self.subscribers = 0
+        self.skipped = 0
+        self._latest: Any = None
+        self._cond = threading.Condition()
+        self._producing = False
+        self._producer_lock = threading.Lock()
+
+    def _sync_producer(self) -> None:
+        # re-read the count under the producer lock, so a viewer leaving as another arrives
+        # can't leave the producer stopped while someone is subscribed
+        with self._producer_lock:
+            with self._cond:
+                active = self.subscribers > 0
+            if active == self._producing:
+                return
+            callback = self.on_active if active else self.on_idle
+            if callback is not None:
+                callback()
+            self._producing = active
+
+    def publish(self, frame: Any) -> None:
+        with self._cond:
+            self._latest = frame
+            self.published += 1
+            self._cond.notify_all()
+
+    def subscribe(self, timeout: float = 1.0) -> Iterator[Any]:
+        """Frames newer than the last one this subscriber saw, for as long as it keeps iterating.
+
+        Nothing is yielded while no new frame arrives; the wait is bounded by
+        ``timeout`` so an idle subscriber still notices when it's closed.
+        """
+        with self._cond:
+            self.subscribers += 1
+            seen = self.published
+            # wake anyone waiting on the viewer count; waiting viewers just re-check for a frame
+            self._cond.notify_all()
+        try:
+            self._sync_producer()
+            while True:
+                with self._cond:
+                    if not self._cond.wait_for(lambda: self.published > seen, timeout):
+                        continue
+                    self.skipped += self.published - seen - 1
+                    seen = self.published
+                    frame = self._latest
+                yield frame
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+                self._cond.notify_all()
+            self._sync_producer()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"subscribers": self.subscribers, "published": self.published, "skipped": self.skipped}
@@ -0,0 +1,243 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable
+
+import ollama
+
+from app.config import get_env_number
+
+
+LLM_MODEL = "gemma3:1b"
+
+
+def _keep_alive(raw: str) -> float | str:
+    # Ollama takes either seconds or a duration string like "30m"; -1 keeps the model loaded forever
+    try:
+        return float(raw)
+    except ValueError:
+        return raw
+
+
+def _percentiles(samples: deque) -> dict:
+    if not samples:
+        return {"p50": None, "p95": None, "max": None}
+    ordered = sorted(samples)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+    return {"p50": pick(0.5), "p95": pick(0.95), "max": round(ordered[-1] * 1000, 1)}
+
+
+class LLMGateway:
+    """Request queue in front of the local Ollama server, shared by everything that asks the LLM for feedback.
+
+    All calls run on one background event loop through one ``ollama.AsyncClient``.
+    At most ``concurrency`` chat calls run at once across all callers (match
+    the server's OLLAMA_NUM_PARALLEL); the rest wait in the queue. Identical
+    prompts for the same model that are queued or running at the same time
+    are coalesced into one call whose answer every caller receives. Each call
+    sends ``keep_alive`` so the model stays loaded between shots, and is
+    cancelled after ``timeout_s``.
+
+    ``chat`` blocks and can be called from any thread; ``achat`` and
+    ``astream`` are for coroutines running on some other event loop.
+    """
+
+    def __init__(self, host: str | None = None, model: str = LLM_MODEL, concurrency: int = 2,
+                 timeout_s: float = 60.0, keep_alive: float | str = "30m",
+                 client_factory: Callable[[], Any] | None = None, window: int = 256):
+        self.host = host
+        self.model = model
+        self.concurrency = max(1, concurrency)
+        self.timeout_s = timeout_s
+        self.keep_alive = keep_alive
+        self._client_factory = client_factory or (lambda: ollama.AsyncClient(host=self.host))
+        self._lock = threading.Lock()
+        self._inflight: dict[str, tuple[asyncio.Task, list[int]]] = {}
+        self._latency: deque[float] = deque(maxlen=window)
+        self._queue_wait: deque[float] = deque(maxlen=window)
+        self._queued = 0
+        self._running = 0
+        self._counts = {"requests": 0, "calls": 0, "coalesced": 0, "errors": 0, "timeouts": 0}
+
+        self._loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, args=(ready,), name="llm-gateway", daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def _run_loop(self, ready: threading.Event) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._client = self._client_factory()
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._loop.call_soon(ready.set)
+        self._loop.run_forever()
+        self._loop.close()
+
+    def _submit(self, coro) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    async def _slot(self):
+        queued_at = time.perf_counter()
+        with self._lock:
+            self._queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            with self._lock:
+                self._queued -= 1
+        with self._lock:
+            self._running += 1
+            self._queue_wait.append(time.perf_counter() - queued_at)
+
+    def _release(self) -> None:
+        self._slots.release()
+        with self._lock:
+            self._running -= 1
+
+    async def _call(self, model: str, messages: list[dict], options: dict | None) -> str:
+        await self._slot()
+        started = time.perf_counter()
+        try:
+            self._count("calls")
+            response = await asyncio.wait_for(
+                self._client.chat(model=model, messages=messages, options=options, keep_alive=self.keep_alive),
+                self.timeout_s,
+            )
+        except asyncio.TimeoutError:
+            self._count("timeouts")
+            raise
+        except Exception:
+            self._count("errors")
+            raise
+        finally:
+            self._release()
+        with self._lock:
+            self._latency.append(time.perf_counter() - started)
+        return response.get("message", {}).get("content", "").strip()
+
+    async def _chat(self, model: str, messages: list[dict], options: dict | None) -> str:
+        self._count("requests")
+        key = json.dumps([model, messages, options], sort_keys=True)
+        if key in self._inflight:
+            task, waiters = self._inflight[key]
+            self._count("coalesced")
+        else:
+            task = self._loop.create_task(self._call(model, messages, options))
+            waiters = [0]
+            self._inflight[key] = (task, waiters)
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        waiters[0] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # the last caller to give up takes the shared call down with it
+            if waiters[0] == 1:
+                task.cancel()
+            raise
+        finally:
+            waiters[0] -= 1
+
+    async def _stream(self, model: str, messages: list[dict], options: dict | None,
+                      push: Callable[[tuple[str, Any]], None]) -> None:
+        self._count("requests")
+        await self._slot()
+        started = time.perf_counter()
+        try:
+            self._count("calls")
+            stream = await self._client.chat(model=model, messages=messages, options=options,
+                                             keep_alive=self.keep_alive, stream=True)
+            try:
+                async for chunk in stream:
+                    text = chunk.get("message", {}).get("content", "")
+                    if text:
+                        push(("chunk", text))
+            finally:
+                await stream.aclose()
+            with self._lock:
+                self._latency.append(time.perf_counter() - started)
+            push(("end", None))
+        except Exception as exc:
+            self._count("errors")
+            push(("error", exc))
+        finally:
+            self._release()
+
+    async def _warm(self, model: str) -> None:
+        # an empty generate request loads the model without producing any text
+        await self._client.generate(model=model, prompt="", keep_alive=self.keep_alive)
+
+    def chat(self, messages: list[dict], model: str | None = None, options: dict | None = None) -> str:
+        """The assistant's reply to ``messages``; blocks the calling thread."""
+        return self._submit(self._chat(model or self.model, messages, options)).result()
+
+    async def achat(self, messages: list[dict], model: str | None = None, options: dict | None = None) -> str:
+        """``chat`` for coroutines; cancelling the caller withdraws it from the queue or shared call."""
+        return await asyncio.wrap_future(self._submit(self._chat(model or self.model, messages, options)))
+
+    async def astream(self, messages: list[dict], model: str | None = None,
+                      options: dict | None = None) -> AsyncIterator[str]:
+        """The reply in pieces as Ollama produces them; closing the iterator stops the generation.
+
+        Streams take a concurrency slot like any call but are never coalesced.
+        """
+        loop = asyncio.get_running_loop()
+        pieces: asyncio.Queue = asyncio.Queue()
+        push = lambda item: loop.call_soon_threadsafe(pieces.put_nowait, item)
+        future = self._submit(self._stream(model or self.model, messages, options, push))
+        try:
+            while True:
+                kind, value = await pieces.get()
+                if kind == "end":
+                    return
+                if kind == "error":
+                    raise value
+                yield value
+        finally:
+            future.cancel()
+
+    def warm(self, model: str | None = None) -> Future:
+        """Ask Ollama to load the model now instead of on the first shot; returns the pending request."""
+        return self._submit(self._warm(model or self.model))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "model": self.model,
+                "concurrency": self.concurrency,
+                "keep_alive": self.keep_alive,
+                "queued": self._queued,
+                "in_flight": self._running,
+                **self._counts,
+                "latency_ms": _percentiles(self._latency),
+                "queue_wait_ms": _percentiles(self._queue_wait),
+            }
+
+    def close(self) -> None:
+        if not self._loop.is_running():
+            return
+        close_client = getattr(self._client, "close", None)
+        if close_client is not None:
+            try:
+                self._submit(close_client()).result(timeout=5)
+            except Exception:
+                pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+
+@lru_cache
+def get_llm_gateway() -> LLMGateway:
+    return LLMGateway(
+        concurrency=get_env_number("LLM_CONCURRENCY", "2", int),
+        timeout_s=get_env_number("LLM_TIMEOUT_S", "60"),
+        keep_alive=_keep_alive(os.getenv("LLM_KEEP_ALIVE", "30m")),
+    )
@@ -3,19 +3,365 @@ import time
 import json
 import uuid
 import math
-from collections import deque
+from bisect import insort
 
 import numpy as np
 import mediapipe as mp
 
 
+class LandmarkRing:
+    """Fixed-capacity ring of per-frame pose arrays.
+
+    Every row is written twice (at ``i`` and ``i + capacity``) so the live
+    window is always a single contiguous slice of the backing arrays and can be
+    viewed or copied without unwrapping. ``feature_shape`` reserves a float64
+    slot per frame for values derived once at ingest (NaN when unavailable).
+    """
+
+    def __init__(self, capacity, n_landmarks=33, feature_shape=()):
+        self.capacity = int(capacity)
+        self.n_landmarks = int(n_landmarks)
+        size = 2 * self.capacity
+        self._pix = np.zeros((size, self.n_landmarks, 4), dtype=np.float32)
+        self._ts = np.zeros(size, dtype=np.float64)
+        self._scale = np.ones(size, dtype=np.float32)
+        self._ball = [None] * size
+        self._feat = np.full((size,) + tuple(feature_shape), np.nan)
+        self._next = 0
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def clear(self):
+        self._next = 0
+        self._len = 0
+
+    def append(self, pix, ts, scale, ball=None, features=np.nan):
+        i = self._next
+        j = i + self.capacity
+        self._pix[i] = pix
+        self._pix[j] = pix
+        self._ts[i] = self._ts[j] = ts
+        self._scale[i] = self._scale[j] = scale
+        self._ball[i] = self._ball[j] = ball
+        self._feat[i] = features
+        self._feat[j] = features
+        self._next = (i + 1) % self.capacity
+        self._len = min(self._len + 1, self.capacity)
+
+    def _slot(self, i):
+        # physical slot of logical index i (negative indices count from the newest row)
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError('ring index out of range')
+        return (self._next - self._len + i) % self.capacity
+
+    def _window(self):
+        start = (self._next - self._len) % self.capacity
+        return slice(start, start + self._len)
+
+    def pix_at(self, i):
+        return self._pix[self._slot(i)]
+
+    def ts_at(self, i):
+        return float(self._ts[self._slot(i)])
+
+    def scale_at(self, i):
+        return float(self._scale[self._slot(i)])
+
+    def ball_at(self, i):
+        return self._ball[self._slot(i)]
+
+    def features_at(self, i):
+        return self._feat[self._slot(i)]
+
+    @property
+    def pix(self):
+        return self._pix[self._window()]
+
+    @property
+    def ts(self):
+        return self._ts[self._window()]
+
+    @property
+    def scale(self):
+        return self._scale[self._window()]
+
+    @property
+    def ball(self):
+        return self._ball[self._window()]
+
+    @property
+    def features(self):
+        return self._feat[self._window()]
+
+
+class ShotFrames:
+    """Growable per-shot copy of pose rows, seeded from a ``LandmarkRing`` pre-roll.
+
+    Besides the raw rows and the per-frame features computed at ingest it
+    carries running per-side summaries for each column of ``wrist_cols`` (and
+    ``knee_cols``): the wrist apex (lowest wrist y, i.e. highest point), the
+    deepest knee bend, the elbow minimum so far, peak hip angle and wrist and
+    forearm velocities, visibility counts, the ball context, and sorted frame
+    gaps and scales for the medians. ``append`` updates them with a few scalar
+    operations per frame, so closing a shot only scans for the phases that
+    depend on where the release and the load ended up.
+    """
+
+    def __init__(self, n_landmarks=33, capacity=128, feature_shape=(), wrist_cols=(), min_visibility=0.0,
+                 knee_cols=()):
+        self._pix = np.zeros((capacity, n_landmarks, 4), dtype=np.float32)
+        self._ts = np.zeros(capacity, dtype=np.float64)
+        self._scale = np.ones(capacity, dtype=np.float32)
+        self._feat = np.full((capacity,) + tuple(feature_shape), np.nan)
+        self._ball = []
+        self._len = 0
+        self.wrist_cols = list(wrist_cols)
+        self.knee_cols = list(knee_cols)
+        self.min_visibility = float(min_visibility)
+        sides = len(self.wrist_cols)
+        # per wrist column: apex over frames where the wrist is visible, and over all frames (-1 = none yet)
+        self.apex = np.full(sides, -1, dtype=np.int64)
+        self.apex_any = np.full(sides, -1, dtype=np.int64)
+        # per side: running elbow minimum up to each frame (NaN until the elbow is seen)
+        self._elbow_min = np.full((capacity, sides), np.nan)
+        self.elbow_seen = [0] * sides
+        self.knee_seen = [0] * sides
+        self.wrist_visible = [0] * sides
+        self.knee_visible = [0] * sides
+        # first frame of the deepest knee bend (-1 = knee never seen)
+        self.load = [-1] * sides
+        self.hip_peak = [math.nan] * sides
+        # (y[i] - y[i-1]) / dt, downward positive, as reported in the shot JSON
+        self.wrist_vy_peak = [-math.inf] * sides
+        # peak |d forearm / dt| and its frame over the gaps with dt != 0 (-1 = none);
+        # a zero gap falls back to the median gap, so it is left to finalize
+        self.snap_v = [-math.inf] * sides
+        self.snap_i = [-1] * sides
+        self.zero_dt = False
+        self.ball_supported = 0
+        self.ball_detected = 0
+        self.in_hand_scores = []
+        self.palm_gaps = []
+        self._sorted_dts = []
+        self._sorted_scales = []
+
+    @classmethod
+    def from_arrays(cls, pix, ts, scale, ball, features, wrist_cols=(), min_visibility=0.0, knee_cols=()):
+        n = len(ts)
+        frames = cls(pix.shape[1], capacity=max(128, 2 * n), feature_shape=features.shape[1:],
+                     wrist_cols=wrist_cols, min_visibility=min_visibility, knee_cols=knee_cols)
+        frames._pix[:n] = pix
+        frames._ts[:n] = ts
+        frames._scale[:n] = scale
+        frames._feat[:n] = features
+        frames._ball = list(ball)
+        frames._len = n
+        frames._seed_summary()
+        return frames
+
+    @classmethod
+    def from_ring(cls, ring, wrist_cols=(), min_visibility=0.0, knee_cols=()):
+        return cls.from_arrays(ring.pix, ring.ts, ring.scale, ring.ball, ring.features, wrist_cols, min_visibility,
+                               knee_cols)
+
+    def __len__(self):
+        return self._len
+
+    def _seed_summary(self):
+        # the same summaries append() keeps, computed for a whole pre-roll with as few array passes as possible
+        n = self._len
+        sides = len(self.wrist_cols)
+        dts = self.ts[1:] - self.ts[:-1]
+        self._sorted_dts = sorted(dts.tolist())
+        self._sorted_scales = sorted(self.scale.tolist())
+        self.zero_dt = 0.0 in self._sorted_dts
+        for state in self._ball:
+            self._add_ball(state)
+        if not sides or not n:
+            return
+
+        E, K, H, F = ShotDetector.ELBOW, ShotDetector.KNEE, ShotDetector.HIP, ShotDetector.FOREARM
+        tracked = self.pix[:, self.wrist_cols + self.knee_cols]
+        wrist_ys = tracked[:, :sides, 1]
+        visible = tracked[:, :, 3] >= self.min_visibility
+        wrist_visible = visible[:, :sides]
+        self.apex_any[:] = wrist_ys.argmin(axis=0)
+        self.apex[:] = np.where(wrist_visible, wrist_ys, np.inf).argmin(axis=0)
+        visible_counts = visible.sum(axis=0).tolist()
+        self.wrist_visible = visible_counts[:sides]
+        self.knee_visible = visible_counts[sides:] or [0] * sides
+        self.apex[[c == 0 for c in self.wrist_visible]] = -1
+
+        features = self.features
+        seen = features == features
+        counts = seen.sum(axis=0).tolist()
+        self.elbow_seen = [c[E] for c in counts]
+        self.knee_seen = [c[K] for c in counts]
+        np.fmin.accumulate(features[:, :, E], axis=0, out=self._elbow_min[:n])
+        load = np.where(seen[:, :, K], features[:, :, K], np.inf).argmin(axis=0).tolist()
+        self.load = [i if c[K] else -1 for i, c in zip(load, counts)]
+        self.hip_peak = np.fmax.reduce(features[:, :, H], axis=0).tolist()
+        if n < 2:
+            return
+
+        wrist_ys = wrist_ys.astype(np.float64)
+        self.wrist_vy_peak = ((wrist_ys[1:] - wrist_ys[:-1]) / np.maximum(dts, 1e-6)[:, None]).max(axis=0).tolist()
+        forearm = features[:, :, F]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            forearm_v = np.abs((forearm[1:] - forearm[:-1]) / dts[:, None])
+        if self.zero_dt:
+            if not dts.any():
+                return
+            forearm_v[dts == 0] = -np.inf
+        snap = forearm_v.argmax(axis=0)
+        self.snap_i = (snap + 1).tolist()
+        self.snap_v = forearm_v[snap, range(sides)].tolist()
+
+    def _add_ball(self, state):
+        if not isinstance(state, dict):
+            return
+        self.ball_supported += 1
+        if state.get('detected'):
+            self.ball_detected += 1
+        if state.get('in_hand_score') is not None:
+            self.in_hand_scores.append(float(state.get('in_hand_score')))
+        if state.get('palm_gap_px') is not None:
+            self.palm_gaps.append(float(state.get('palm_gap_px')))
+
+    def _grow(self):
+        capacity = 2 * self._pix.shape[0]
+        for name in ('_pix', '_ts', '_scale', '_feat', '_elbow_min'):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self._len] = old[:self._len]
+            setattr(self, name, new)
+
+    def append(self, pix, ts, scale, ball=None, features=np.nan):
+        if self._len == self._pix.shape[0]:
+            self._grow()
+        i = self._len
+        self._pix[i] = pix
+        self._ts[i] = ts
+        self._scale[i] = scale
+        self._feat[i] = features
+        self._ball.append(ball)
+        self._len += 1
+
+        insort(self._sorted_scales, float(self._scale[i]))
+        self._add_ball(ball)
+        if i:
+            dt = float(self._ts[i] - self._ts[i - 1])
+            insort(self._sorted_dts, dt)
+            self.zero_dt = self.zero_dt or dt == 0
+        if not self.wrist_cols:
+            return
+        feat = self._feat[i].tolist()
+        feat_prev = self._feat[i - 1].tolist() if i else None
+
+        for k, col in enumerate(self.wrist_cols):
+            y = pix[col, 1]
+            if self.apex_any[k] < 0 or y < self._pix[self.apex_any[k], col, 1]:
+                self.apex_any[k] = i
+            wrist_visible = pix[col, 3] >= self.min_visibility
+            if wrist_visible and (self.apex[k] < 0 or y < self._pix[self.apex[k], col, 1]):
+                self.apex[k] = i
+
+            elbow, knee, hip = feat[k][ShotDetector.ELBOW], feat[k][ShotDetector.KNEE], feat[k][ShotDetector.HIP]
+            self.wrist_visible[k] += bool(wrist_visible)
+            if self.knee_cols and pix[self.knee_cols[k], 3] >= self.min_visibility:
+                self.knee_visible[k] += 1
+            elbow_min = self._elbow_min[i - 1, k] if i else math.nan
+            if elbow == elbow:
+                self.elbow_seen[k] += 1
+                if not elbow >= elbow_min:
+                    elbow_min = elbow
+            self._elbow_min[i, k] = elbow_min
+            if knee == knee:
+                self.knee_seen[k] += 1
+                if self.load[k] < 0 or knee < self._feat[self.load[k], k, ShotDetector.KNEE]:
+                    self.load[k] = i
+            if hip == hip and not hip <= self.hip_peak[k]:
+                self.hip_peak[k] = hip
+            if i:
+                self.wrist_vy_peak[k] = max(self.wrist_vy_peak[k],
+                                            (float(self._pix[i, col, 1]) - float(self._pix[i - 1, col, 1])) / max(dt, 1e-6))
+                if dt != 0:
+                    forearm_v = abs((feat[k][ShotDetector.FOREARM] - feat_prev[k][ShotDetector.FOREARM]) / dt)
+                    if forearm_v > self.snap_v[k]:
+                        self.snap_v[k] = forearm_v
+                        self.snap_i[k] = i
+
+    @staticmethod
+    def _median(values):
+        mid = len(values) // 2
+        return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+
+    def median_dt(self):
+        return self._median(self._sorted_dts) if self._sorted_dts else None
+
+    def median_scale(self):
+        return self._median(self._sorted_scales) if self._sorted_scales else None
+
+    def elbow_min_through(self, i, side):
+        return self._elbow_min[i, side]
+
+    @property
+    def pix(self):
+        return self._pix[:self._len]
+
+    @property
+    def ts(self):
+        return self._ts[:self._len]
+
+    @property
+    def scale(self):
+        return self._scale[:self._len]
+
+    @property
+    def features(self):
+        return self._feat[:self._len]
+
+    @property
+    def ball(self):
+        return self._ball
+
+
 class ShotDetector:
-    def __init__(self, buffer_size=90):
-        self.buf = deque(maxlen=buffer_size)
+    # per-side landmark columns are ordered (right, left)
+    SIDES = ('right', 'left')
+    # per-frame, per-side features computed once at ingest. Angles are NaN when
+    # their joints are not visible, which doubles as the visibility flag:
+    # elbow <-> upper body (wrist/elbow/shoulder), knee/hip <-> lower body (hip/knee/ankle)
+    FEATURES = ('elbow', 'knee', 'hip', 'forearm')
+    ELBOW, KNEE, HIP, FOREARM = range(len(FEATURES))
+
+    # Detection thresholds (tweakable)
+    VY_START_NORM = 1.2        # body-lengths per second upward
+    VY_END_NORM = 0.25         # body-lengths per second upward
+    ELBOW_EXTENSION_MIN = 5.0  # degrees increase
+    KNEE_BEND_START_DEG = 4.0  # degrees from baseline
+    MAX_DURATION = 3.0         # seconds, including pre-roll
+    MIN_SHOT_DURATION = 0.08   # seconds, including pre-roll
+
+    def __init__(self, buffer_size=90, save_shots=True, ball_track=None, wrist_track=None):
+        self.buf = LandmarkRing(buffer_size, feature_shape=(len(self.SIDES), len(self.FEATURES)))
+        # write each finished shot to Shots/shot_<id>.json; off when replaying stored landmarks
+        self.save_shots = save_shots
+        # optional TimeSeriesRings of ball and wrist pixel positions kept by the caller, for
+        # ball-context checks that look them up by time (see ball_separation)
+        self.ball_track = ball_track
+        self.wrist_track = wrist_track
         self.in_shot = False
-        self.current_shot_frames = []
+        self.current_shot_frames = None
         self.last_shot_id = 0
         self.min_landmark_visibility = 0.55
+        # per-frame scratch row: normalized landmarks scaled to pixels in place
+        self._row = np.zeros((self.buf.n_landmarks, 4), dtype=np.float32)
+        self._row_scale = np.ones(4, dtype=np.float32)
 
         # landmarks indices
         self.RW = mp.tasks.vision.PoseLandmark.RIGHT_WRIST.value
@@ -26,19 +372,74 @@ class ShotDetector:
         self.LS = mp.tasks.vision.PoseLandmark.LEFT_SHOULDER.value
         self.MID_HIP = mp.tasks.vision.PoseLandmark.LEFT_HIP.value
 
-    def _visibility(self, entry, idx):
+        Landmark = mp.tasks.vision.PoseLandmark
+        self._side_wrist = [self.RW, self.LW]
+        self._side_elbow = [self.RE, self.LE]
+        self._side_shoulder = [self.RS, self.LS]
+        self._side_hip = [Landmark.RIGHT_HIP.value, Landmark.LEFT_HIP.value]
+        self._side_knee = [Landmark.RIGHT_KNEE.value, Landmark.LEFT_KNEE.value]
+        self._side_ankle = [Landmark.RIGHT_ANKLE.value, Landmark.LEFT_ANKLE.value]
+        self._side_upper = np.array([self._side_wrist, self._side_elbow, self._side_shoulder]).T
+        self._side_lower = np.array([self._side_hip, self._side_knee, self._side_ankle]).T
+        # (angle, side) landmark triplets a-b-c for the ELBOW, KNEE and HIP features
+        self._angle_a = np.array([self._side_shoulder, self._side_hip, self._side_shoulder])
+        self._angle_b = np.array([self._side_elbow, self._side_knee, self._side_hip])
+        self._angle_c = np.array([self._side_wrist, self._side_ankle, self._side_knee])
+        # landmarks that must be visible for each (angle, side): upper body for the elbow, lower body otherwise
+        self._angle_joints = np.array([self._side_upper, self._side_lower, self._side_lower])
+
+        # running knee-angle sum/count per side over the idle baseline window buf[:-2]
+        self._knee_sum = np.zeros(len(self.SIDES))
+        self._knee_count = np.zeros(len(self.SIDES), dtype=np.int64)
+        self._knee_appends = 0
+
+    def config(self):
+        """Settings that determine which shots are found and how they are measured."""
+        return {
+            'buffer_size': self.buf.capacity,
+            'min_landmark_visibility': self.min_landmark_visibility,
+            'VY_START_NORM': self.VY_START_NORM,
+            'VY_END_NORM': self.VY_END_NORM,
+            'ELBOW_EXTENSION_MIN': self.ELBOW_EXTENSION_MIN,
+            'KNEE_BEND_START_DEG': self.KNEE_BEND_START_DEG,
+            'MAX_DURATION': self.MAX_DURATION,
+            'MIN_SHOT_DURATION': self.MIN_SHOT_DURATION,
+        }
+
+    def ball_separation(self, shot, window_s=0.5):
+        """Largest distance in pixels between the wrist at release and the ball in the ``window_s`` after it.
+
+        A made-up shot (no ball leaving the hand) stays close to zero. None
+        without ``ball_track``/``wrist_track`` or when either has no samples
+        around the release.
+        """
+        if self.ball_track is None or self.wrist_track is None:
+            return None
         try:
-            return float(entry['pix'][idx][3])
-        except Exception:
-            return 0.0
+            release_ts = float(shot['phases']['release']['ts'])
+        except (KeyError, TypeError, ValueError):
+            release_ts = float(shot['detection_window']['end'])
+        wrist = self.wrist_track.nearest(release_ts)
+        # strictly after the release (plus a small epsilon), so the ball still in hand doesn't count
+        _, ball_after = self.ball_track.range(release_ts + 0.01, release_ts + window_s, include_start=False)
+        if wrist is None or not len(ball_after):
+            return None
+        return float(np.hypot(*(ball_after - wrist[1]).T).max())
+
+    def _visibility(self, pix, idx):
+        # pix is a (33, 4) row or an (N, 33, 4) stack of rows
+        return pix[..., idx, 3]
 
-    def _has_visibility(self, entry, indices, min_visibility=None):
+    def _has_visibility(self, pix, indices, min_visibility=None):
         threshold = self.min_landmark_visibility if min_visibility is None else float(min_visibility)
-        return all(self._visibility(entry, idx) >= threshold for idx in indices)
+        return (pix[..., indices, 3] >= threshold).all(axis=-1)
 
     def _safe_float(self, value):
         return None if value is None else float(value)
 
+    def _safe_angle(self, value):
+        return None if np.isnan(value) else float(value)
+
     def _angle(self, a, b, c):
         # angle at b between points a-b-c in degrees
         ax, ay = a
@@ -54,257 +455,330 @@ class ShotDetector:
         cosang = max(-1.0, min(1.0, dot / (mag1 * mag2)))
         return math.degrees(math.acos(cosang))
 
+    def _angles(self, a, b, c):
+        # batched _angle over (..., 2) point arrays; returns degrees as float64
+        v1 = np.asarray(a, dtype=np.float64) - b
+        v2 = np.asarray(c, dtype=np.float64) - b
+        dot = v1[..., 0] * v2[..., 0] + v1[..., 1] * v2[..., 1]
+        mag = np.hypot(v1[..., 0], v1[..., 1]) * np.hypot(v2[..., 0], v2[..., 1])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cosang = np.clip(dot / mag, -1.0, 1.0)
+        return np.where(mag == 0, 0.0, np.degrees(np.arccos(cosang)))
+
     def _dist(self, p1, p2):
-        return math.hypot(p1[0]-p2[0], p1[1]-p2[1])
+        # batched euclidean distance over (..., 2) point arrays
+        d = p1 - p2
+        return np.hypot(d[..., 0], d[..., 1])
 
     def _compute_scale(self, pix):
         # compute normalization scale from shoulders and torso
-        # pix is list of (x,y,z,vis)
-        try:
-            ls = pix[mp.tasks.vision.PoseLandmark.LEFT_SHOULDER.value]
-            rs = pix[mp.tasks.vision.PoseLandmark.RIGHT_SHOULDER.value]
-            lh = pix[mp.tasks.vision.PoseLandmark.LEFT_HIP.value]
-            rh = pix[mp.tasks.vision.PoseLandmark.RIGHT_HIP.value]
-            shoulder_width = self._dist((ls[0], ls[1]), (rs[0], rs[1]))
-            torso_len_l = self._dist((ls[0], ls[1]), (lh[0], lh[1]))
-            torso_len_r = self._dist((rs[0], rs[1]), (rh[0], rh[1]))
-            torso_len = (torso_len_l + torso_len_r) / 2.0
-            scale = max(shoulder_width, torso_len, 1.0)
-            return float(scale)
-        except Exception:
-            return 1.0
-
-    def _choose_side(self, lm_list):
+        # pix is a (33, 4) row or an (N, 33, 4) stack of (x, y, z, vis) in pixels
+        xy = pix[..., :2].astype(np.float64)
+        ls = xy[..., mp.tasks.vision.PoseLandmark.LEFT_SHOULDER.value, :]
+        rs = xy[..., mp.tasks.vision.PoseLandmark.RIGHT_SHOULDER.value, :]
+        lh = xy[..., mp.tasks.vision.PoseLandmark.LEFT_HIP.value, :]
+        rh = xy[..., mp.tasks.vision.PoseLandmark.RIGHT_HIP.value, :]
+        shoulder_width = self._dist(ls, rs)
+        torso_len = (self._dist(ls, lh) + self._dist(rs, rh)) / 2.0
+        scale = np.maximum(np.maximum(shoulder_width, torso_len), 1.0)
+        scale = np.where(np.isfinite(scale), scale, 1.0)
+        return float(scale) if scale.ndim == 0 else scale
+
+    def _side_features(self, pix):
+        # FEATURES for each side of a (33, 4) row or an (N, 33, 4) stack -> (..., 2, len(FEATURES))
+        xy = pix[..., :2].astype(np.float64)
+        # elbow, knee and hip angles for both sides in a single batched call
+        angles = self._angles(xy[..., self._angle_a, :], xy[..., self._angle_b, :], xy[..., self._angle_c, :])
+        visible = self._has_visibility(pix, self._angle_joints)
+
+        out = np.empty(visible.shape[:-2] + (len(self.SIDES), len(self.FEATURES)))
+        out[..., :self.FOREARM] = np.swapaxes(np.where(visible, angles, np.nan), -1, -2)
+        forearm = xy[..., self._side_wrist, :] - xy[..., self._side_elbow, :]
+        out[..., self.FOREARM] = np.arctan2(forearm[..., 1], forearm[..., 0])
+        return out
+
+    def _add_knee_baseline(self, knees, sign):
+        seen = ~np.isnan(knees)
+        self._knee_sum += sign * np.where(seen, knees, 0.0)
+        self._knee_count += sign * seen
+
+    def _push_frame(self, row, ts, ball):
+        # append to the ring and slide the knee baseline window (buf[:-2]) in O(1)
+        ring = self.buf
+        if len(ring) == ring.capacity and len(ring) > 2:
+            self._add_knee_baseline(ring.features_at(0)[:, self.KNEE], -1)
+        ring.append(row, ts, self._compute_scale(row), ball, self._side_features(row))
+        if len(ring) >= 3:
+            self._add_knee_baseline(ring.features_at(-3)[:, self.KNEE], +1)
+        self._knee_appends += 1
+        if self._knee_appends % ring.capacity == 0:
+            # re-anchor the running sums so rounding error cannot accumulate
+            window = ring.features[:-2, :, self.KNEE]
+            self._knee_sum = np.nansum(window, axis=0)
+            self._knee_count = np.sum(~np.isnan(window), axis=0)
+
+    def _choose_side(self, pix):
         # choose dominant hand by visibility of wrists
-        try:
-            rv = lm_list[self.RW].visibility
-            lv = lm_list[self.LW].visibility
-            return 'right' if rv >= lv else 'left'
-        except Exception:
-            return 'right'
+        return 'right' if pix[self.RW, 3] >= pix[self.LW, 3] else 'left'
+
+    def _landmark_row(self, lm_list, frame_w, frame_h):
+        # fill the scratch row with (x_px, y_px, z, vis); accepts landmark objects
+        # or an already-normalized (33, 4) array
+        row = self._row
+        if isinstance(lm_list, np.ndarray):
+            row[:] = lm_list
+        else:
+            row.reshape(-1)[:] = np.fromiter(
+                (v for lm in lm_list for v in (lm.x, lm.y, lm.z, getattr(lm, 'visibility', 0.0))),
+                dtype=np.float32,
+                count=4 * len(lm_list),
+            )
+        self._row_scale[0] = frame_w
+        self._row_scale[1] = frame_h
+        row *= self._row_scale
+        return row
 
     def update(self, lm_list, frame_w, frame_h, ts, ball_state=None):
-        # store normalized landmark list + pixel positions + timestamp
-        entry = {'lm': lm_list, 'ts': ts}
-        # compute pixel positions for convenience
-        pix = []
-        for lm in lm_list:
-            pix.append((float(lm.x) * frame_w, float(lm.y) * frame_h, float(lm.z), float(getattr(lm, 'visibility', 0.0))))
-        entry['pix'] = pix
-        entry['ball'] = ball_state if isinstance(ball_state, dict) else None
-        # compute normalization scale per-frame for robustness
-        entry['scale'] = self._compute_scale(pix)
-        self.buf.append(entry)
+        # store pixel-space landmarks + scale + timestamp in the ring buffer
+        row = self._landmark_row(lm_list, frame_w, frame_h)
+        ball = ball_state if isinstance(ball_state, dict) else None
+        self._push_frame(row, ts, ball)
 
         # compute wrist vertical velocity (pixels/sec) using last frames
         if len(self.buf) < 3:
             return None
 
         # choose side
-        side = self._choose_side(lm_list)
-        wrist_idx = self.RW if side == 'right' else self.LW
-        elbow_idx = self.RE if side == 'right' else self.LE
-        shoulder_idx = self.RS if side == 'right' else self.LS
-        knee_idx = mp.tasks.vision.PoseLandmark.RIGHT_KNEE.value if side == 'right' else mp.tasks.vision.PoseLandmark.LEFT_KNEE.value
-        ankle_idx = mp.tasks.vision.PoseLandmark.RIGHT_ANKLE.value if side == 'right' else mp.tasks.vision.PoseLandmark.LEFT_ANKLE.value
-        hip_idx = mp.tasks.vision.PoseLandmark.RIGHT_HIP.value if side == 'right' else mp.tasks.vision.PoseLandmark.LEFT_HIP.value
-
-        upper_indices = [wrist_idx, elbow_idx, shoulder_idx]
-        lower_indices = [hip_idx, knee_idx, ankle_idx]
+        side = self._choose_side(row)
+        side_i = self.SIDES.index(side)
+        wrist_idx = self._side_wrist[side_i]
+        elbow_idx = self._side_elbow[side_i]
+        shoulder_idx = self._side_shoulder[side_i]
+        knee_idx = self._side_knee[side_i]
+        ankle_idx = self._side_ankle[side_i]
+        hip_idx = self._side_hip[side_i]
 
         # get last two frames
-        a = self.buf[-2]
-        b = self.buf[-1]
-        dt = b['ts'] - a['ts'] if b['ts'] != a['ts'] else 1/30
-        ay = a['pix'][wrist_idx][1]
-        by = b['pix'][wrist_idx][1]
+        a = self.buf.pix_at(-2)
+        b = self.buf.pix_at(-1)
+        a_ts = self.buf.ts_at(-2)
+        b_ts = self.buf.ts_at(-1)
+        dt = b_ts - a_ts if b_ts != a_ts else 1/30
+        ay = float(a[wrist_idx, 1])
+        by = float(b[wrist_idx, 1])
         # upward velocity positive (since we compute ay - by)
         vy = (ay - by) / dt
 
         # normalize by body scale (px) to get "body-lengths per second"
-        scale_px = float(b.get('scale', 1.0)) if b else 1.0
-        scale_px = max(scale_px, 1.0)
+        scale_px = max(self.buf.scale_at(-1), 1.0)
         vy_norm = vy / scale_px
 
-        # elbow angle change
-        def elbow_angle_at(entry):
-            if not self._has_visibility(entry, upper_indices):
-                return None
-            pix = entry['pix']
-            shoulder = (pix[shoulder_idx][0], pix[shoulder_idx][1])
-            elbow = (pix[elbow_idx][0], pix[elbow_idx][1])
-            wrist = (pix[wrist_idx][0], pix[wrist_idx][1])
-            return self._angle(shoulder, elbow, wrist)
-
-        elbow_prev = elbow_angle_at(a)
-        elbow_now = elbow_angle_at(b)
-
-
-        # Detection thresholds (tweakable)
-        VY_START_NORM = 1.2       # body-lengths per second upward
-        VY_END_NORM   = 0.25      # body-lengths per second upward
-        ELBOW_EXTENSION_MIN = 5.0  # degrees increase
-        KNEE_BEND_START_DEG = 4.0  # degrees from baseline
-
-        # compute knee angles to help detect load
-        def knee_angle_at(entry):
-            if not self._has_visibility(entry, lower_indices):
-                return None
-            pix = entry['pix']
-            hip = (pix[hip_idx][0], pix[hip_idx][1])
-            knee = (pix[knee_idx][0], pix[knee_idx][1])
-            ankle = (pix[ankle_idx][0], pix[ankle_idx][1])
-            return self._angle(hip, knee, ankle)
+        # elbow angle change and knee angles (computed once at ingest)
+        feat_prev = self.buf.features_at(-2)[side_i]
+        feat_now = self.buf.features_at(-1)[side_i]
+        elbow_prev = self._safe_angle(feat_prev[self.ELBOW])
+        elbow_now = self._safe_angle(feat_now[self.ELBOW])
 
-        knee_prev = knee_angle_at(a)
-        knee_now = knee_angle_at(b)
+        # knee bend against the buffer baseline helps detect load
+        knee_prev = self._safe_angle(feat_prev[self.KNEE])
+        knee_now = self._safe_angle(feat_now[self.KNEE])
 
         if not self.in_shot:
             # detect movement start if wrist moves up quickly and elbow starts extending
             # or if knee begins bending compared to buffer baseline
-            arm_start = elbow_prev is not None and elbow_now is not None and (vy_norm > VY_START_NORM) and ((elbow_now - elbow_prev) > ELBOW_EXTENSION_MIN)
+            arm_start = elbow_prev is not None and elbow_now is not None and (vy_norm > self.VY_START_NORM) and ((elbow_now - elbow_prev) > self.ELBOW_EXTENSION_MIN)
             knee_start = False
             if knee_now is not None:
-                baseline_candidates = [knee_angle_at(e) for e in list(self.buf)[:-2]] if len(self.buf) > 5 else [knee_prev]
-                baseline_vals = [v for v in baseline_candidates if v is not None]
-                if baseline_vals:
-                    baseline_knee = float(np.mean(baseline_vals))
+                if len(self.buf) > 5:
+                    count = self._knee_count[side_i]
+                    baseline_knee = float(self._knee_sum[side_i] / count) if count else None
+                else:
+                    baseline_knee = knee_prev
+                if baseline_knee is not None:
                     knee_drop = baseline_knee - knee_now
-                    knee_start = knee_drop > KNEE_BEND_START_DEG
+                    knee_start = knee_drop > self.KNEE_BEND_START_DEG
 
             if arm_start or knee_start:
                 self.in_shot = True
-                self.current_shot_frames = list(self.buf)  # include buffer pre-roll
+                # include buffer pre-roll
+                self.current_shot_frames = ShotFrames.from_ring(self.buf, self._side_wrist, self.min_landmark_visibility,
+                                                                 self._side_knee)
                 return None
             else:
                 return None
 
         # in shot: append current frame
-        self.current_shot_frames.append(b)
-
-        # determine apex (min wrist y)
-        ys = [f['pix'][wrist_idx][1] for f in self.current_shot_frames]
-        min_y = min(ys)
-        min_idx = ys.index(min_y)
+        frames = self.current_shot_frames
+        # (features and the wrist apex are carried along incrementally)
+        frames.append(b, b_ts, self.buf.scale_at(-1), self.buf.ball_at(-1), self.buf.features_at(-1))
 
         # compute recent vy and end conditions
         recent_vy_norm = vy_norm
-        MAX_DURATION = 3.0
-        MIN_SHOT_DURATION = 0.08
-        start_ts = self.current_shot_frames[0]['ts']
-        if ((recent_vy_norm < VY_END_NORM and b['ts'] - start_ts > MIN_SHOT_DURATION) or (b['ts'] - start_ts) > MAX_DURATION):
-            shot = self._finalize_shot(self.current_shot_frames, wrist_idx, elbow_idx, shoulder_idx, knee_idx, hip_idx, ankle_idx)
+        start_ts = float(frames.ts[0])
+        if ((recent_vy_norm < self.VY_END_NORM and b_ts - start_ts > self.MIN_SHOT_DURATION) or (b_ts - start_ts) > self.MAX_DURATION):
+            shot = self._finalize_shot(frames, wrist_idx, elbow_idx, shoulder_idx, knee_idx, hip_idx, ankle_idx)
             self.in_shot = False
-            self.current_shot_frames = []
+            self.current_shot_frames = None
             return shot
 
         return None
 
+    def detect_all(self, landmarks, ts, frame_w, frame_h, ball_states=None):
+        """Detect every shot in a whole clip at once.
+
+        ``landmarks`` is a (T, 33, 4) array of normalized (x, y, z, visibility)
+        rows for the frames that had a pose, ``ts`` their timestamps in seconds.
+        Per-frame features and the start/end conditions are evaluated for the
+        whole clip with array operations; only the segmentation walks from one
+        shot to the next. Returns the same shots ``update`` would have emitted
+        had the frames been streamed into a fresh detector.
+        """
+        ts = np.asarray(ts, dtype=np.float64)
+        n = len(ts)
+        if n < 3:
+            return []
+        pix = np.asarray(landmarks, dtype=np.float32) * np.array([frame_w, frame_h, 1.0, 1.0], dtype=np.float32)
+        scale = self._compute_scale(pix).astype(np.float32)
+        features = self._side_features(pix)
+        balls = [b if isinstance(b, dict) else None for b in ball_states] if ball_states is not None else [None] * n
+        rows = np.arange(n)
+
+        # side per frame (0 = right, 1 = left) and that side's series
+        side = (pix[:, self.LW, 3] > pix[:, self.RW, 3]).astype(np.int64)
+        wrist_y = pix[rows, np.take(self._side_wrist, side), 1].astype(np.float64)
+        wrist_y_prev = np.empty(n)
+        wrist_y_prev[1:] = pix[rows[1:] - 1, np.take(self._side_wrist, side[1:]), 1]
+        feat_now = features[rows, side]
+        feat_prev = np.full_like(feat_now, np.nan)
+        feat_prev[1:] = features[rows[1:] - 1, side[1:]]
+
+        # normalized upward wrist velocity between each frame and the one before it
+        dt = np.diff(ts, prepend=ts[0])
+        dt = np.where(dt != 0, dt, 1/30)
+        vy_norm = (wrist_y_prev - wrist_y) / dt / np.maximum(scale, 1.0)
+
+        arm_start = (vy_norm > self.VY_START_NORM) & (feat_now[:, self.ELBOW] - feat_prev[:, self.ELBOW] > self.ELBOW_EXTENSION_MIN)
+
+        # knee baseline: mean over the ring window buf[:-2], or the previous frame while the ring holds <= 5 frames
+        knees = features[:, :, self.KNEE]
+        seen = ~np.isnan(knees)
+        knee_sum = np.concatenate([np.zeros((1, 2)), np.cumsum(np.where(seen, knees, 0.0), axis=0)])
+        knee_count = np.concatenate([np.zeros((1, 2), dtype=np.int64), np.cumsum(seen, axis=0)])
+        lo = np.maximum(rows - self.buf.capacity + 1, 0)
+        hi = np.maximum(rows - 1, lo)
+        count = knee_count[hi, side] - knee_count[lo, side]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            baseline = (knee_sum[hi, side] - knee_sum[lo, side]) / count
+        baseline = np.where(count > 0, baseline, np.nan)
+        ring_len = np.minimum(rows + 1, self.buf.capacity)
+        baseline = np.where(ring_len > 5, baseline, feat_prev[:, self.KNEE])
+        knee_start = baseline - feat_now[:, self.KNEE] > self.KNEE_BEND_START_DEG
+
+        start = (rows >= 2) & (arm_start | knee_start)
+        low_vy = vy_norm < self.VY_END_NORM
+
+        shots = []
+        k = 0
+        while True:
+            starts = np.flatnonzero(start[k:])
+            if not len(starts):
+                break
+            k += int(starts[0])
+            s0 = max(0, k - self.buf.capacity + 1)
+            # the shot ends at the first later frame past MIN_SHOT_DURATION with a slow wrist,
+            # or the first one past MAX_DURATION; nothing beyond that can end it
+            stop = min(n, int(np.searchsorted(ts, ts[s0] + self.MAX_DURATION, side='right')) + 1)
+            elapsed = ts[k+1:stop] - ts[s0]
+            ends = np.flatnonzero((low_vy[k+1:stop] & (elapsed > self.MIN_SHOT_DURATION)) | (elapsed > self.MAX_DURATION))
+            if not len(ends):
+                break  # still open when the clip ends, as in streaming
+            j = k + 1 + int(ends[0])
+            window = slice(s0, j + 1)
+            frames = ShotFrames.from_arrays(pix[window], ts[window], scale[window], balls[window], features[window],
+                                            self._side_wrist, self.min_landmark_visibility, self._side_knee)
+            i = side[j]
+            shots.append(self._finalize_shot(frames, self._side_wrist[i], self._side_elbow[i], self._side_shoulder[i],
+                                             self._side_knee[i], self._side_hip[i], self._side_ankle[i]))
+            k = j + 1
+        return shots
+
     def _finalize_shot(self, frames, wrist_idx, elbow_idx, shoulder_idx, knee_idx, hip_idx, ankle_idx):
-        # Build a phase-aware, normalized JSON describing the shot
-        start_ts = frames[0]['ts']
-        end_ts = frames[-1]['ts']
+        # Build a phase-aware, normalized JSON describing the shot.
+        # Counts, extremes and medians were kept up as frames arrived (see ShotFrames);
+        # only the phases that depend on the release and load frames are scanned here.
+        ts = frames.ts
+        pix = frames.pix
+        n = len(ts)
+        start_ts = float(ts[0])
+        end_ts = float(ts[-1])
         detection_window = {'start': start_ts, 'end': end_ts, 'duration': end_ts - start_ts}
 
-        # compute dt array and fps
-        dts = [frames[i]['ts'] - frames[i-1]['ts'] for i in range(1, len(frames))]
-        median_dt = float(np.median(dts)) if dts else 1.0/30.0
+        # median frame gap and fps
+        median_dt = frames.median_dt() if n > 1 else 1.0/30.0
         fps = 1.0 / median_dt if median_dt > 0 else 30.0
 
-        # per-frame angles
-        elbow_angles = []
-        knee_angles = []
-        hip_angles = []
-        wrist_positions = []
-        shoulder_positions = []
-        head_positions = []
-        scales = []
-        ts_list = [f['ts'] for f in frames]
-        upper_indices = [wrist_idx, elbow_idx, shoulder_idx]
-        lower_indices = [hip_idx, knee_idx, ankle_idx]
-
-        wrist_vis = [self._visibility(f, wrist_idx) for f in frames]
-        knee_vis = [self._visibility(f, knee_idx) for f in frames]
-        upper_vis_ratio = float(np.mean([1.0 if self._has_visibility(f, upper_indices) else 0.0 for f in frames])) if frames else 0.0
-        lower_vis_ratio = float(np.mean([1.0 if self._has_visibility(f, lower_indices) else 0.0 for f in frames])) if frames else 0.0
-        wrist_vis_ratio = float(np.mean([1.0 if v >= self.min_landmark_visibility else 0.0 for v in wrist_vis])) if wrist_vis else 0.0
-        knee_vis_ratio = float(np.mean([1.0 if v >= self.min_landmark_visibility else 0.0 for v in knee_vis])) if knee_vis else 0.0
-
-        nose_idx = mp.tasks.vision.PoseLandmark.NOSE.value
-
-        for f in frames:
-            pix = f['pix']
-            scales.append(f.get('scale', 1.0))
-            sh = (pix[shoulder_idx][0], pix[shoulder_idx][1])
-            el = (pix[elbow_idx][0], pix[elbow_idx][1])
-            wr = (pix[wrist_idx][0], pix[wrist_idx][1])
-            hip = (pix[hip_idx][0], pix[hip_idx][1])
-            knee = (pix[knee_idx][0], pix[knee_idx][1])
-            ankle = (pix[ankle_idx][0], pix[ankle_idx][1])
-            nose = (pix[nose_idx][0], pix[nose_idx][1]) if nose_idx < len(pix) else (sh[0], sh[1]-100)
-
-            elbow_angles.append(self._angle(sh, el, wr) if self._has_visibility(f, upper_indices) else np.nan)
-            knee_angles.append(self._angle(hip, knee, ankle) if self._has_visibility(f, lower_indices) else np.nan)
-            hip_angles.append(self._angle(sh, hip, knee) if self._has_visibility(f, lower_indices) else np.nan)
-            wrist_positions.append({'x': wr[0], 'y': wr[1]})
-            shoulder_positions.append({'x': sh[0], 'y': sh[1]})
-            head_positions.append({'x': nose[0], 'y': nose[1]})
+        # per-frame angles were computed at ingest and are NaN where the joints are not visible
+        side_i = self._side_wrist.index(wrist_idx)
+        features = frames.features[:, side_i]
+        elbow_angles = features[:, self.ELBOW]
+        knee_angles = features[:, self.KNEE]
+        hip_angles = features[:, self.HIP]
+        forearm_angles = features[:, self.FOREARM]
+
+        upper_vis_ratio = frames.elbow_seen[side_i] / n if n else 0.0
+        lower_vis_ratio = frames.knee_seen[side_i] / n if n else 0.0
+        wrist_vis_ratio = frames.wrist_visible[side_i] / n if n else 0.0
+        knee_vis_ratio = frames.knee_visible[side_i] / n if n else 0.0
 
         # choose a representative scale (median)
-        scale = float(np.median(scales)) if scales else 1.0
+        scale = frames.median_scale() if n else 1.0
 
-        # release (apex) based on wrist y (minimum y)
-        wrist_ys = [p['y'] for p in wrist_positions]
-        wrist_candidate_indices = [i for i, v in enumerate(wrist_vis) if v >= self.min_landmark_visibility]
-        release_i = min(wrist_candidate_indices, key=lambda i: wrist_ys[i]) if wrist_candidate_indices else int(np.argmin(wrist_ys))
-        release_ts = ts_list[release_i]
+        # release (apex) based on wrist y (minimum y), tracked as frames arrived
+        release_i = int(frames.apex[side_i]) if frames.apex[side_i] >= 0 else int(frames.apex_any[side_i])
+        release_ts = float(ts[release_i])
+        release_wrist_y = float(pix[release_i, wrist_idx, 1])
+        release_head_y = float(pix[release_i, mp.tasks.vision.PoseLandmark.NOSE.value, 1])
+        release_shoulder_y = float(pix[release_i, shoulder_idx, 1])
 
         # Load: maximum knee bend (minimum knee angle)
-        valid_knee_indices = [i for i, v in enumerate(knee_angles) if np.isfinite(v)]
-        load_i = min(valid_knee_indices, key=lambda i: knee_angles[i]) if valid_knee_indices else None
-        load_ts = ts_list[load_i] if load_i is not None else None
+        load_i = frames.load[side_i] if frames.load[side_i] >= 0 else None
+        load_ts = float(ts[load_i]) if load_i is not None else None
 
         # Hip extension start: first index after load where hip angle increases by threshold
         HIP_EXT_THRESH = 4.0
-        hip_at_load = hip_angles[load_i] if load_i is not None and np.isfinite(hip_angles[load_i]) else None
+        hip_at_load = float(hip_angles[load_i]) if load_i is not None and not math.isnan(hip_angles[load_i]) else None
         hip_ext_i = None
-        if load_i is not None and hip_at_load is not None:
-            for i in range(load_i, len(hip_angles)):
-                if np.isfinite(hip_angles[i]) and hip_angles[i] - hip_at_load > HIP_EXT_THRESH:
-                    hip_ext_i = i
-                    break
-        hip_ext_ts = ts_list[hip_ext_i] if hip_ext_i is not None else None
+        if hip_at_load is not None:
+            hits = np.flatnonzero(hip_angles[load_i:] - hip_at_load > HIP_EXT_THRESH)
+            hip_ext_i = load_i + int(hits[0]) if len(hits) else None
+        hip_ext_ts = float(ts[hip_ext_i]) if hip_ext_i is not None else None
 
         # Elbow extension start: first index where elbow angle increases notably before release
         ELBOW_EXT_THRESH = 5.0
-        elbow_vals_before_release = [v for v in elbow_angles[:release_i+1] if np.isfinite(v)]
-        elbow_min_before_release = float(min(elbow_vals_before_release)) if elbow_vals_before_release else None
+        elbow_min_before_release = float(frames.elbow_min_through(release_i, side_i))
+        if math.isnan(elbow_min_before_release):
+            elbow_min_before_release = None
         elbow_ext_i = None
         elbow_start_i = load_i if load_i is not None else 0
         if elbow_min_before_release is not None:
-            for i in range(elbow_start_i, release_i+1):
-                if np.isfinite(elbow_angles[i]) and elbow_angles[i] - elbow_min_before_release > ELBOW_EXT_THRESH:
-                    elbow_ext_i = i
-                    break
-        elbow_ext_ts = ts_list[elbow_ext_i] if elbow_ext_i is not None else None
+            hits = np.flatnonzero(elbow_angles[elbow_start_i:release_i+1] - elbow_min_before_release > ELBOW_EXT_THRESH)
+            elbow_ext_i = elbow_start_i + int(hits[0]) if len(hits) else None
+        elbow_ext_ts = float(ts[elbow_ext_i]) if elbow_ext_i is not None else None
 
         # Wrist snap: max angular velocity of forearm vector (elbow->wrist)
-        forearm_angles = []
-        for i in range(len(frames)):
-            pix = frames[i]['pix']
-            el = (pix[elbow_idx][0], pix[elbow_idx][1])
-            wr = (pix[wrist_idx][0], pix[wrist_idx][1])
-            ang = math.atan2(wr[1]-el[1], wr[0]-el[0])
-            forearm_angles.append(ang)
-        forearm_ang_vel = [abs((forearm_angles[i] - forearm_angles[i-1]) / (ts_list[i] - ts_list[i-1] if ts_list[i] - ts_list[i-1] != 0 else median_dt)) for i in range(1, len(forearm_angles))]
-        if forearm_ang_vel:
+        if n > 1 and frames.zero_dt:
+            # repeated timestamps stand in for the median gap, which is only known now
+            dts = np.diff(ts)
+            forearm_ang_vel = np.abs(np.diff(forearm_angles) / np.where(dts != 0, dts, median_dt))
             snap_i_rel = int(np.argmax(forearm_ang_vel)) + 1
-            snap_ts = ts_list[snap_i_rel]
             snap_ang_v = float(forearm_ang_vel[snap_i_rel-1])
+        elif n > 1:
+            snap_i_rel = frames.snap_i[side_i]
+            snap_ang_v = frames.snap_v[side_i]
         else:
             snap_i_rel = None
-            snap_ts = None
             snap_ang_v = 0.0
+        snap_ts = float(ts[snap_i_rel]) if snap_i_rel is not None else None
 
         # Sequencing
         leg_drive_before_arm = None
@@ -314,44 +788,40 @@ class ShotDetector:
             leg_to_elbow_delay = float((elbow_ext_ts - hip_ext_ts))
 
         # Release-relative heights (normalized)
-        rel_head_y = (head_positions[release_i]['y'] - wrist_positions[release_i]['y']) / scale
-        rel_shoulder_y = (shoulder_positions[release_i]['y'] - wrist_positions[release_i]['y']) / scale
+        rel_head_y = (release_head_y - release_wrist_y) / scale
+        rel_shoulder_y = (release_shoulder_y - release_wrist_y) / scale
 
         # Knee angles at load and at release
-        knee_at_load = float(knee_angles[load_i]) if load_i is not None and np.isfinite(knee_angles[load_i]) else None
-        knee_at_release = float(knee_angles[release_i]) if np.isfinite(knee_angles[release_i]) else None
+        knee_at_load = float(knee_angles[load_i]) if load_i is not None else None
+        knee_at_release = float(knee_angles[release_i]) if not math.isnan(knee_angles[release_i]) else None
 
         # Elbow angles at set (start), load, release, follow-through
-        elbow_at_set = float(elbow_angles[0]) if np.isfinite(elbow_angles[0]) else None
-        elbow_at_load = float(elbow_angles[load_i]) if load_i is not None and np.isfinite(elbow_angles[load_i]) else None
-        elbow_at_release = float(elbow_angles[release_i]) if np.isfinite(elbow_angles[release_i]) else None
+        elbow_at_set = float(elbow_angles[0]) if not math.isnan(elbow_angles[0]) else None
+        elbow_at_load = float(elbow_angles[load_i]) if load_i is not None and not math.isnan(elbow_angles[load_i]) else None
+        elbow_at_release = float(elbow_angles[release_i]) if not math.isnan(elbow_angles[release_i]) else None
 
         # Head stability: vertical variance around release frame (+/- 5 frames)
         window = 5
         r0 = max(0, release_i - window)
-        r1 = min(len(head_positions)-1, release_i + window)
-        head_ys = [head_positions[i]['y'] for i in range(r0, r1+1)]
-        head_var = float(np.var(head_ys) / (scale*scale)) if head_ys else 0.0
+        r1 = min(n-1, release_i + window)
+        head_ys = pix[r0:r1+1, mp.tasks.vision.PoseLandmark.NOSE.value, 1].tolist()
+        head_mean = sum(head_ys) / len(head_ys)
+        head_var = sum((y - head_mean) ** 2 for y in head_ys) / len(head_ys) / (scale*scale)
 
         # Follow-through: detect wrist flexion after release and hold duration
         # approximate wrist flexion by change in forearm angle relative to release
+        FLEX_THRESH = 0.15  # radians
+        flexed = np.abs(forearm_angles - forearm_angles[release_i]) > FLEX_THRESH
         follow_start_i = None
         follow_end_i = None
-        if forearm_angles:
-            ref_ang = forearm_angles[release_i]
-            FLEX_THRESH = 0.15  # radians
-            for i in range(release_i+1, len(forearm_angles)):
-                if abs(forearm_angles[i] - ref_ang) > FLEX_THRESH:
-                    follow_start_i = i
-                    break
-            if follow_start_i is not None:
-                # hold duration: how long angle stays beyond threshold
-                hold_i = follow_start_i
-                while hold_i < len(forearm_angles) and abs(forearm_angles[hold_i] - ref_ang) > FLEX_THRESH:
-                    hold_i += 1
-                follow_end_i = hold_i
-        follow_start_ts = ts_list[follow_start_i] if follow_start_i is not None else None
-        follow_end_ts = ts_list[follow_end_i] if follow_end_i is not None and follow_end_i < len(ts_list) else None
+        hits = np.flatnonzero(flexed[release_i+1:])
+        if len(hits):
+            follow_start_i = release_i + 1 + int(hits[0])
+            # hold duration: how long angle stays beyond threshold
+            released = np.flatnonzero(~flexed[follow_start_i:])
+            follow_end_i = follow_start_i + int(released[0]) if len(released) else n
+        follow_start_ts = float(ts[follow_start_i]) if follow_start_i is not None else None
+        follow_end_ts = float(ts[follow_end_i]) if follow_end_i is not None and follow_end_i < n else None
         follow_hold_duration = float(follow_end_ts - follow_start_ts) if follow_start_ts and follow_end_ts else 0.0
 
         quality_score = 0.6 * upper_vis_ratio + 0.4 * lower_vis_ratio
@@ -362,18 +832,15 @@ class ShotDetector:
         else:
             confidence = 'low'
 
-        ball_states = [f.get('ball') for f in frames]
-        ball_supported = any(isinstance(state, dict) for state in ball_states)
-        supported_ball_states = [state for state in ball_states if isinstance(state, dict)]
+        ball_supported = frames.ball_supported > 0
         ball_presence_ratio = 0.0
-        if supported_ball_states:
-            detected_count = sum(1 for state in supported_ball_states if bool(state.get('detected')))
-            ball_presence_ratio = float(detected_count / len(supported_ball_states))
+        if ball_supported:
+            ball_presence_ratio = float(frames.ball_detected / frames.ball_supported)
 
-        in_hand_scores = [float(state.get('in_hand_score')) for state in supported_ball_states if state.get('in_hand_score') is not None]
+        in_hand_scores = frames.in_hand_scores
         ball_in_hand_score = float(np.mean(in_hand_scores)) if in_hand_scores else None
 
-        palm_gap_vals = [float(state.get('palm_gap_px')) for state in supported_ball_states if state.get('palm_gap_px') is not None]
+        palm_gap_vals = frames.palm_gaps
         palm_gap_px_mean = float(np.mean(palm_gap_vals)) if palm_gap_vals else None
         palm_gap_px_std = float(np.std(palm_gap_vals)) if len(palm_gap_vals) > 1 else (0.0 if len(palm_gap_vals) == 1 else None)
 
@@ -421,17 +888,17 @@ class ShotDetector:
                         'at_release_deg': self._safe_float(knee_at_release)
                     },
                     'hip': {
-                        'at_load_deg': self._safe_float(hip_angles[load_i]) if load_i is not None and np.isfinite(hip_angles[load_i]) else None,
-                        'peak_extension_deg': self._safe_float(np.nanmax(hip_angles)) if np.any(np.isfinite(hip_angles)) else None
+                        'at_load_deg': self._safe_float(hip_at_load),
+                        'peak_extension_deg': self._safe_angle(frames.hip_peak[side_i])
                     }
                 },
                 'velocities': {
-                    'peak_wrist_vertical_px_s': float(np.max(np.diff(wrist_ys) / np.maximum(np.array(dts), 1e-6))) if len(dts) else 0.0,
-                    'peak_forearm_angular_velocity_rad_s': float(max(forearm_ang_vel)) if forearm_ang_vel else 0.0
+                    'peak_wrist_vertical_px_s': frames.wrist_vy_peak[side_i] if n > 1 else 0.0,
+                    'peak_forearm_angular_velocity_rad_s': snap_ang_v
                 },
                 'release': {
                     'ts': float(release_ts),
-                    'wrist_y_px': float(wrist_positions[release_i]['y']),
+                    'wrist_y_px': release_wrist_y,
                     'wrist_above_head_norm': rel_head_y,
                     'wrist_above_shoulder_norm': rel_shoulder_y
                 },
@@ -472,13 +939,16 @@ class ShotDetector:
             'frame_count': len(frames)
         }
 
+        if self.save_shots:
+            self._save_shot(shot)
+        return shot
+
+    def _save_shot(self, shot):
         # Save JSON to Shots folder
         try:
             os.makedirs('Shots', exist_ok=True)
-            fname = os.path.join('Shots', f'shot_{shot_id}.json')
+            fname = os.path.join('Shots', f"shot_{shot['id']}.json")
             with open(fname, 'w') as f:
                 json.dump(shot, f, indent=2)
         except Exception:
             pass
-
-        return shot
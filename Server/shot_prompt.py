@@ -0,0 +1,184 @@
+import math
+import re
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Fact:
+    """One observation about a shot: its summary sentence plus how it should be coached.
+
+    ``verdict`` is "good" (a strength), "fair" or "poor" (something to work
+    on, poor first) or "info" (context only, never coached).
+    """
+    topic: str
+    verdict: str
+    text: str
+
+
+def shot_facts(shot: dict) -> list[Fact]:
+    """The bucketed observations the LLM prompt and the rule-based coach are both built from."""
+    facts = []
+
+    # Data quality context
+    quality = shot.get("data_quality", {})
+    confidence = quality.get("confidence", "unknown")
+    occlusion = quality.get("occlusion_flags", {})
+    facts.append(Fact("tracking", "info", f"Tracking confidence: {confidence}"))
+    if occlusion.get("lower_body_occluded"):
+        facts.append(Fact("tracking", "info",
+                          "Lower body was not fully visible — no leg drive or knee data available."))
+    if occlusion.get("upper_body_occluded"):
+        facts.append(Fact("tracking", "info", "Upper body was partially occluded."))
+
+    # Elbow mechanics
+    elbow = shot.get("metrics", {}).get("angles", {}).get("elbow", {})
+    set_deg = elbow.get("at_set_deg")
+    release_deg = elbow.get("at_release_deg")
+    if set_deg is not None:
+        if set_deg < 70:
+            facts.append(Fact("elbow_set", "info", "Elbow is very bent at the set point — arm is compact"))
+        elif set_deg < 100:
+            facts.append(Fact("elbow_set", "info", "Elbow is moderately bent at the set point"))
+        else:
+            facts.append(Fact("elbow_set", "info", "Elbow is fairly open at the set point"))
+    if release_deg is not None:
+        if release_deg < 140:
+            facts.append(Fact("elbow_extension", "poor",
+                              "Elbow did not fully extend at release — arm is still too bent when letting go of the ball"))
+        elif release_deg < 160:
+            facts.append(Fact("elbow_extension", "fair",
+                              "Elbow extension at release is decent but could be straighter"))
+        else:
+            facts.append(Fact("elbow_extension", "good", "Good full elbow extension at release"))
+
+    # Knee mechanics (if available)
+    knee = shot.get("metrics", {}).get("angles", {}).get("knee", {})
+    knee_load = knee.get("min_during_load_deg")
+    if knee_load is not None:
+        if knee_load < 120:
+            facts.append(Fact("knee_bend", "good",
+                              "Good deep knee bend during the load phase — getting power from the legs"))
+        elif knee_load < 150:
+            facts.append(Fact("knee_bend", "fair",
+                              "Moderate knee bend during load — could bend a bit more for extra power"))
+        else:
+            facts.append(Fact("knee_bend", "poor", "Barely any knee bend during load — not using legs enough"))
+
+    # Release point
+    release = shot.get("metrics", {}).get("release", {})
+    above_head = release.get("wrist_above_head_norm")
+    if above_head is not None:
+        if above_head > 0:
+            facts.append(Fact("release_height", "poor",
+                              "Release point is BELOW the head — should aim to release above the head"))
+        else:
+            facts.append(Fact("release_height", "good", "Release point is above the head — good release height"))
+
+    # Follow-through
+    ft = shot.get("metrics", {}).get("follow_through", {})
+    hold = ft.get("hold_duration_s")
+    if hold is not None:
+        if hold < 0.05:
+            facts.append(Fact("follow_through", "poor",
+                              "No follow-through hold detected — hand dropped immediately after release"))
+        elif hold < 0.15:
+            facts.append(Fact("follow_through", "fair",
+                              "Very short follow-through — hand drops too quickly after release"))
+        else:
+            facts.append(Fact("follow_through", "good", "Good follow-through hold — hand stays up after release"))
+
+    # Timing / leg drive
+    timing = shot.get("timing", {})
+    leg_drive = timing.get("leg_drive_before_arm_extension")
+    if leg_drive is True:
+        facts.append(Fact("sequencing", "good", "Good sequencing: legs drive before arm extension"))
+    elif leg_drive is False:
+        facts.append(Fact("sequencing", "poor",
+                          "Arm extended before legs — should initiate shot from the legs up"))
+
+    # Wrist snap
+    wrist_snap = shot.get("phases", {}).get("wrist_snap", {})
+    snap_vel = wrist_snap.get("angular_velocity_rad_s")
+    if snap_vel is not None:
+        if snap_vel > 100:
+            facts.append(Fact("wrist_snap", "good", "Strong wrist snap at release"))
+        elif snap_vel > 30:
+            facts.append(Fact("wrist_snap", "fair", "Moderate wrist snap at release"))
+        else:
+            facts.append(Fact("wrist_snap", "poor", "Weak wrist snap — needs more flick of the wrist at release"))
+
+    # Stability
+    stability = shot.get("metrics", {}).get("stability", {})
+    head_var = stability.get("head_vertical_variance_norm")
+    if head_var is not None:
+        if head_var < 0.002:
+            facts.append(Fact("balance", "good", "Head stays steady during the shot — good balance"))
+        else:
+            facts.append(Fact("balance", "poor", "Noticeable head movement during the shot — work on balance"))
+
+    # Guardrails
+    guardrails = shot.get("feedback_guardrails", {})
+    mode = guardrails.get("mode", "normal")
+    if mode == "conservative":
+        facts.append(Fact("guardrail", "info",
+                          "NOTE: Limited visibility means some metrics are missing. Feedback focuses on what was observable."))
+
+    return facts
+
+
+def shot_summary(shot: dict) -> str:
+    """Compact plain-language encoding of a shot record: one bucketed sentence per observation.
+
+    This stands in for the raw record (phases, per-frame flags, ball context)
+    in every prompt, which keeps prompts to a few hundred tokens however much
+    the detector records.
+    """
+    return "\n".join(fact.text for fact in shot_facts(shot))
+
+
+def coaching_prompt(summary: str) -> str:
+    """The coaching request for a shot summary; the same text for uploads and the live rig."""
+    return f"""You are a basketball shooting coach. A player filmed their shot and motion tracking analyzed it.
+
+Here is what the analysis found:
+{summary}
+
+Write short coaching feedback for this player. Use the second person ("you" / "your"). Follow this exact structure:
+
+OVERALL: Write one sentence about the shot overall.
+
+STRENGTHS:
+- Write one thing the player did well.
+- Write another thing the player did well.
+
+WORK ON:
+- Write one thing to improve and include a specific drill to fix it.
+- Write another thing to improve and include a specific drill to fix it.
+
+Important: Start directly with "OVERALL:" — no introduction or preamble. Do not include numbers or data. Do not ask questions. Keep each bullet to one or two sentences. Sound like a real basketball coach giving encouragement after practice."""
+
+
+def encode_shot(shot: dict) -> str:
+    return coaching_prompt(shot_summary(shot))
+
+
+_TOKEN_PIECES = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+
+def count_tokens(text: str) -> int:
+    """Estimated LLM token count of ``text``.
+
+    Counts words in chunks of up to four letters, digits in chunks of up to
+    three, and every other non-space character as one token, which tracks
+    SentencePiece/BPE tokenizers closely enough to compare prompt sizes
+    without loading one.
+    """
+    tokens = 0
+    for piece in _TOKEN_PIECES.findall(text):
+        if piece[0].isalpha():
+            tokens += math.ceil(len(piece) / 4)
+        elif piece[0].isdigit():
+            tokens += math.ceil(len(piece) / 3)
+        else:
+            tokens += 1
+    return tokens
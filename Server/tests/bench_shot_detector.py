@@ -0,0 +1,116 @@
+"""Micro-benchmarks for ShotDetector hot paths.
+
+Run from the Server directory:
+
+    python tests/bench_shot_detector.py
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from legacy_finalize import legacy_finalize_shot
+from shot_detector import ShotDetector, ShotFrames
+from test_shot_detector import FRAME_H, FRAME_W, _synthetic_clip
+
+
+class _QuietDetector(ShotDetector):
+    def _save_shot(self, shot):
+        pass
+
+
+def _shot_frames(detector, lm, ts, n):
+    frames = ShotFrames(feature_shape=(2, len(ShotDetector.FEATURES)), wrist_cols=(detector.RW, detector.LW),
+                        min_visibility=detector.min_landmark_visibility, knee_cols=(26, 25))
+    for i in range(n):
+        row = detector._landmark_row(lm[i], FRAME_W, FRAME_H)
+        frames.append(row, float(ts[i]), detector._compute_scale(row), None, detector._side_features(row))
+    return frames
+
+
+def bench_finalize(repeat=200):
+    detector = _QuietDetector()
+    lm, ts = _synthetic_clip(shots=2)
+    indices = (detector.RW, detector.RE, detector.RS, 26, 24, 28)
+    print("finalize_shot          frames   loop (ms)   vectorized (ms)   speedup")
+    for n in (90, 120, 180):
+        frames = _shot_frames(detector, lm, ts, n)
+        loop = min(timeit.repeat(lambda: legacy_finalize_shot(detector, frames, *indices), number=repeat, repeat=3)) / repeat
+        vec = min(timeit.repeat(lambda: detector._finalize_shot(frames, *indices), number=repeat, repeat=3)) / repeat
+        print(f"{'':23}{n:6d}   {loop * 1e3:9.3f}   {vec * 1e3:15.3f}   {loop / vec:6.1f}x")
+
+
+def bench_idle_update(frames=3000):
+    # a player standing still: no shot ever starts, so every frame is an idle-phase update
+    lm, _ = _synthetic_clip(shots=1)
+    rng = np.random.default_rng(0)
+    idle = lm[:1].repeat(frames, axis=0)
+    idle[:, :, :2] += rng.normal(0.0, 0.0005, size=(frames, 33, 2)).astype(np.float32)
+    ts = np.arange(frames) / 30.0
+    print("idle update            buffer   per frame (us)")
+    for buffer_size in (90, 300, 900):
+        detector = _QuietDetector(buffer_size=buffer_size)
+
+        def run():
+            for i in range(frames):
+                detector.update(idle[i], FRAME_W, FRAME_H, float(ts[i]))
+            assert not detector.in_shot
+
+        elapsed = min(timeit.repeat(run, number=1, repeat=3))
+        print(f"{'':23}{buffer_size:6d}   {elapsed / frames * 1e6:14.1f}")
+
+
+def bench_shot_close(shots=8, max_ratio=3.5):
+    # per-frame update() latency on a clip full of shots: frames that open or close a shot vs all others
+    lm, ts = _synthetic_clip(shots=shots)
+    opening, closing, other = [], [], []
+    for _ in range(3):
+        detector = _QuietDetector()
+        for i in range(len(ts)):
+            was_in_shot = detector.in_shot
+            start = timeit.default_timer()
+            shot = detector.update(lm[i], FRAME_W, FRAME_H, float(ts[i]))
+            elapsed = timeit.default_timer() - start
+            if shot is not None:
+                closing.append(elapsed)
+            elif detector.in_shot and not was_in_shot:
+                opening.append(elapsed)
+            else:
+                other.append(elapsed)
+    print("update latency         frames   median (us)")
+    for label, latencies in (("opening a shot", opening), ("closing a shot", closing), ("other frames", other)):
+        print(f"{'  ' + label:23}{len(latencies) // 3:6d}   {np.median(latencies) * 1e6:11.1f}")
+    # the shot summaries are kept up frame by frame, so neither end of a shot rescans the whole shot
+    for label, latencies in (("opening", opening), ("closing", closing)):
+        ratio = np.median(latencies) / np.median(other)
+        assert ratio <= max_ratio, f"{label} a shot takes {ratio:.1f}x a normal frame"
+
+
+def bench_detect_all(minutes=10):
+    # a long practice session at 30 fps, one jump shot every 4 s: per-frame streaming vs one detect_all() call
+    cycles = int(minutes * 60 / 4.0)
+    lm, ts = _synthetic_clip(shots=cycles)
+    streaming = _QuietDetector()
+
+    def stream():
+        for i in range(len(ts)):
+            streaming.update(lm[i], FRAME_W, FRAME_H, float(ts[i]))
+
+    stream_s = min(timeit.repeat(stream, number=1, repeat=1))
+    batch_s = min(timeit.repeat(lambda: _QuietDetector().detect_all(lm, ts, FRAME_W, FRAME_H), number=1, repeat=3))
+    shots = len(_QuietDetector().detect_all(lm, ts, FRAME_W, FRAME_H))
+    assert shots == cycles, f"expected one detection per shot cycle, got {shots} for {cycles}"
+    print("detect_all             frames    shots   streaming (ms)   batch (ms)   speedup")
+    print(f"{'':23}{len(ts):6d}   {shots:6d}   {stream_s * 1e3:14.1f}   {batch_s * 1e3:10.1f}   "
+          f"{stream_s / batch_s:6.1f}x")
+
+
+if __name__ == "__main__":
+    bench_finalize()
+    bench_idle_update()
+    bench_shot_close()
+    bench_detect_all()
@@ -1,7 +1,9 @@
+import asyncio
 import io
 import json
 import os
 import tempfile
+import time
 from unittest.mock import patch, MagicMock
 
 import cv2
@@ -13,11 +15,23 @@ from fastapi.testclient import TestClient
 import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
+from app.cache import ResultCache
+from app.landmark_store import LandmarkStore
 from app.main import app
+from llm_gateway import LLMGateway
 
 client = TestClient(app)
 
 
+@pytest.fixture(autouse=True)
+def _fresh_caches(tmp_path):
+    # every test analyzes from scratch; nothing leaks into the real cache directories
+    with patch("app.routes.analysis.get_result_cache", return_value=ResultCache(max_entries=16)), \
+         patch("app.routes.analysis.get_feedback_cache", return_value=ResultCache(max_entries=16)), \
+         patch("app.routes.analysis.get_landmark_store", return_value=LandmarkStore(tmp_path / "landmarks")):
+        yield
+
+
 def _make_test_video(frames=90, fps=30, width=640, height=480) -> bytes:
     """Create a minimal mp4 video in memory and return the bytes."""
     tmp = tempfile.NamedTemporaryFile(suffix=".mp4", delete=False)
@@ -176,9 +190,172 @@ def test_analyzed_with_mocked_shot():
     assert data["shot_score"] is not None
     assert data["follow_through_score"] is not None
     assert data["llm_feedback"] == "Great form! Keep it up."
+    assert data["feedback_source"] == "llm"
     assert data["total_shots_detected"] == 1
 
 
+def test_slow_llm_falls_back_to_rule_based_coach_within_budget(monkeypatch):
+    monkeypatch.setenv("LLM_BUDGET_S", "0.3")
+    video_bytes = _make_test_video(frames=30)
+
+    async def hung_llm(shot):
+        await asyncio.sleep(30)
+
+    started = time.perf_counter()
+    with patch("app.routes.analysis._process_video", return_value=[_make_fake_shot()]), \
+         patch("app.routes.analysis._generate_feedback", side_effect=hung_llm):
+        resp = client.post(
+            "/analyze/video",
+            files={"file": ("shot.mp4", video_bytes, "video/mp4")},
+        )
+
+    assert time.perf_counter() - started < 5
+    data = resp.json()
+    assert data["feedback_source"] == "rules"
+    assert data["all_shots"][0]["feedback_error"] == "LLM did not answer in time"
+    assert data["llm_feedback"].startswith("OVERALL:")
+    assert "STRENGTHS:" in data["llm_feedback"] and "WORK ON:" in data["llm_feedback"]
+
+
+def test_sampling_mode_reaches_pipeline_and_frame_counts_are_reported():
+    video_bytes = _make_test_video(frames=30)
+
+    def fake_process(path, stats=None, sampling="full", **kwargs):
+        stats.update({"sampling": sampling, "frames_decoded": 30, "frames_inferred": 12})
+        return [_make_fake_shot()]
+
+    with patch("app.routes.analysis._process_video", side_effect=fake_process), \
+         patch("app.routes.analysis._generate_feedback", return_value="Nice."):
+        resp = client.post(
+            "/analyze/video?sampling=adaptive",
+            files={"file": ("shot.mp4", video_bytes, "video/mp4")},
+        )
+
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["frames_inferred"] == 12
+    assert data["processing"]["sampling"] == "adaptive"
+
+
+def test_feedback_generated_concurrently_with_partial_failures():
+    from app.routes.analysis import _generate_all_feedback
+    shots = [{**_make_fake_shot(), "id": f"shot-{i}"} for i in range(6)]
+
+    async def fake_feedback(shot):
+        if shot["id"] == "shot-2":
+            raise RuntimeError("connection reset")
+        await asyncio.sleep(5 if shot["id"] == "shot-4" else 0.2)
+        return f"feedback for {shot['id']}"
+
+    updates = []
+    started = time.perf_counter()
+    # distinct summaries, so no two shots share a call
+    with patch("app.routes.analysis._build_shot_summary", side_effect=lambda shot: shot["id"]), \
+         patch("app.routes.analysis._generate_feedback", side_effect=fake_feedback):
+        feedback = asyncio.run(_generate_all_feedback(shots, updates.append, budget_s=0.5))
+    elapsed = time.perf_counter() - started
+
+    # all six run together; the slow one is cut off by the 0.5s budget instead of adding its 5s
+    assert elapsed < 1.0
+    assert feedback[0] == {"feedback": "feedback for shot-0", "feedback_source": "llm"}
+    assert feedback[5] == {"feedback": "feedback for shot-5", "feedback_source": "llm"}
+    assert feedback[2]["feedback_source"] == "rules"
+    assert feedback[2]["feedback_error"] == "LLM feedback unavailable: connection reset"
+    assert feedback[4]["feedback_source"] == "rules"
+    assert feedback[4]["feedback"].startswith("OVERALL:")
+    assert updates[-1] == {"shots_done": 6}
+
+
+class _StreamingOllama:
+    """Fake ``ollama.AsyncClient`` whose streamed replies record whether they were closed."""
+    closed = []
+    stall_after_first = False
+
+    async def chat(self, model, messages, stream=False, **kwargs):
+        async def chunks():
+            try:
+                for word in ["OVERALL: ", "Nice ", "shot."]:
+                    yield {"message": {"content": word}}
+                    if self.stall_after_first:
+                        await asyncio.sleep(30)
+            finally:
+                type(self).closed.append(True)
+        return chunks()
+
+
+def _parse_sse(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_stream_sends_scores_before_feedback_tokens():
+    video_bytes = _make_test_video(frames=30)
+    shots = [_make_fake_shot(), {**_make_fake_shot(), "id": "test-shot-002"}]
+
+    gateway = LLMGateway(client_factory=_StreamingOllama)
+    with patch("app.routes.analysis._process_video", return_value=shots), \
+         patch("app.routes.analysis.get_llm_gateway", return_value=gateway):
+        resp = client.post(
+            "/analyze/video/stream",
+            files={"file": ("shot.mp4", video_bytes, "video/mp4")},
+        )
+    gateway.close()
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = _parse_sse(resp.text)
+    names = [name for name, _ in events]
+    assert names[:4] == ["upload", "processing", "shot", "shot"]
+    assert names[-1] == "done" and events[-1][1]["total_shots_detected"] == 2
+    tokens = [data["text"] for name, data in events if name == "token" and data["shot_id"] == "test-shot-001"]
+    assert tokens == ["OVERALL: ", "Nice ", "shot."]
+    feedback = [(data["feedback"], data["feedback_source"]) for name, data in events if name == "feedback"]
+    # the second shot has the same summary and is answered from the feedback cache in one piece
+    assert feedback == [("OVERALL: Nice shot.", "llm"), ("OVERALL: Nice shot.", "llm")]
+
+
+def test_stream_stops_generation_when_client_disconnects(tmp_path):
+    from app.routes.analysis import _analysis_events
+
+    class Request:
+        async def is_disconnected(self):
+            return True
+
+    upload_path = tmp_path / "upload.mp4"
+    upload_path.write_bytes(b"video")
+    _StreamingOllama.closed = []
+    stalling = type("Stalling", (_StreamingOllama,), {"stall_after_first": True})
+    gateway = LLMGateway(client_factory=stalling)
+
+    async def consume():
+        return [event async for event in _analysis_events(Request(), str(upload_path), "full", {"sha256": "x"})]
+
+    with patch("app.routes.analysis._process_video", return_value=[_make_fake_shot()]), \
+         patch("app.routes.analysis.get_llm_gateway", return_value=gateway):
+        events = asyncio.run(consume())
+
+    assert not any(event.startswith("event: token") or event.startswith("event: done") for event in events)
+    # the stalled generation is cancelled on the gateway's loop rather than left running for 30s
+    deadline = time.monotonic() + 2
+    while not _StreamingOllama.closed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert _StreamingOllama.closed == [True]
+    assert gateway.stats()["in_flight"] == 0
+    gateway.close()
+    assert not upload_path.exists()
+
+
+def test_reject_unknown_sampling_mode():
+    resp = client.post(
+        "/analyze/video?sampling=sometimes",
+        files={"file": ("shot.mp4", b"00", "video/mp4")},
+    )
+    assert resp.status_code == 400
+
+
 # -------------------------------------------------------------------
 # Score derivation unit tests
 # -------------------------------------------------------------------
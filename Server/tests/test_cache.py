@@ -0,0 +1,140 @@
+import asyncio
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.cache import ResultCache, config_fingerprint
+from app.main import app
+from llm_gateway import LLMGateway
+
+
+def test_config_fingerprint_is_order_independent_and_sensitive():
+    a = config_fingerprint({"detector": {"VY_START_NORM": 1.2, "MAX_DURATION": 3.0}, "llm": "x"})
+    b = config_fingerprint({"llm": "x", "detector": {"MAX_DURATION": 3.0, "VY_START_NORM": 1.2}})
+    c = config_fingerprint({"llm": "x", "detector": {"MAX_DURATION": 3.0, "VY_START_NORM": 1.3}})
+    assert a == b != c
+
+
+def test_memory_tier_is_lru():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", {"v": 1})
+    cache.put("b", {"v": 2})
+    cache.get("a")
+    cache.put("c", {"v": 3})
+
+    assert cache.get("b") == (None, None)
+    assert cache.get("a") == ({"v": 1}, "memory")
+    assert cache.stats()["misses"] == 1
+
+
+def test_disk_tier_survives_restart_and_evicts_by_size(tmp_path):
+    cache = ResultCache(max_entries=1, disk_dir=tmp_path, max_disk_bytes=250)
+    for i in range(5):
+        cache.put(f"video{i}-cfg", {"payload": "x" * 60, "i": i})
+
+    reopened = ResultCache(max_entries=1, disk_dir=tmp_path, max_disk_bytes=250)
+    assert reopened.stats()["disk_bytes"] <= 250
+    assert reopened.get("video4-cfg") == ({"payload": "x" * 60, "i": 4}, "disk")
+    assert reopened.get("video0-cfg") == (None, None)
+
+
+def test_invalidate_by_video_or_everything(tmp_path):
+    a, b = "a" * 64, "b" * 64
+    cache = ResultCache(max_entries=8, disk_dir=tmp_path, max_disk_bytes=10_000)
+    cache.put(f"{a}-cfg1", {})
+    cache.put(f"{a}-cfg2", {})
+    cache.put(f"{b}-cfg1", {})
+
+    assert cache.invalidate(a) == 2
+    assert cache.get(f"{a}-cfg1") == (None, None)
+    assert cache.get(f"{b}-cfg1")[1] == "memory"
+    assert cache.invalidate() == 1
+    assert cache.stats()["disk_bytes"] == 0
+
+
+@pytest.mark.parametrize("sha256", ["*", "?", "[", "a" * 63, "A" * 64, "a" * 64 + "*"])
+def test_invalidate_refuses_anything_but_a_sha256(tmp_path, sha256):
+    cache = ResultCache(max_entries=8, disk_dir=tmp_path, max_disk_bytes=10_000)
+    cache.put(f"{'c' * 64}-cfg1", {})
+
+    with pytest.raises(ValueError):
+        cache.invalidate(sha256)
+    with patch("app.routes.analysis.get_result_cache", return_value=cache):
+        assert TestClient(app).delete("/analyze/cache", params={"sha256": sha256}).status_code == 422
+    assert cache.stats()["memory_entries"] == 1 and len(list(tmp_path.glob("*.json"))) == 1
+
+
+def test_repeat_upload_is_served_from_cache():
+    client = TestClient(app)
+    fake_shot = {"id": "s1", "data_quality": {"confidence": "high"}}
+    upload = {"file": ("shot.mp4", b"same bytes every time", "video/mp4")}
+
+    with patch("app.routes.analysis.get_result_cache", return_value=ResultCache()), \
+         patch("app.routes.analysis._process_video", return_value=[fake_shot]) as process, \
+         patch("app.routes.analysis._generate_feedback", return_value="Nice shot."):
+        first = client.post("/analyze/video", files=upload).json()
+        second = client.post("/analyze/video", files=upload).json()
+        # a different sampling mode is a different analysis
+        third = client.post("/analyze/video?sampling=adaptive", files=upload).json()
+        removed = client.delete("/analyze/cache", params={"sha256": first["upload"]["sha256"]}).json()
+
+    assert first["cache"]["status"] == "miss" and first["cache"]["stored"]
+    assert second["cache"] == {"status": "hit", "tier": "memory", "key": first["cache"]["key"]}
+    assert second["all_shots"] == first["all_shots"]
+    assert third["cache"]["status"] == "miss"
+    assert process.call_count == 2
+    assert removed == {"removed": 2}
+
+
+def test_llm_outage_is_not_cached():
+    client = TestClient(app)
+    upload = {"file": ("shot.mp4", b"clip", "video/mp4")}
+    with patch("app.routes.analysis.get_result_cache", return_value=ResultCache()), \
+         patch("app.routes.analysis._process_video", return_value=[{"id": "s1"}]), \
+         patch("app.routes.analysis._generate_feedback", side_effect=ConnectionError("timeout")):
+        first = client.post("/analyze/video", files=upload).json()
+        second = client.post("/analyze/video", files=upload).json()
+
+    assert first["feedback_source"] == "rules"
+    assert first["cache"]["stored"] is False
+    assert second["cache"]["status"] == "miss"
+
+
+class _FakeOllama:
+    calls = 0
+
+    async def chat(self, model, messages, **kwargs):
+        type(self).calls += 1
+        return {"message": {"content": f"OVERALL: feedback #{type(self).calls}"}}
+
+
+def test_shots_with_the_same_summary_share_one_llm_call(tmp_path):
+    from app.routes.analysis import _generate_all_feedback
+    cache = ResultCache(max_entries=8, disk_dir=tmp_path, max_disk_bytes=10_000)
+    steady = {"metrics": {"stability": {"head_vertical_variance_norm": 0.001}}}
+    wobbly = {"metrics": {"stability": {"head_vertical_variance_norm": 0.01}}}
+    _FakeOllama.calls = 0
+    gateway = LLMGateway(client_factory=_FakeOllama)
+
+    with patch("app.routes.analysis.get_feedback_cache", return_value=cache), \
+         patch("app.routes.analysis.get_llm_gateway", return_value=gateway):
+        first = asyncio.run(_generate_all_feedback([steady, wobbly, steady, steady]))
+        again = asyncio.run(_generate_all_feedback([wobbly, steady]))
+
+    assert _FakeOllama.calls == 2
+    assert first[0] == first[2] == first[3] != first[1]
+    assert again == [first[1], first[0]]
+    assert cache.stats()["hits"]["memory"] == 2
+
+    # persisted feedback outlives the process
+    reopened = ResultCache(max_entries=8, disk_dir=tmp_path, max_disk_bytes=10_000)
+    with patch("app.routes.analysis.get_feedback_cache", return_value=reopened), \
+         patch("app.routes.analysis.get_llm_gateway", return_value=gateway):
+        assert asyncio.run(_generate_all_feedback([steady])) == [first[0]]
+    assert _FakeOllama.calls == 2
+    gateway.close()
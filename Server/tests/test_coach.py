@@ -0,0 +1,49 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.coach import DRILLS, PRAISE, rule_based_feedback
+from shot_prompt import Fact, shot_facts
+
+
+def _shot(**metrics):
+    return {
+        "data_quality": {"confidence": "high"},
+        "metrics": {
+            "angles": {"elbow": {"at_release_deg": metrics.get("release_deg", 170)}},
+            "follow_through": {"hold_duration_s": metrics.get("hold_s", 0.3)},
+            "stability": {"head_vertical_variance_norm": metrics.get("head_var", 0.001)},
+        },
+        "timing": {"leg_drive_before_arm_extension": metrics.get("leg_drive", True)},
+    }
+
+
+def test_facts_carry_topic_and_verdict():
+    facts = shot_facts(_shot(release_deg=130, hold_s=0.1))
+    verdicts = {f.topic: f.verdict for f in facts}
+    assert verdicts == {"tracking": "info", "elbow_extension": "poor", "follow_through": "fair",
+                        "sequencing": "good", "balance": "good"}
+
+
+def test_worst_problems_are_coached_first_with_drills():
+    text = rule_based_feedback(shot_facts(_shot(release_deg=130, hold_s=0.1, head_var=0.01)))
+    overall, strengths, work_on = text.split("\n\n")
+
+    assert overall.startswith("OVERALL: ")
+    assert strengths.splitlines() == ["STRENGTHS:", f"- {PRAISE['sequencing']}",
+                                      "- You got a full, committed shot off from start to finish."]
+    # both poor verdicts (elbow, balance) come before the fair one (follow-through)
+    assert work_on.splitlines() == ["WORK ON:", f"- {' '.join(DRILLS['elbow_extension'])}",
+                                    f"- {' '.join(DRILLS['balance'])}"]
+
+
+def test_is_deterministic_and_notes_limited_visibility():
+    facts = shot_facts({**_shot(), "feedback_guardrails": {"mode": "conservative"}})
+    assert rule_based_feedback(facts) == rule_based_feedback(list(facts))
+    assert "out of view" in rule_based_feedback(facts).splitlines()[0]
+
+    # nothing to coach on still yields the full two-and-two layout
+    sparse = rule_based_feedback([Fact("tracking", "info", "Tracking confidence: low")])
+    assert sparse.count("\n- ") == 4
+    assert sparse.startswith("OVERALL: We couldn't see enough")
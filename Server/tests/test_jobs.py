@@ -0,0 +1,167 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.cache import ResultCache
+from app.jobs import JobManager, JobStore, QueueFullError
+from app.main import app
+
+
+def _wait_for(manager, job_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.get(job_id)
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = JobManager(JobStore(tmp_path / "jobs"), concurrency=1, max_pending=2)
+    yield manager
+    manager.shutdown(wait=True)
+
+
+def test_job_runs_and_persists_progress_and_result(manager):
+    def work(x, progress):
+        progress({"stage": "half"})
+        return {"value": x * 2}
+
+    job = manager.submit(work, 21)
+    done = _wait_for(manager, job["id"])
+
+    assert done["status"] == "succeeded"
+    assert done["result"] == {"value": 42}
+    assert done["progress"] == {"stage": "half"}
+    # a fresh manager over the same directory still has the result
+    assert JobStore(manager.store.root).load(job["id"])["result"] == {"value": 42}
+
+
+def test_failed_job_records_error(manager):
+    def work(progress):
+        raise ValueError("bad video")
+
+    done = _wait_for(manager, manager.submit(work)["id"])
+    assert done["status"] == "failed"
+    assert done["error"] == "bad video"
+
+
+def test_submit_rejects_when_backlog_is_full(manager):
+    release = threading.Event()
+
+    def work(progress):
+        release.wait(5)
+
+    manager.submit(work)
+    manager.submit(work)
+    with pytest.raises(QueueFullError):
+        manager.submit(work)
+    release.set()
+
+
+def test_unfinished_jobs_are_failed_after_restart(tmp_path):
+    store = JobStore(tmp_path / "jobs")
+    store.save({"id": "abc", "status": "running", "progress": {}, "finished_at": None})
+
+    JobManager(store).shutdown()
+
+    job = store.load("abc")
+    assert job["status"] == "failed"
+    assert "restart" in job["error"]
+
+
+def test_jobs_of_a_live_worker_survive_another_worker_starting(tmp_path):
+    store = JobStore(tmp_path / "jobs")
+    release = threading.Event()
+    first = JobManager(store, max_pending=2)
+    second = None
+    try:
+        job = first.submit(lambda progress: release.wait(5))
+        second = JobManager(store, max_pending=2)
+        assert store.load(job["id"])["status"] in ("queued", "running")
+
+        # the cap counts both workers' jobs
+        second.submit(lambda progress: release.wait(5))
+        with pytest.raises(QueueFullError):
+            second.submit(lambda progress: None)
+
+        # once the first worker stops heartbeating its job is given up on
+        later = time.time() + second.stale_after_s + 1
+        assert second.maintain(now=later)["recovered"] == 1
+        assert store.load(job["id"])["status"] == "failed"
+    finally:
+        release.set()
+        first.shutdown(wait=True)
+        if second is not None:
+            second.shutdown(wait=True)
+
+
+def test_jobs_of_an_exited_process_are_failed_on_startup(tmp_path):
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    store = JobStore(tmp_path / "jobs")
+    store.save({"id": "abc", "status": "running", "progress": {}, "finished_at": None, "heartbeat_at": time.time(),
+                "owner": {"host": socket.gethostname(), "pid": exited.pid, "token": "old"}})
+
+    JobManager(store).shutdown()
+
+    assert store.load("abc")["status"] == "failed"
+
+
+def test_polling_reads_only_the_requested_job(manager):
+    job = manager.submit(lambda progress: 1)
+    _wait_for(manager, job["id"])
+    with patch.object(manager.store, "all", side_effect=AssertionError("scanned the store")):
+        assert manager.get(job["id"])["status"] == "succeeded"
+
+
+def test_fetched_jobs_expire_after_ttl(manager):
+    job = manager.submit(lambda progress: 1)
+    done = _wait_for(manager, job["id"])
+
+    assert manager.purge_expired(now=done["finished_at"] + manager.ttl_s + 1) == 0
+    manager.mark_fetched(done)
+    assert manager.maintain(now=done["fetched_at"] + manager.ttl_s + 1)["purged"] == 1
+    assert manager.get(job["id"]) is None
+
+
+def test_job_endpoints_submit_poll_and_fetch(manager):
+    client = TestClient(app)
+    with patch("app.routes.analysis.get_job_manager", return_value=manager), \
+         patch("app.routes.analysis.get_result_cache", return_value=ResultCache()), \
+         patch("app.routes.analysis._process_video", return_value=[]):
+        resp = client.post("/analyze/jobs", files={"file": ("shot.mp4", b"fake video", "video/mp4")})
+        assert resp.status_code == 202
+        job_id = resp.json()["job_id"]
+
+        _wait_for(manager, job_id)
+        status_resp = client.get(f"/analyze/jobs/{job_id}")
+        assert status_resp.json()["status"] == "succeeded"
+        assert status_resp.json()["progress"]["stage"] == "pose"
+
+        result = client.get(f"/analyze/jobs/{job_id}/result").json()
+        assert result["result"]["status"] == "no_shots_detected"
+        assert client.get("/analyze/jobs/does-not-exist").status_code == 404
+
+    # the uploaded video is removed once the job has run
+    assert [p.name for p in manager.store.job_dir(job_id).iterdir()] == ["job.json"]
+
+
+def test_job_result_is_409_while_running(manager):
+    client = TestClient(app)
+    release = threading.Event()
+    with patch("app.routes.analysis.get_job_manager", return_value=manager):
+        job = manager.submit(lambda progress: release.wait(5))
+        assert client.get(f"/analyze/jobs/{job['id']}/result").status_code == 409
+        release.set()
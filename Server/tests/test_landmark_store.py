@@ -0,0 +1,94 @@
+import json
+import os
+import sys
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.landmark_store import LandmarkStore
+from app.main import app
+from app.rescore import main as rescore_main
+from app.routes import analysis
+from shot_detector import ShotDetector
+from test_shot_detector import FRAME_H, FRAME_W, _assert_same_shot, _synthetic_clip
+
+
+@pytest.fixture(autouse=True)
+def _shots_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LandmarkStore(tmp_path / "landmarks")
+
+
+def test_save_and_load_round_trip_as_memory_maps(store):
+    lm, ts = _synthetic_clip(shots=1)
+    store.save("abc-fp", lm, ts, {"fps": 30.0, "frame_w": FRAME_W, "frame_h": FRAME_H})
+
+    record = store.load("abc-fp")
+    assert isinstance(record.landmarks, np.memmap)
+    np.testing.assert_array_equal(record.landmarks, lm)
+    np.testing.assert_array_equal(record.ts, ts)
+    assert record.meta["frames"] == len(ts)
+    assert store.keys("abc") == ["abc-fp"] and store.keys("zzz") == []
+    assert store.load("missing") is None
+
+
+def test_empty_clip_round_trips(store):
+    store.save("empty-fp", np.empty((0, 33, 4), np.float32), np.empty(0), {"frame_w": 1, "frame_h": 1})
+    assert len(store.load("empty-fp").landmarks) == 0
+
+
+def test_process_video_replays_stored_landmarks(store):
+    lm, ts = _synthetic_clip(shots=3)
+    meta = {"fps": 30.0, "frame_w": FRAME_W, "frame_h": FRAME_H}
+    with patch.object(analysis, "get_landmark_store", return_value=store), \
+         patch.object(analysis, "_infer_video", return_value=(lm, ts, meta)) as infer:
+        first_stats, second_stats = {}, {}
+        first = analysis._process_video("clip.mp4", first_stats, video_sha256="abc")
+        second = analysis._process_video("clip.mp4", second_stats, video_sha256="abc")
+
+    assert infer.call_count == 1
+    assert (first_stats["landmarks"], second_stats["landmarks"]) == ("inferred", "replayed")
+    assert len(first) == len(second) > 0
+    for expected, actual in zip(first, second):
+        _assert_same_shot(expected, actual)
+
+
+def test_rescore_applies_current_thresholds(store, monkeypatch, tmp_path):
+    lm, ts = _synthetic_clip(shots=3)
+    store.save("abc-fp", lm, ts, {"fps": 30.0, "frame_w": FRAME_W, "frame_h": FRAME_H})
+    client = TestClient(app)
+
+    with patch.object(analysis, "get_landmark_store", return_value=store):
+        before = client.get("/analyze/landmarks/abc/rescore").json()["videos"][0]["shots"]
+        monkeypatch.setattr(ShotDetector, "VY_START_NORM", 1e9)
+        monkeypatch.setattr(ShotDetector, "KNEE_BEND_START_DEG", 1e9)
+        after = client.get("/analyze/landmarks/abc/rescore").json()["videos"][0]["shots"]
+        assert client.get("/analyze/landmarks/nothing/rescore").status_code == 404
+
+    assert before and "scores" in before[0] and "summary" in before[0]
+    assert after == []
+    # re-scoring is read-only: no shot JSON is written per replayed shot
+    assert not (tmp_path / "Shots").exists()
+
+
+def test_rescore_cli_writes_one_line_per_video(store, tmp_path):
+    lm, ts = _synthetic_clip(shots=2)
+    for key in ("aaa-fp", "bbb-fp"):
+        store.save(key, lm, ts, {"fps": 30.0, "frame_w": FRAME_W, "frame_h": FRAME_H})
+    out = tmp_path / "rescored.jsonl"
+
+    assert rescore_main(["--store", str(store.root), "--out", str(out)]) == 0
+
+    lines = [json.loads(line) for line in out.read_text().splitlines()]
+    assert [line["key"] for line in lines] == ["aaa-fp", "bbb-fp"]
+    assert all(line["shots"] for line in lines)
+    assert not (tmp_path / "Shots").exists()
@@ -0,0 +1,302 @@
+import itertools
+import os
+import queue
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import live_pipeline
+from live_pipeline import DropOldestQueue, FrameBroadcaster, FrameTimer, JpegRing, Stage, StagedPipeline
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_frame_timer_breaks_each_frame_into_stages(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(live_pipeline.time, "perf_counter", clock)
+    timer = FrameTimer(window=10)
+
+    for _ in range(5):
+        timer.start_frame()
+        clock.now += 0.005
+        timer.lap("capture")
+        clock.now += 0.040
+        timer.lap("yolo")
+        clock.now += 0.005
+        timer.lap("encode")
+        # the MJPEG client takes the frame
+        clock.now += 0.050
+
+    stats = timer.stats()
+    assert stats["fps"] == 10.0
+    assert stats["stages_ms"] == {"capture": 5.0, "yolo": 40.0, "encode": 5.0, "stream": 50.0}
+    assert timer.report() == "10.0 fps | capture 5.0 ms, yolo 40.0 ms, encode 5.0 ms, stream 50.0 ms"
+
+
+def test_frame_timer_without_frames():
+    assert FrameTimer().stats() == {"fps": None, "stages_ms": {}}
+
+
+def test_drop_oldest_queue_keeps_the_newest_items():
+    q = DropOldestQueue(2)
+    for i in range(5):
+        q.put(i)
+
+    assert q.stats() == {"depth": 2, "maxsize": 2, "dropped": 3}
+    assert [q.get(), q.get()] == [3, 4]
+    with pytest.raises(queue.Empty):
+        q.get(timeout=0.01)
+
+
+def test_slow_stage_does_not_hold_up_the_source():
+    counter = itertools.count()
+    captured = threading.Event()
+    release = threading.Event()
+
+    def capture():
+        item = next(counter)
+        if item == 50:
+            captured.set()
+        return item
+
+    def slow(item):
+        release.wait()
+        return item
+
+    frames, out = DropOldestQueue(2), DropOldestQueue(100)
+    source = Stage("capture", capture, outbox=frames)
+    sink = Stage("slow", slow, inbox=frames, outbox=out)
+    pipeline = StagedPipeline([source, sink], {"frames": frames, "out": out})
+    pipeline.start()
+    pipeline.start()
+    try:
+        # the source keeps capturing while the next stage is stuck, dropping the stale frames
+        assert captured.wait(timeout=5)
+        release.set()
+        results = [out.get(timeout=5) for _ in range(3)]
+    finally:
+        pipeline.stop()
+
+    stats = pipeline.stats()
+    assert stats["queues"]["frames"]["dropped"] > 0
+    assert stats["stages"]["capture"]["fps"] > 0
+    assert set(stats["stages"]) == {"capture", "slow"}
+    # the stuck stage resumed on fresh frames, not the first ones captured
+    assert results[1] >= 45
+
+
+def test_stage_skips_items_that_fail():
+    inbox, outbox = DropOldestQueue(10), DropOldestQueue(10)
+    for item in [1, 2, 3]:
+        inbox.put(item)
+
+    def fn(item):
+        if item == 2:
+            raise ValueError("bad frame")
+        return item
+
+    stage = Stage("detection", fn, inbox=inbox, outbox=outbox)
+    stage.start()
+    results = [outbox.get(timeout=5), outbox.get(timeout=5)]
+    stage.stop()
+    stage.join()
+
+    assert results == [1, 3]
+    assert stage.stats()["processed"] == 2 and stage.stats()["errors"] == 1
+
+
+class _RecordingStage(Stage):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pauses = []
+
+    def _pause(self, seconds):
+        self.pauses.append(seconds)
+
+
+def test_failing_source_backs_off_then_stops_the_pipeline():
+    def capture():
+        raise OSError("camera unplugged")
+
+    frames = DropOldestQueue(2)
+    source = _RecordingStage("capture", capture, outbox=frames, max_errors=6, backoff_s=(0.01, 0.05))
+    sink = Stage("encode", lambda item: item, inbox=frames)
+    pipeline = StagedPipeline([source, sink], {"frames": frames})
+    pipeline.start()
+    source.join(timeout=5)
+    sink.join(timeout=5)
+
+    # a pause after every failure but the last, doubling up to the cap
+    assert source.pauses == [0.01, 0.02, 0.04, 0.05, 0.05]
+    assert source.errors == 6 and source.gave_up
+    assert pipeline.stats()["failed"] == "capture"
+    assert not sink._thread.is_alive()
+
+
+def test_a_stage_that_gives_up_during_start_stops_the_later_ones():
+    def capture():
+        raise OSError("no camera")
+
+    class _LateStage(Stage):
+        def start(self):
+            # only start once the source has already given up
+            source._stop.wait(timeout=5)
+            super().start()
+
+    frames = DropOldestQueue(2)
+    source = Stage("capture", capture, outbox=frames, max_errors=1)
+    sink = _LateStage("encode", lambda item: item, inbox=frames)
+    pipeline = StagedPipeline([source, sink], {"frames": frames})
+    pipeline.start()
+    sink.join(timeout=5)
+
+    assert pipeline.failed == "capture"
+    assert not pipeline.running and not sink._thread.is_alive()
+
+
+def test_a_success_resets_the_error_streak():
+    results = iter([ValueError, 1, ValueError, 2, ValueError, ValueError])
+
+    def capture():
+        result = next(results)
+        if result is ValueError:
+            raise ValueError("flaky frame")
+        return result
+
+    out = DropOldestQueue(10)
+    source = _RecordingStage("capture", capture, outbox=out, max_errors=2)
+    source.start()
+    source.join(timeout=5)
+
+    # only the two failures in a row at the end add up to max_errors
+    assert source.gave_up and source.processed == 2 and source.errors == 4
+    assert [out.get(), out.get()] == [1, 2]
+
+
+def _wait_for_viewers(hub, count):
+    with hub._cond:
+        assert hub._cond.wait_for(lambda: hub.subscribers == count, timeout=5)
+
+
+def test_broadcaster_serves_every_viewer_from_one_producer():
+    hub = FrameBroadcaster()
+    fast, slow = hub.subscribe(timeout=0.05), hub.subscribe(timeout=0.05)
+    received = {"fast": [], "slow": []}
+    fast_got, slow_got = queue.Queue(), queue.Queue()
+    slow_resume = threading.Event()
+
+    def watch_fast():
+        for frame in fast:
+            received["fast"].append(frame)
+            fast_got.put(frame)
+            if frame == 99:
+                return
+
+    def watch_slow():
+        for frame in slow:
+            received["slow"].append(frame)
+            slow_got.put(frame)
+            if frame == 99:
+                return
+            # still busy with its first frame while the producer moves on
+            slow_resume.wait()
+
+    viewers = [threading.Thread(target=watch_fast), threading.Thread(target=watch_slow)]
+    for viewer in viewers:
+        viewer.start()
+    _wait_for_viewers(hub, 2)
+    hub.publish(0)
+    assert fast_got.get(timeout=5) == 0 and slow_got.get(timeout=5) == 0
+    for frame in range(1, 100):
+        hub.publish(frame)
+        assert fast_got.get(timeout=5) == frame
+    slow_resume.set()
+    for viewer in viewers:
+        viewer.join(timeout=5)
+    fast.close()
+    slow.close()
+
+    stats = hub.stats()
+    assert stats["published"] == 100 and stats["subscribers"] == 0
+    assert received["fast"] == list(range(100))
+    # the slow viewer skips ahead instead of holding the producer back
+    assert received["slow"] == [0, 99]
+    assert stats["skipped"] == 98
+
+
+def test_broadcaster_subscriber_waits_for_a_new_frame():
+    hub = FrameBroadcaster()
+    hub.publish(b"old")
+    frames = hub.subscribe(timeout=0.01)
+
+    def publish_once_subscribed():
+        _wait_for_viewers(hub, 1)
+        hub.publish(b"new")
+
+    publisher = threading.Thread(target=publish_once_subscribed)
+    publisher.start()
+    assert next(frames) == b"new"
+    publisher.join(timeout=5)
+    frames.close()
+
+
+def test_pipeline_runs_only_while_someone_watches():
+    counter = itertools.count()
+    frames = DropOldestQueue(2)
+    hub = FrameBroadcaster()
+    source = Stage("capture", lambda: next(counter), outbox=frames)
+    encode = Stage("encode", hub.publish, inbox=frames)
+    pipeline = StagedPipeline([source, encode], {"frames": frames})
+    hub.on_active, hub.on_idle = pipeline.start, pipeline.stop
+    assert not pipeline.running
+
+    viewer, second = hub.subscribe(timeout=0.05), hub.subscribe(timeout=0.05)
+    first_frame = next(viewer)
+    assert pipeline.running
+    next(second)
+    viewer.close()
+    # one viewer is still watching
+    assert pipeline.running
+
+    second.close()
+    assert not pipeline.running and not source._thread.is_alive()
+    assert hub.stats()["subscribers"] == 0
+
+    # the next viewer starts it again, on new threads
+    stopped_thread = source._thread
+    again = hub.subscribe(timeout=0.05)
+    assert next(again) > first_frame
+    assert pipeline.running and source._thread is not stopped_thread
+    again.close()
+    assert not pipeline.running
+
+
+def test_jpeg_ring_keeps_recent_frames_by_timestamp():
+    ring = JpegRing(max_age_s=1.0, capacity=100)
+    for i in range(60):
+        ring.append(i * 0.05, b"x" * 10)
+
+    # 0.0 .. 2.95s at 20 fps; only the last second (plus the frame exactly at its edge) is kept
+    assert ring.stats() == {"frames": 21, "seconds": 1.0, "bytes": 210}
+    clip = ring.window(2.5, 2.7)
+    assert [round(ts, 2) for ts, _ in clip] == [2.5, 2.55, 2.6, 2.65, 2.7]
+    assert ring.window(0.0, 1.0) == []
+
+
+def test_jpeg_ring_caps_the_frame_count():
+    ring = JpegRing(max_age_s=60.0, capacity=5)
+    for i in range(8):
+        ring.append(float(i), bytes([i]) * (i + 1))
+
+    assert len(ring) == 5
+    assert ring.stats()["bytes"] == sum(range(4, 9))
+    assert [jpeg for _, jpeg in ring.window(0.0, 100.0)] == [bytes([i]) * (i + 1) for i in range(3, 8)]
@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from llm_gateway import LLMGateway
+
+
+class _FakeOllamaServer(ThreadingHTTPServer):
+    """Just enough of Ollama's /api/chat and /api/generate to drive the real ollama client.
+
+    A ``gated`` server holds every chat request until the test lets it
+    through with ``release``, so tests wait on what the server has seen
+    rather than on how long a request takes.
+    """
+    daemon_threads = True
+
+    def __init__(self, gated: bool = False):
+        super().__init__(("127.0.0.1", 0), _FakeOllamaHandler)
+        self.gated = gated
+        self.release = threading.Semaphore(0)
+        self.requests: list[tuple[str, dict]] = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+
+    @property
+    def host(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def wait_until(self, condition, timeout: float = 5.0) -> None:
+        with self.changed:
+            assert self.changed.wait_for(condition, timeout), "the fake Ollama server never got there"
+
+
+class _FakeOllamaHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.changed:
+            server.requests.append((self.path, body))
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            server.changed.notify_all()
+        try:
+            if server.gated and self.path == "/api/chat":
+                server.release.acquire()
+            prompt = body.get("messages", [{}])[-1].get("content", "")
+            words = [f"reply to {prompt}"[i:i + 4] for i in range(0, len(f"reply to {prompt}"), 4)]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            if self.path == "/api/generate":
+                self._line({"model": body["model"], "response": "", "done": True})
+            elif body.get("stream"):
+                for word in words:
+                    self._line({"model": body["model"], "message": {"role": "assistant", "content": word}, "done": False})
+                self._line({"model": body["model"], "message": {"role": "assistant", "content": ""}, "done": True})
+            else:
+                self._line({"model": body["model"], "message": {"role": "assistant", "content": "".join(words)},
+                            "done": True})
+        finally:
+            with server.changed:
+                server.active -= 1
+                server.changed.notify_all()
+
+    def _line(self, payload: dict) -> None:
+        self.wfile.write(json.dumps(payload).encode() + b"\n")
+        self.wfile.flush()
+
+
+@pytest.fixture
+def ollama_server():
+    servers = []
+
+    def start(gated: bool = False) -> _FakeOllamaServer:
+        server = _FakeOllamaServer(gated)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        # let any request a test left waiting finish so the handler threads exit
+        server.release.release(100)
+        server.shutdown()
+        server.server_close()
+
+
+def _ask(text: str) -> list[dict]:
+    return [{"role": "user", "content": text}]
+
+
+def _settle(gateway: LLMGateway, hops: int = 10) -> None:
+    # let every coroutine already handed to the gateway's event loop run until it has to wait
+    async def yield_to_the_loop():
+        for _ in range(hops):
+            await asyncio.sleep(0)
+
+    gateway._submit(yield_to_the_loop()).result(timeout=5)
+
+
+def test_concurrency_is_enforced_across_callers(ollama_server):
+    server = ollama_server(gated=True)
+    gateway = LLMGateway(host=server.host, concurrency=2, keep_alive="30m")
+
+    with ThreadPoolExecutor(max_workers=6) as callers:
+        pending = callers.map(lambda i: gateway.chat(_ask(f"shot {i}")), range(6))
+        server.wait_until(lambda: server.active == 2)
+        while len(server.requests) < 6:
+            # the rest wait in the gateway's queue until a running call finishes, then exactly one follows
+            seen = len(server.requests)
+            assert gateway.stats()["in_flight"] == 2
+            server.release.release()
+            server.wait_until(lambda: len(server.requests) == seen + 1 and server.active == 2)
+        server.release.release(2)
+        replies = list(pending)
+    stats = gateway.stats()
+    gateway.close()
+
+    assert replies == [f"reply to shot {i}" for i in range(6)]
+    assert server.max_active == 2
+    assert all(body["keep_alive"] == "30m" and body["model"] == "gemma3:1b" for _, body in server.requests)
+    assert stats["calls"] == 6 and stats["queued"] == 0 and stats["in_flight"] == 0
+    assert stats["latency_ms"]["p50"] > 0 and stats["queue_wait_ms"]["max"] > 0
+
+
+def test_identical_concurrent_prompts_share_one_call(ollama_server):
+    server = ollama_server(gated=True)
+    gateway = LLMGateway(host=server.host, concurrency=4)
+
+    async def run():
+        callers = [asyncio.ensure_future(gateway.achat(_ask("same summary"))) for _ in range(4)]
+        await asyncio.sleep(0)  # every caller hands its request to the gateway
+        _settle(gateway)
+        # all four are waiting on the single call the server is holding
+        assert gateway.stats()["coalesced"] == 3
+        server.release.release()
+        return await asyncio.gather(*callers)
+
+    replies = asyncio.run(run())
+    stats = gateway.stats()
+    gateway.close()
+
+    assert replies == ["reply to same summary"] * 4
+    assert len(server.requests) == 1
+    assert stats["requests"] == 4 and stats["coalesced"] == 3
+
+
+def test_slow_calls_time_out(ollama_server):
+    # the server never answers, so only the gateway's timeout can end the call
+    server = ollama_server(gated=True)
+    gateway = LLMGateway(host=server.host, timeout_s=0.1)
+
+    with pytest.raises(asyncio.TimeoutError):
+        gateway.chat(_ask("anyone there?"))
+    assert gateway.stats()["timeouts"] == 1
+    gateway.close()
+
+
+def test_async_callers_and_streams(ollama_server):
+    server = ollama_server()
+    gateway = LLMGateway(host=server.host)
+
+    async def run():
+        reply = await gateway.achat(_ask("hello"))
+        pieces = [piece async for piece in gateway.astream(_ask("hello"))]
+        return reply, pieces
+
+    reply, pieces = asyncio.run(run())
+    gateway.close()
+
+    assert len(pieces) > 1
+    assert "".join(pieces) == reply == "reply to hello"
+    assert server.requests[1][1]["stream"] is True
+
+
+def test_warm_loads_the_model_with_keep_alive(ollama_server):
+    server = ollama_server()
+    gateway = LLMGateway(host=server.host, keep_alive=-1)
+
+    gateway.warm().result(timeout=5)
+    gateway.close()
+
+    path, body = server.requests[0]
+    assert path == "/api/generate"
+    assert body["model"] == "gemma3:1b" and body["keep_alive"] == -1
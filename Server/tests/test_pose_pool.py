@@ -0,0 +1,154 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.main import app
+from app.pose_pool import LandmarkerPool, get_pose_pool
+
+
+class _FakeLandmarker:
+    def __init__(self):
+        self.timestamps = []
+        self.closed = False
+        self.previous = None
+
+    def detect_for_video(self, image, timestamp_ms):
+        if self.timestamps and timestamp_ms <= self.timestamps[-1]:
+            raise ValueError("timestamp must be monotonically increasing")
+        self.timestamps.append(timestamp_ms)
+        # like VIDEO-mode tracking, the output depends on the frames seen before
+        tracked, self.previous = (self.previous, image, timestamp_ms), image
+        return tracked
+
+    def close(self):
+        self.closed = True
+
+
+def _pool(size=2):
+    created = []
+
+    def factory():
+        created.append(_FakeLandmarker())
+        return created[-1]
+
+    return LandmarkerPool(size, factory=factory, warmer=lambda lm: lm.detect_for_video(None, 0),
+                          refill_in_background=False), created
+
+
+def test_warm_creates_every_landmarker_and_reports_ready():
+    pool, created = _pool(size=3)
+    assert not pool.ready
+    pool.warm()
+
+    assert pool.ready
+    assert len(created) == 3
+    assert all(lm.timestamps == [0] for lm in created)
+    stats = pool.stats()
+    assert stats["created"] == 3 and stats["idle"] == 3 and stats["in_use"] == 0
+
+
+def test_every_video_gets_a_fresh_warmed_landmarker():
+    pool, created = _pool(size=1)
+    pool.warm()
+    for _ in range(3):
+        with pool.checkout() as landmarker:
+            # every video restarts its own timestamps at 0
+            for ts in (0, 33, 66):
+                landmarker.detect_for_video(None, ts)
+
+    assert len(created) == 4
+    assert all(lm.closed for lm in created[:3])
+    assert all(lm.timestamps[0] == 0 and lm.timestamps == sorted(set(lm.timestamps)) for lm in created)
+    # the replacement for the last video is already warm and waiting
+    assert created[3].timestamps == [0] and pool.stats()["idle"] == 1
+    assert pool.stats()["checkouts"] == 3
+
+
+def test_landmarks_do_not_depend_on_the_previous_video_on_a_slot():
+    pool, _ = _pool(size=1)
+
+    def analyze(frames):
+        with pool.checkout() as landmarker:
+            return [landmarker.detect_for_video(frame, i * 33) for i, frame in enumerate(frames)]
+
+    first = analyze(["a0", "a1", "a2"])
+    analyze(["b0", "b1"])
+    assert analyze(["a0", "a1", "a2"]) == first
+
+
+def test_checkout_waits_for_a_free_landmarker_and_times_out():
+    pool, _ = _pool(size=1)
+    released = threading.Event()
+
+    def hold():
+        with pool.checkout():
+            released.wait()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    while pool.stats()["in_use"] == 0:
+        time.sleep(0.001)
+
+    with pytest.raises(TimeoutError):
+        with pool.checkout(timeout=0.05):
+            pass
+
+    threading.Timer(0.05, released.set).start()
+    with pool.checkout(timeout=2.0):
+        assert pool.stats()["in_use"] == 1
+    holder.join()
+    assert pool.stats()["wait_max_s"] >= 0.04
+
+
+def test_failed_analysis_discards_its_landmarker():
+    pool, created = _pool(size=1)
+    with pytest.raises(RuntimeError):
+        with pool.checkout():
+            raise RuntimeError("inference crashed")
+
+    assert created[0].closed
+    assert pool.stats()["idle"] == 0
+    with pool.checkout(timeout=1.0):
+        assert len(created) == 2
+
+
+def test_ready_endpoint_follows_pool_state(monkeypatch):
+    pool, _ = _pool(size=1)
+    monkeypatch.setattr("app.main.get_pose_pool", lambda: pool)
+    client = TestClient(app)
+
+    resp = client.get("/ready")
+    assert resp.status_code == 503
+    assert resp.json()["status"] == "warming"
+
+    pool.warm()
+    resp = client.get("/ready")
+    assert resp.status_code == 200
+    assert resp.json()["pose_pool"]["ready"] is True
+
+
+def test_get_pose_pool_is_sized_from_env(monkeypatch):
+    monkeypatch.setenv("POSE_POOL_SIZE", "4")
+    get_pose_pool.cache_clear()
+    try:
+        assert get_pose_pool().size == 4
+    finally:
+        get_pose_pool.cache_clear()
+
+
+def test_checkout_timeout_is_read_when_an_upload_arrives(monkeypatch):
+    from app.routes.analysis import _get_pool_checkout_timeout_s
+
+    # set after the routes were imported, as load_dotenv does at app startup
+    monkeypatch.setenv("POSE_POOL_CHECKOUT_TIMEOUT_S", "7.5")
+    assert _get_pool_checkout_timeout_s() == 7.5
+
+    monkeypatch.setenv("POSE_POOL_CHECKOUT_TIMEOUT_S", "soon")
+    with pytest.raises(RuntimeError):
+        _get_pool_checkout_timeout_s()
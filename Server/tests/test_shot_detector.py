@@ -0,0 +1,282 @@
+import math
+import os
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+import pytest
+
+# Ensure Server root is on the path for shot_detector import
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from legacy_finalize import legacy_finalize_shot
+from shot_detector import LandmarkRing, ShotDetector, ShotFrames
+
+FRAME_W = 640
+FRAME_H = 480
+
+
+@dataclass
+class _Landmark:
+    x: float
+    y: float
+    z: float
+    visibility: float
+
+
+def _synthetic_clip(shots=3, fps=30.0, seed=0, cycle_s=4.0):
+    """Build normalized (T, 33, 4) landmarks of a player taking ``shots`` jump shots.
+
+    Each cycle idles, sinks into a shallow load while the shooting arm comes up
+    to its set point, snaps the elbow straight over two frames at release
+    (p = 0.7), holds a wrist flex and drops the arm again. The knees stay
+    slightly bent so pose noise can't fake a knee bend, and the load and set
+    are kept below the start thresholds, so the release snap is the only
+    trigger and every cycle is detected exactly once. A little noise and a few
+    low-visibility frames keep every branch of the detector busy.
+    """
+    rng = np.random.default_rng(seed)
+    n = int(shots * cycle_s * fps)
+    ts = np.arange(n) / fps
+    lm = np.zeros((n, 33, 4), dtype=np.float32)
+    lm[:, :, 3] = 0.9
+
+    for i, t in enumerate(ts):
+        p = (t % cycle_s) / cycle_s
+        # knee bend 0..1 during load, arm raise 0..1: set point by p = 0.7, then straight two frames later
+        bend = math.sin(math.pi * (p - 0.5) / 0.15) if 0.5 <= p < 0.65 else 0.0
+        if p < 0.4:
+            raise_ = 0.0
+        elif p < 0.7:
+            raise_ = 0.25 * (p - 0.4) / 0.3
+        elif p < 0.85:
+            raise_ = min(1.0, 0.25 + 0.75 * (p - 0.7) * cycle_s * fps / 2)
+        else:
+            raise_ = max(0.0, 1.0 - (p - 0.85) / 0.1)
+        flex = min(1.0, max(0.0, (p - 0.72) / 0.03)) if p < 0.78 else max(0.0, 1.0 - (p - 0.78) / 0.05)
+        drop = 0.04 * bend
+
+        pts = {
+            0: (0.50, 0.22 + drop),   # nose
+            11: (0.45, 0.35 + drop),  # left shoulder
+            12: (0.55, 0.35 + drop),  # right shoulder
+            23: (0.47, 0.55 + drop),  # left hip
+            24: (0.53, 0.55 + drop),  # right hip
+            25: (0.485, 0.72 + drop / 2),  # left knee
+            26: (0.545, 0.72 + drop / 2),  # right knee
+            27: (0.47, 0.90),         # left ankle
+            28: (0.53, 0.90),         # right ankle
+            13: (0.42, 0.45 + drop),  # left elbow
+            15: (0.41, 0.55 + drop),  # left wrist
+        }
+        # shooting (right) arm: elbow tucked then extended overhead
+        elbow = (0.60 - 0.03 * raise_, 0.45 - 0.25 * raise_ + drop)
+        wrist = (0.58 - 0.02 * raise_ + 0.03 * flex, 0.40 - 0.35 * raise_ + drop + 0.02 * flex)
+        pts[14] = elbow
+        pts[16] = wrist
+        for idx, (x, y) in pts.items():
+            lm[i, idx, 0] = x
+            lm[i, idx, 1] = y
+        # the left wrist sits behind the body and is less visible than the right
+        lm[i, 15, 3] = 0.5
+
+    lm[:, :, :2] += rng.normal(0.0, 0.0005, size=(n, 33, 2)).astype(np.float32)
+    # a handful of occluded lower-body frames
+    occluded = rng.choice(n, size=max(1, n // 25), replace=False)
+    lm[occluded, 23:29, 3] = 0.2
+    return lm, ts
+
+
+def _run_streaming(lm, ts):
+    detector = ShotDetector()
+    shots = []
+    for i in range(len(ts)):
+        shot = detector.update(lm[i], FRAME_W, FRAME_H, float(ts[i]))
+        if shot is not None:
+            shots.append(shot)
+    return shots
+
+
+@pytest.fixture(autouse=True)
+def _shots_dir(tmp_path, monkeypatch):
+    # _finalize_shot writes JSON into ./Shots; keep that out of the source tree
+    monkeypatch.chdir(tmp_path)
+
+
+def test_landmark_ring_keeps_newest_rows_in_order():
+    ring = LandmarkRing(4, n_landmarks=2)
+    for i in range(7):
+        ring.append(np.full((2, 4), i, dtype=np.float32), ts=float(i), scale=1.0 + i, ball={'i': i})
+
+    assert len(ring) == 4
+    assert ring.ts.tolist() == [3.0, 4.0, 5.0, 6.0]
+    assert ring.pix[:, 0, 0].tolist() == [3.0, 4.0, 5.0, 6.0]
+    assert ring.scale.tolist() == [4.0, 5.0, 6.0, 7.0]
+    assert [b['i'] for b in ring.ball] == [3, 4, 5, 6]
+    assert ring.ts_at(-1) == 6.0 and ring.ts_at(0) == 3.0
+    with pytest.raises(IndexError):
+        ring.pix_at(4)
+
+
+def test_update_accepts_landmark_objects_and_arrays():
+    lm, ts = _synthetic_clip(shots=1)
+    from_arrays = ShotDetector()
+    from_objects = ShotDetector()
+    for i in range(40):
+        from_arrays.update(lm[i], FRAME_W, FRAME_H, float(ts[i]))
+        objs = [_Landmark(*map(float, row)) for row in lm[i]]
+        from_objects.update(objs, FRAME_W, FRAME_H, float(ts[i]))
+
+    np.testing.assert_array_equal(from_arrays.buf.pix, from_objects.buf.pix)
+    np.testing.assert_array_equal(from_arrays.buf.scale, from_objects.buf.scale)
+    assert from_arrays.buf.pix[-1, 16, 0] == pytest.approx(lm[39, 16, 0] * FRAME_W)
+
+
+def test_streaming_detects_synthetic_shots():
+    lm, ts = _synthetic_clip(shots=3)
+    shots = _run_streaming(lm, ts)
+
+    # one detection per jump shot, each closing at its release snap
+    assert len(shots) == 3
+    for k, shot in enumerate(shots):
+        assert shot["phases"]["release"]["ts"] == pytest.approx(4.0 * k + 2.87, abs=0.05)
+        assert shot["frame_count"] > 3
+        assert shot["detection_window"]["duration"] > 0
+        assert shot["phases"]["release"]["ts"] >= shot["detection_window"]["start"]
+
+
+class _ParityDetector(ShotDetector):
+    """Finalizes every shot with both implementations and keeps the pairs."""
+
+    def __init__(self):
+        super().__init__()
+        self.pairs = []
+
+    def _finalize_shot(self, frames, *indices):
+        shot = super()._finalize_shot(frames, *indices)
+        self.pairs.append((legacy_finalize_shot(self, frames, *indices), shot))
+        return shot
+
+
+def _assert_same_shot(expected, actual, path="shot"):
+    if isinstance(expected, dict):
+        assert isinstance(actual, dict), path
+        assert expected.keys() == actual.keys(), path
+        for key in expected:
+            if key != "id":
+                _assert_same_shot(expected[key], actual[key], f"{path}.{key}")
+    elif isinstance(expected, float) and not isinstance(expected, bool):
+        assert type(actual) is float, path
+        assert actual == pytest.approx(expected, rel=1e-9, abs=1e-9), path
+    else:
+        assert type(actual) is type(expected), path
+        assert actual == expected, path
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_vectorized_finalize_matches_loop_implementation(seed):
+    lm, ts = _synthetic_clip(shots=3, seed=seed)
+    detector = _ParityDetector()
+    for i in range(len(ts)):
+        detector.update(lm[i], FRAME_W, FRAME_H, float(ts[i]))
+
+    assert detector.pairs
+    for expected, actual in detector.pairs:
+        _assert_same_shot(expected, actual)
+
+
+def test_vectorized_finalize_matches_with_occluded_body():
+    lm, ts = _synthetic_clip(shots=1)
+    lm[:, 23:29, 3] = 0.1   # lower body never visible
+    lm[::2, 16, 3] = 0.1    # shooting wrist missing on every other frame
+    detector = ShotDetector()
+    frames = ShotFrames(feature_shape=(2, len(ShotDetector.FEATURES)), wrist_cols=(detector.RW, detector.LW),
+                        min_visibility=detector.min_landmark_visibility, knee_cols=(26, 25))
+    for i in range(30, 120):
+        row = detector._landmark_row(lm[i], FRAME_W, FRAME_H)
+        frames.append(row, float(ts[i]), detector._compute_scale(row), None, detector._side_features(row))
+    indices = (detector.RW, detector.RE, detector.RS, 26, 24, 28)
+
+    expected = legacy_finalize_shot(detector, frames, *indices)
+    actual = detector._finalize_shot(frames, *indices)
+
+    _assert_same_shot(expected, actual)
+    assert actual["phases"]["load"]["ts"] is None
+    assert actual["data_quality"]["confidence"] == "low"
+
+
+def test_running_summaries_match_with_ball_context_and_repeated_timestamps():
+    lm, ts = _synthetic_clip(shots=1)
+    ts = ts.copy()
+    ts[70] = ts[69]  # a camera hiccup delivers two frames with the same timestamp
+    rng = np.random.default_rng(3)
+    balls = [None if i % 7 == 0 else {'detected': i % 3 != 0, 'in_hand_score': float(rng.uniform()),
+                                      'palm_gap_px': float(rng.uniform(5, 20)) if i % 2 else None}
+             for i in range(len(ts))]
+    detector = ShotDetector(save_shots=False)
+    pix = np.stack([detector._landmark_row(lm[i], FRAME_W, FRAME_H).copy() for i in range(len(ts))])
+    scale = detector._compute_scale(pix).astype(np.float32)
+    features = detector._side_features(pix)
+    indices = (detector.RW, detector.RE, detector.RS, 26, 24, 28)
+
+    # a pre-roll seeded at once, then frames appended one by one as in update()
+    frames = ShotFrames.from_arrays(pix[30:90], ts[30:90], scale[30:90], balls[30:90], features[30:90],
+                                    detector._side_wrist, detector.min_landmark_visibility, detector._side_knee)
+    for i in range(90, 120):
+        frames.append(pix[i], float(ts[i]), scale[i], balls[i], features[i])
+
+    actual = detector._finalize_shot(frames, *indices)
+    _assert_same_shot(legacy_finalize_shot(detector, frames, *indices), actual)
+    assert actual["ball_context"]["supported"] and actual["ball_context"]["palm_gap_px_std"] is not None
+
+
+def test_rolling_knee_baseline_matches_window_mean():
+    lm, ts = _synthetic_clip(shots=2)
+    detector = ShotDetector(buffer_size=20)
+    for i in range(len(ts)):
+        detector.update(lm[i], FRAME_W, FRAME_H, float(ts[i]))
+        window = detector.buf.features[:-2, :, ShotDetector.KNEE]
+        np.testing.assert_array_equal(detector._knee_count, np.sum(~np.isnan(window), axis=0))
+        seen = detector._knee_count > 0
+        expected = np.nanmean(window[:, seen], axis=0) if seen.any() else []
+        np.testing.assert_allclose(detector._knee_sum[seen] / detector._knee_count[seen], expected, rtol=1e-12)
+
+
+@pytest.mark.parametrize("seed,shots", [(0, 3), (1, 8), (2, 8)])
+def test_detect_all_matches_streaming(seed, shots):
+    lm, ts = _synthetic_clip(shots=shots, seed=seed)
+    streamed = _run_streaming(lm, ts)
+    batched = ShotDetector().detect_all(lm, ts, FRAME_W, FRAME_H)
+
+    assert len(batched) == len(streamed) == shots
+    assert [s["detection_window"] for s in batched] == [s["detection_window"] for s in streamed]
+    for expected, actual in zip(streamed, batched):
+        _assert_same_shot(expected, actual)
+
+
+def test_detect_all_handles_short_and_idle_clips():
+    lm, ts = _synthetic_clip(shots=1)
+    detector = ShotDetector()
+    assert detector.detect_all(lm[:2], ts[:2], FRAME_W, FRAME_H) == []
+    idle = lm[:1].repeat(200, axis=0)
+    assert detector.detect_all(idle, np.arange(200) / 30.0, FRAME_W, FRAME_H) == []
+
+
+def test_ball_separation_reads_wrist_and_ball_tracks_by_time():
+    from timeseries import TimeSeriesRing
+
+    ball, wrist = TimeSeriesRing(16), TimeSeriesRing(16)
+    detector = ShotDetector(save_shots=False, ball_track=ball, wrist_track=wrist)
+    shot = {'phases': {'release': {'ts': 1.0}}, 'detection_window': {'end': 1.2}}
+    assert detector.ball_separation(shot) is None
+
+    for i in range(10):
+        ts = (8 + i) / 10
+        wrist.append(ts, (100.0, 200.0 - i))
+        # the ball sits in the hand until the release, then flies up and away
+        ball.append(ts, (100.0, 200.0) if ts <= 1.0 else (100.0 + 30 * (ts - 1.0) * 10, 200.0 - 40 * (ts - 1.0) * 10))
+
+    # wrist nearest the release is (100, 198); the last ball sample within 0.5 s is at ts=1.5
+    assert detector.ball_separation(shot) == pytest.approx(math.hypot(150.0, 198.0 - 0.0))
+    assert ShotDetector(save_shots=False).ball_separation(shot) is None
@@ -0,0 +1,43 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from shot_prompt import count_tokens, encode_shot, shot_summary
+from test_shot_detector import _run_streaming, _synthetic_clip
+
+
+@pytest.fixture
+def shot(tmp_path, monkeypatch):
+    # _finalize_shot writes JSON into ./Shots; keep that out of the source tree
+    monkeypatch.chdir(tmp_path)
+    lm, ts = _synthetic_clip(shots=2)
+    return _run_streaming(lm, ts)[0]
+
+
+def test_prompt_is_a_fraction_of_the_raw_record(shot):
+    # what the live rig used to send: instructions plus the whole record as indented JSON
+    raw_prompt = (
+        "I collected basketball shot form data. Provide feedback in four sections: "
+        "overall assessment, strengths, areas for improvement, and top 3 prioritized recommendations. "
+        f"Data: {json.dumps(shot, indent=2)}"
+    )
+    prompt = encode_shot(shot)
+
+    # the summary stands in for the record; the coaching instructions are unchanged
+    assert count_tokens(shot_summary(shot)) * 5 < count_tokens(json.dumps(shot, indent=2))
+    assert count_tokens(prompt) * 2.5 < count_tokens(raw_prompt)
+    assert shot_summary(shot) in prompt
+    assert shot["id"] not in prompt
+
+
+def test_token_estimate_tracks_text_size():
+    assert count_tokens("") == 0
+    assert count_tokens("Good follow-through hold") == 7
+    sentence = "Release point is above the head — good release height"
+    assert len(sentence) / 5 < count_tokens(sentence) < len(sentence) / 2
+    assert count_tokens(f"{sentence} {sentence}") == 2 * count_tokens(sentence)
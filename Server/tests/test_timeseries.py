@@ -0,0 +1,56 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from timeseries import TimeSeriesRing
+
+
+def _filled(n, capacity=8):
+    ring = TimeSeriesRing(capacity)
+    for i in range(n):
+        ring.append(float(i), (i, 10 * i))
+    return ring
+
+
+def test_ring_keeps_the_newest_samples_in_time_order():
+    ring = _filled(13)
+
+    assert len(ring) == 8
+    np.testing.assert_array_equal(ring.ts, range(5, 13))
+    np.testing.assert_array_equal(ring.values[:, 1], range(50, 130, 10))
+
+
+def test_nearest_picks_the_closest_sample():
+    ring = _filled(13)
+
+    assert ring.nearest(8.6)[0] == 9.0
+    np.testing.assert_array_equal(ring.nearest(8.4)[1], [8, 80])
+    # outside the window clamps to the oldest / newest sample
+    assert ring.nearest(-5.0)[0] == 5.0
+    assert ring.nearest(99.0)[0] == 12.0
+    assert TimeSeriesRing(4).nearest(1.0) is None
+
+
+def test_range_is_inclusive_unless_asked_otherwise():
+    ring = _filled(13)
+
+    ts, values = ring.range(7.0, 10.0)
+    np.testing.assert_array_equal(ts, [7, 8, 9, 10])
+    np.testing.assert_array_equal(values[:, 0], [7, 8, 9, 10])
+
+    ts, _ = ring.range(7.0, 10.0, include_start=False)
+    np.testing.assert_array_equal(ts, [8, 9, 10])
+    assert len(ring.range(20.0, 30.0)[0]) == 0
+
+
+def test_out_of_order_samples_are_rejected():
+    ring = _filled(3)
+    with pytest.raises(ValueError):
+        ring.append(0.5, (0, 0))
+    ring.clear()
+    ring.append(0.0, (0, 0))
+    assert len(ring) == 1
@@ -0,0 +1,121 @@
+import asyncio
+import hashlib
+import io
+import os
+import sys
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.main import app
+from app.routes import analysis
+from app.uploads import MULTIPART_OVERHEAD_BYTES, save_upload
+
+
+class _CountingFile(io.BytesIO):
+    """Records the largest read so the test can check nothing pulls the whole upload into memory."""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.largest_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.largest_read = max(self.largest_read, len(chunk))
+        return chunk
+
+
+def test_save_upload_streams_in_chunks_and_hashes(tmp_path):
+    data = os.urandom(300_000)
+    source = _CountingFile(data)
+    dest = tmp_path / "video.mp4"
+
+    saved = asyncio.run(save_upload(UploadFile(source, filename="video.mp4"), dest, max_bytes=10**6,
+                                    chunk_size=64 * 1024))
+
+    assert dest.read_bytes() == data
+    assert saved.size == len(data)
+    assert saved.sha256 == hashlib.sha256(data).hexdigest()
+    assert source.largest_read <= 64 * 1024
+
+
+def test_save_upload_stops_at_size_limit(tmp_path):
+    source = _CountingFile(os.urandom(300_000))
+    dest = tmp_path / "video.mp4"
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(save_upload(UploadFile(source, filename="video.mp4"), dest, max_bytes=100_000,
+                                chunk_size=32 * 1024))
+
+    assert exc_info.value.status_code == 413
+    assert not dest.exists()
+    # the copy gave up shortly after crossing the limit instead of draining the upload
+    assert source.tell() <= 100_000 + 32 * 1024
+
+
+def _multipart(size: int, chunk: int = 16 * 1024, sent: list | None = None):
+    """A multipart/form-data video upload of ``size`` bytes as a chunk generator, counting what gets pulled."""
+    boundary = "airball-test-boundary"
+    head = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"shot.mp4\"\r\n"
+            f"Content-Type: video/mp4\r\n\r\n").encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+
+    def body():
+        yield head
+        for start in range(0, size, chunk):
+            if sent is not None:
+                sent.append(chunk)
+            yield b"\0" * min(chunk, size - start)
+        yield tail
+
+    headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    return body(), headers, len(head) + size + len(tail)
+
+
+@pytest.fixture
+def small_cap(monkeypatch):
+    monkeypatch.setenv("ANALYSIS_MAX_UPLOAD_MB", "0.1")
+    calls = []
+    monkeypatch.setattr(analysis, "save_upload", lambda *args, **kwargs: calls.append(args))
+    return calls
+
+
+def test_declared_oversized_upload_is_refused_before_the_body_is_read(small_cap):
+    sent = []
+    body, headers, length = _multipart(2_000_000, sent=sent)
+
+    resp = TestClient(app).post("/analyze/video", content=body, headers={**headers, "Content-Length": str(length)})
+
+    assert resp.status_code == 413
+    assert "MB limit" in resp.json()["detail"]
+    assert sent == [] and small_cap == []
+
+
+def test_chunked_oversized_upload_is_cut_off_while_it_arrives(small_cap):
+    # TestClient reads a streamed body up front, so drive the ASGI app directly to see how much it pulls
+    sent = []
+    body, headers, _ = _multipart(2_000_000, sent=sent)
+    messages = []
+
+    async def receive():
+        chunk = next(body, None)
+        return {"type": "http.request", "body": chunk or b"", "more_body": chunk is not None}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": "/analyze/video", "raw_path": b"/analyze/video", "query_string": b"", "root_path": "",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        "client": ("test", 1), "server": ("test", 80), "app": app,
+    }
+    asyncio.run(app(scope, receive, send))
+
+    assert messages[0]["type"] == "http.response.start" and messages[0]["status"] == 413
+    assert small_cap == []
+    # reading stopped right after the cap instead of taking in all 2 MB
+    assert sum(sent) <= int(0.1 * 1024 * 1024) + MULTIPART_OVERHEAD_BYTES + 16 * 1024
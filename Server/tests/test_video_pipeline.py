@@ -0,0 +1,221 @@
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.video_pipeline import AdaptiveSampler, InferenceFrameBuffer, inference_size, infer_landmarks
+from test_shot_detector import FRAME_H, FRAME_W, _synthetic_clip
+
+
+class _FakeCapture:
+    """Renders the synthetic clip's shooting arm and knees so frame differencing sees the motion.
+
+    Positions are smoothed over a few frames so the clip's landmark jitter doesn't
+    register as pixel motion while the player is idle.
+    """
+
+    def __init__(self, lm):
+        kernel = np.ones(9) / 9
+        self.pts = np.apply_along_axis(lambda c: np.convolve(c, kernel, mode="same"), 0, lm[:, :, :2])
+        self.i = 0
+
+    def read(self, image=None):
+        if self.i >= len(self.pts):
+            return False, None
+        frame = np.zeros((FRAME_H, FRAME_W, 3), dtype=np.uint8)
+        for idx in (14, 16, 25, 26):
+            x, y = self.pts[self.i, idx]
+            center = (int(x * FRAME_W * 16), int(y * FRAME_H * 16))
+            cv2.circle(frame, center, 20 * 16, (100, 100, 100), -1, cv2.LINE_AA, shift=4)
+        self.i += 1
+        return True, frame
+
+
+class _FakeLandmarker:
+    """Looks the pose up by timestamp and insists on monotonic timestamps like VIDEO mode."""
+
+    def __init__(self, lm, fps):
+        self.lm = lm
+        self.fps = fps
+        self.timestamps = []
+        self.sizes = set()
+
+    def detect_for_video(self, image, timestamp_ms):
+        self.sizes.add((image.width, image.height))
+        assert not self.timestamps or timestamp_ms > self.timestamps[-1]
+        self.timestamps.append(timestamp_ms)
+        idx = round(timestamp_ms * self.fps / 1000)
+        pose = [SimpleNamespace(x=float(x), y=float(y), z=float(z), visibility=float(v)) for x, y, z, v in self.lm[idx]]
+        return SimpleNamespace(pose_landmarks=[pose])
+
+
+def test_sampler_strides_while_idle():
+    sampler = AdaptiveSampler(idle_stride=3, lookahead=4, hold=5)
+    selected = []
+    for i in range(30):
+        selected += [idx for idx, _ in sampler.push(i, None, 0.0)]
+    selected += [idx for idx, _ in sampler.flush()]
+    assert selected == list(range(0, 30, 3))
+
+
+def test_sampler_backfills_preroll_before_motion():
+    sampler = AdaptiveSampler(idle_stride=4, lookahead=6, hold=3)
+    selected = []
+    for i in range(60):
+        selected += [idx for idx, _ in sampler.push(i, None, 10.0 if i == 30 else 0.0)]
+    selected += [idx for idx, _ in sampler.flush()]
+
+    assert selected == sorted(set(selected))
+    # the lookahead frames before the motion and the hold frames after it run at full rate
+    assert set(range(24, 34)) <= set(selected)
+    assert len(selected) < 60
+
+
+def test_sampler_trigger_keeps_full_rate():
+    sampler = AdaptiveSampler(idle_stride=5, lookahead=0, hold=4)
+    selected = []
+    for i in range(20):
+        if i == 10:
+            sampler.trigger(9)
+        selected += [idx for idx, _ in sampler.push(i, None, 0.0)]
+    assert set(range(10, 14)) <= set(selected)
+
+
+def test_adaptive_inference_skips_idle_frames_and_keeps_shots():
+    fps = 30.0
+    lm, _ = _synthetic_clip(shots=3, fps=fps, cycle_s=10.0)
+
+    full_stats, adaptive_stats = {}, {}
+    full = infer_landmarks(_FakeCapture(lm), _FakeLandmarker(lm, fps), fps, "full", full_stats)
+    adaptive = infer_landmarks(_FakeCapture(lm), _FakeLandmarker(lm, fps), fps, "adaptive", adaptive_stats)
+
+    assert full_stats["frames_inferred"] == full_stats["frames_decoded"] == len(lm)
+    assert adaptive_stats["frames_decoded"] == len(lm)
+    assert adaptive_stats["frames_inferred"] < 0.75 * len(lm)
+    # timestamps are the original frame times, not renumbered
+    np.testing.assert_allclose(adaptive[1], np.round(np.array(adaptive[1]) * fps) / fps)
+
+    # every frame from just before the release snap (p = 0.7) through the follow-through and arm drop
+    # (p in [0.66, 0.95) of each 10 s cycle) was inferred; the shallow load is sampled at the idle stride
+    inferred = set(np.round(np.array(adaptive[1]) * fps).astype(int))
+    phase = (np.arange(len(lm)) / fps % 10.0) / 10.0
+    assert set(np.flatnonzero((phase >= 0.66) & (phase < 0.95))) <= inferred
+
+
+@pytest.mark.parametrize("width,height,max_side,expected", [
+    (1920, 1080, 640, (640, 360)),
+    (1080, 1920, 640, (360, 640)),
+    (640, 480, 640, (640, 480)),
+    (3840, 2160, 0, (3840, 2160)),
+])
+def test_inference_size_caps_longest_side(width, height, max_side, expected):
+    assert inference_size(width, height, max_side) == expected
+
+
+def test_frame_buffer_downscales_into_reused_rgb_buffer():
+    prep = InferenceFrameBuffer(max_side=320)
+    frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+    frame[..., 0] = 255  # pure blue in BGR
+
+    first = prep.prepare(frame)
+    second = prep.prepare(frame)
+
+    assert first.shape == (180, 320, 3)
+    assert second is first
+    assert (first[..., 2] == 255).all() and (first[..., :2] == 0).all()
+
+
+def test_inference_runs_at_capped_size_with_unchanged_landmarks():
+    fps = 30.0
+    lm, _ = _synthetic_clip(shots=1, fps=fps)
+    small = _FakeLandmarker(lm, fps)
+    stats = {}
+    rows, _ = infer_landmarks(_FakeCapture(lm), small, fps, "full", stats, max_side=320)
+
+    assert small.sizes == {(320, 240)}
+    assert stats["inference_size"] == [320, 240]
+    # landmarks are normalized, so the detector still scales them by the original FRAME_W x FRAME_H
+    np.testing.assert_array_equal(np.stack(rows), lm)
+
+
+@pytest.mark.parametrize("sampling", ["full", "adaptive"])
+def test_pipelined_inference_matches_serial(sampling):
+    fps = 30.0
+    lm, _ = _synthetic_clip(shots=2, fps=fps, cycle_s=6.0)
+    serial_stats, piped_stats = {}, {}
+    serial = infer_landmarks(_FakeCapture(lm), _FakeLandmarker(lm, fps), fps, sampling, serial_stats,
+                             pipeline_depth=0)
+    piped = infer_landmarks(_FakeCapture(lm), _FakeLandmarker(lm, fps), fps, sampling, piped_stats,
+                            pipeline_depth=2)
+
+    assert piped[1] == serial[1]
+    np.testing.assert_array_equal(np.stack(piped[0]), np.stack(serial[0]))
+    assert "pipeline" not in serial_stats
+    pipeline = piped_stats["pipeline"]
+    assert pipeline["depth"] == 2 and pipeline["frame_queue_max"] <= 2
+    assert pipeline["bottleneck"] in ("decode", "inference")
+
+
+class _StillCapture(_FakeCapture):
+    """The same blank frame over and over: only the pose can tell the sampler the player moved."""
+
+    def read(self, image=None):
+        if self.i >= len(self.pts):
+            return False, None
+        self.i += 1
+        return True, np.zeros((FRAME_H, FRAME_W, 3), dtype=np.uint8)
+
+
+class _SlowLandmarker(_FakeLandmarker):
+    def detect_for_video(self, image, timestamp_ms):
+        time.sleep(0.0005)
+        return super().detect_for_video(image, timestamp_ms)
+
+
+def test_pipelined_adaptive_sampling_follows_pose_motion_like_serial():
+    # inference is the slower stage, so the decode thread would otherwise run ahead of the pose triggers
+    fps = 30.0
+    lm, _ = _synthetic_clip(shots=2, fps=fps, cycle_s=6.0)
+    serial_stats, piped_stats = {}, {}
+    serial = infer_landmarks(_StillCapture(lm), _SlowLandmarker(lm, fps), fps, "adaptive", serial_stats,
+                             pipeline_depth=0)
+    piped = infer_landmarks(_StillCapture(lm), _SlowLandmarker(lm, fps), fps, "adaptive", piped_stats,
+                            pipeline_depth=4)
+
+    assert serial_stats["frames_inferred"] < len(lm)
+    assert piped_stats["frames_inferred"] == serial_stats["frames_inferred"]
+    assert piped[1] == serial[1]
+
+
+class _ExplodingLandmarker(_FakeLandmarker):
+    def detect_for_video(self, image, timestamp_ms):
+        if len(self.timestamps) == 5:
+            raise RuntimeError("inference failed")
+        return super().detect_for_video(image, timestamp_ms)
+
+
+class _ExplodingCapture(_FakeCapture):
+    def read(self, image=None):
+        if self.i == 5:
+            raise OSError("decode failed")
+        return super().read(image)
+
+
+@pytest.mark.parametrize("capture_cls,landmarker_cls,error", [
+    (_FakeCapture, _ExplodingLandmarker, RuntimeError),
+    (_ExplodingCapture, _FakeLandmarker, OSError),
+])
+def test_pipeline_stage_errors_propagate_and_threads_exit(capture_cls, landmarker_cls, error):
+    fps = 30.0
+    lm, _ = _synthetic_clip(shots=1, fps=fps)
+    with pytest.raises(error):
+        infer_landmarks(capture_cls(lm), landmarker_cls(lm, fps), fps, "full", pipeline_depth=2)
+    assert not [t for t in threading.enumerate() if t.name in ("video-decode", "pose-inference")]
@@ -0,0 +1,122 @@
+import multiprocessing
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.video_pipeline import infer_landmarks
+from app.video_segments import Segment, infer_landmarks_segmented, plan_segments, segmenting_config
+
+FPS = 30.0
+
+
+class _BrightnessLandmarker:
+    """Deterministic stand-in for PoseLandmarker: the 'pose' encodes the frame's brightness."""
+
+    def __init__(self):
+        self.last_ts = -1
+
+    def detect_for_video(self, image, timestamp_ms):
+        assert timestamp_ms > self.last_ts
+        self.last_ts = timestamp_ms
+        level = float(image.numpy_view().mean()) / 255.0
+        pose = [SimpleNamespace(x=level, y=i / 33, z=0.0, visibility=0.9) for i in range(33)]
+        return SimpleNamespace(pose_landmarks=[pose])
+
+
+def _brightness_landmarker():
+    return _BrightnessLandmarker()
+
+
+@pytest.fixture(scope="module")
+def video_path():
+    tmp = tempfile.NamedTemporaryFile(suffix=".mp4", delete=False)
+    tmp.close()
+    writer = cv2.VideoWriter(tmp.name, cv2.VideoWriter_fourcc(*"mp4v"), FPS, (64, 48))
+    for i in range(100):
+        writer.write(np.full((48, 64, 3), (i * 7) % 256, dtype=np.uint8))
+    writer.release()
+    yield tmp.name
+    os.unlink(tmp.name)
+
+
+def test_plan_segments_covers_every_frame_once():
+    segments = plan_segments(100, FPS, segment_s=1.0, warmup_s=0.2)
+
+    assert [(s.start, s.end) for s in segments] == [(0, 30), (30, 60), (60, 90), (90, 100)]
+    assert [s.warmup for s in segments] == [0, 6, 6, 6]
+    assert [s.open_ended for s in segments] == [False, False, False, True]
+    assert plan_segments(0, FPS, 1.0, 0.2) == []
+    assert plan_segments(10, FPS, 1.0, 0.5) == [Segment(0, 10, 0, open_ended=True)]
+
+
+def test_segmented_inference_matches_sequential(video_path):
+    cap = cv2.VideoCapture(video_path)
+    rows, ts = infer_landmarks(cap, _BrightnessLandmarker(), FPS, pipeline_depth=0)
+    cap.release()
+
+    stats = {}
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=2, mp_context=context) as executor:
+        pix, seg_ts = infer_landmarks_segmented(video_path, FPS, 100, stats=stats, executor=executor,
+                                                segment_s=1.0, warmup_s=0.2, factory=_brightness_landmarker)
+
+    np.testing.assert_array_equal(seg_ts, ts)
+    np.testing.assert_array_equal(pix, np.stack(rows))
+    assert stats["segments"] == 4
+    assert stats["frames_with_pose"] == 100
+    assert stats["frames_decoded"] == 100 + stats["warmup_frames"]
+
+
+def test_only_full_sampling_is_segmented_and_keyed_apart(monkeypatch):
+    from app.routes.analysis import _pose_config
+
+    monkeypatch.setattr("app.routes.analysis.file_fingerprint", lambda path: "model")
+    monkeypatch.setenv("ANALYSIS_SEGMENT_WORKERS", "0")
+    sequential = _pose_config("full")
+    assert segmenting_config("full") is None
+
+    monkeypatch.setenv("ANALYSIS_SEGMENT_WORKERS", "4")
+    monkeypatch.setenv("ANALYSIS_SEGMENT_S", "30")
+    assert segmenting_config("full") == {"segment_s": 30.0, "warmup_s": 2.0}
+    assert segmenting_config("adaptive") is None
+    assert _pose_config("full") != sequential
+    with pytest.raises(ValueError):
+        infer_landmarks_segmented("clip.mp4", FPS, 100, sampling="adaptive")
+
+
+@pytest.mark.parametrize("sampling, segmented", [("full", True), ("adaptive", False)])
+def test_long_uploads_hold_a_pool_slot_however_they_run(video_path, monkeypatch, sampling, segmented):
+    from app.pose_pool import LandmarkerPool
+    from app.routes import analysis
+
+    pool = LandmarkerPool(1, factory=_brightness_landmarker, warmer=None, refill_in_background=False)
+    calls = []
+
+    def fake_segmented(file_path, fps, total_frames, **kwargs):
+        calls.append(kwargs)
+        return np.empty((0, 33, 4), dtype=np.float32), np.empty(0)
+
+    monkeypatch.setenv("ANALYSIS_SEGMENT_WORKERS", "2")
+    monkeypatch.setenv("ANALYSIS_SEGMENT_S", "1")
+    monkeypatch.setattr(analysis, "MODEL_PATH", analysis.MODEL_PATH.parent)
+    monkeypatch.setattr(analysis, "get_pose_pool", lambda: pool)
+    monkeypatch.setattr(analysis, "infer_landmarks_segmented", fake_segmented)
+
+    stats = {}
+    analysis._infer_video(video_path, stats, sampling)
+
+    assert pool.stats()["checkouts"] == 1
+    if segmented:
+        assert [call["segment_s"] for call in calls] == [1.0]
+    else:
+        # adaptive sampling runs sequentially on the pooled landmarker
+        assert not calls and stats["sampling"] == "adaptive" and stats["frames_inferred"] > 0
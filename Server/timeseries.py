@@ -0,0 +1,69 @@
+import numpy as np
+
+
+class TimeSeriesRing:
+    """Fixed-capacity ring of timestamped positions with O(log n) time lookups.
+
+    Timestamps and values live in parallel arrays, written twice like
+    ``LandmarkRing`` so the live window is one contiguous, time-ordered slice
+    that ``np.searchsorted`` can bisect. Timestamps must be appended in
+    non-decreasing order.
+    """
+
+    def __init__(self, capacity, dims=2):
+        self.capacity = int(capacity)
+        self.dims = int(dims)
+        size = 2 * self.capacity
+        self._ts = np.zeros(size, dtype=np.float64)
+        self._values = np.zeros((size, self.dims), dtype=np.float64)
+        self._next = 0
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def clear(self):
+        self._next = 0
+        self._len = 0
+
+    def append(self, ts, value):
+        if self._len and ts < self._ts[(self._next - 1) % self.capacity]:
+            raise ValueError('timestamps must be appended in order')
+        i = self._next
+        j = i + self.capacity
+        self._ts[i] = self._ts[j] = ts
+        self._values[i] = self._values[j] = value
+        self._next = (i + 1) % self.capacity
+        self._len = min(self._len + 1, self.capacity)
+
+    def _window(self):
+        start = (self._next - self._len) % self.capacity
+        return slice(start, start + self._len)
+
+    @property
+    def ts(self):
+        return self._ts[self._window()]
+
+    @property
+    def values(self):
+        return self._values[self._window()]
+
+    def nearest(self, ts):
+        """``(ts, value)`` of the sample closest in time to ``ts``, or None when empty."""
+        if not self._len:
+            return None
+        times = self.ts
+        i = int(np.searchsorted(times, ts))
+        if i == self._len or (i > 0 and ts - times[i - 1] <= times[i] - ts):
+            i -= 1
+        return float(times[i]), self.values[i]
+
+    def range(self, start, end, include_start=True):
+        """Timestamps and values of the samples from ``start`` to ``end`` (inclusive), as array views.
+
+        With ``include_start=False`` samples exactly at ``start`` are left out.
+        """
+        times = self.ts
+        lo = np.searchsorted(times, start, side='left' if include_start else 'right')
+        hi = np.searchsorted(times, end, side='right')
+        return times[lo:hi], self.values[lo:hi]